@@ -1,6 +1,6 @@
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from typing import Optional, Dict, List, Set, Tuple
+from typing import Any, Optional, Dict, List, Set, Tuple
 from datetime import datetime, UTC, timedelta
 import logging
 import jwt
@@ -9,6 +9,7 @@ import re
 
 from ..service.auth_service import AuthService
 from ..service.user_service import UserService
+from ..service.auth_cache import get_permission_cache
 from ..models.user import UserType, UserRole, UserStatus
 from ..models.auth import TokenData
 
@@ -18,6 +19,7 @@ class AuthMiddleware:
     def __init__(self):
         self.auth_service = AuthService()
         self.user_service = UserService()
+        self.permission_cache = get_permission_cache()
         self.startup_time = datetime.now(UTC)
         
         # Endpoint settings
@@ -101,12 +103,12 @@ class AuthMiddleware:
 
     async def _validate_token(
         self,
-        token: str
+        request: Request
     ) -> Tuple[bool, Optional[TokenData], Optional[str]]:
-        """Validate JWT token"""
+        """Validate JWT token (verified once per request, see request.state)"""
         try:
-            success, token_data = await self.auth_service.verify_token(token)
-            if not success:
+            token_data = await self.auth_service.authenticate_request(request)
+            if not token_data:
                 return False, None, "Invalid or expired token"
                 
             # Check token age
@@ -126,12 +128,19 @@ class AuthMiddleware:
         required_permission: str,
         user_type: UserType
     ) -> Tuple[bool, Optional[str]]:
-        """Check if user has required permission"""
+        """Check if user has required permission.
+
+        user_id is the token's sub (users.id): the same key UserService
+        invalidates in the permission cache when a user changes.
+        """
         try:
-            # Get user data
-            user = await self.user_service.get_user_by_id(user_id)
-            if not user:
-                return False, "User not found"
+            # Get user data (short-lived cache, invalidated on user updates)
+            user = self.permission_cache.get(str(user_id))
+            if user is None:
+                user = await self.user_service.get_user_by_id(user_id)
+                if not user:
+                    return False, "User not found"
+                self.permission_cache.put(user_id, user)
                 
             # Check user status
             if user.status != UserStatus.ACTIVE:
@@ -212,7 +221,7 @@ class AuthMiddleware:
                 )
                 
             # Validate token
-            success, token_data, error = await self._validate_token(token)
+            success, token_data, error = await self._validate_token(request)
             if not success:
                 return JSONResponse(
                     status_code=401,
@@ -230,7 +239,7 @@ class AuthMiddleware:
             # Check permissions for admin endpoints
             if self._is_admin_endpoint(path):
                 perms_ok, error = await self._check_user_permissions(
-                    token_data.username,
+                    token_data.user_id,
                     "admin_access",
                     UserType.WEB  # Admin endpoints are web-only
                 )
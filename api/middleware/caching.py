@@ -1,19 +1,70 @@
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
 import logging
-from typing import Optional, Dict, List, Any, Set
+from typing import Optional, Dict, List, Any, Set, Iterable, Tuple
+from collections import OrderedDict
 from datetime import datetime, UTC, timedelta
+import asyncio
+import fnmatch
 import json
 import hashlib
+import re
+import time
 from urllib.parse import urlparse, parse_qs
 
 from ..service.database_service import DatabaseService
+from ..service.metrics_service import MetricsService
 
 logger = logging.getLogger(__name__)
 
+# In-process tier in front of the shared cache backend
+L1_MAX_ENTRIES = 1000
+L1_MAX_AGE = 5  # seconds; bounds how stale another node's copy can be
+
+# Suffix CompressionMiddleware adds to the ETag of a compressed variant
+ENCODED_ETAG_SUFFIX = re.compile(r'-(br|gzip|deflate)"$')
+
+# How long an expired entry may still be served while it is refreshed
+STALE_TTL = 300  # seconds
+
+class _L1Cache:
+    """Small LRU of serialized responses kept in process memory"""
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_age: float = L1_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        loaded_at, entry = item
+        if time.monotonic() - loaded_at > self.max_age:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: Dict):
+        self._entries[key] = (time.monotonic(), entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tags: Iterable[str], pattern: Optional[str]):
+        tags = set(tags)
+        for key, (_, entry) in list(self._entries.items()):
+            if (pattern is not None and fnmatch.fnmatchcase(key, pattern)) or tags.intersection(entry.get("tags", ())):
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 class CacheMiddleware:
     def __init__(self):
         self.db = DatabaseService()
+        self.metrics = MetricsService()
         self.startup_time = datetime.now(UTC)
         
         # Cache settings
@@ -21,6 +72,7 @@ class CacheMiddleware:
         self.MAX_TTL = 86400  # 24 hours
         self.MIN_TTL = 60  # 1 minute
         self.CACHE_SIZE_LIMIT = 1024 * 1024 * 100  # 100MB
+        self.STALE_TTL = STALE_TTL
         
         # Cache control
         self.NO_CACHE_PATHS = {
@@ -44,7 +96,35 @@ class CacheMiddleware:
                 "vary": []
             }
         ]
+
+        # Tags a cached response is registered under, so writes in the
+        # services can invalidate exactly the affected entries. Templates
+        # take the path's named groups plus {user} from the verified token.
+        self.tag_rules = [
+            {"path": r"/products/(?P<code>[^/]+)", "tags": ["product:{code}"]},
+            {"path": r"/stock/(?P<code>[^/]+)", "tags": ["product:{code}"]},
+            {"path": r"/(products|stock)/?$", "tags": ["products"]},
+            {"path": r"/balance/", "tags": ["user:{user}"]}
+        ]
         
+        # Two tiers: process-local LRU, then the shared backend
+        self.l1 = _L1Cache()
+        self.db.add_invalidation_listener(self.l1.invalidate)
+
+        # Single-flight: cache key -> future resolving to the filled entry
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Background refreshes by cache key (also keeps the tasks referenced)
+        self._revalidating: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "stale_hits": 0,
+            "coalesced": 0,
+            "misses": 0,
+            "not_modified": 0,
+            "revalidations": 0
+        }
+
         logger.info(f"""
         CacheMiddleware initialized:
         Time: 2025-05-30 15:09:00
@@ -134,16 +214,97 @@ class CacheMiddleware:
                 
         return []
 
-    async def _serialize_response(
+    def _get_cache_tags(
+        self,
+        request: Request
+    ) -> List[str]:
+        """Get invalidation tags for request"""
+        path = request.url.path
+        token_data = getattr(request.state, "token_data", None)
+        user = token_data.username if token_data else None
+
+        tags = []
+        for rule in self.tag_rules:
+            match = re.search(rule["path"], path)
+            if not match:
+                continue
+            for template in rule["tags"]:
+                if "{user}" in template and not user:
+                    continue
+                tags.append(template.format(user=user, **match.groupdict()))
+        return tags
+
+    async def _read_body(
         self,
         response: Response
+    ) -> Tuple[Response, bytes]:
+        """Buffer the body; call_next hands back a streaming response"""
+        if hasattr(response, "body"):
+            return response, response.body
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        buffered = Response(
+            content=body,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            media_type=response.media_type,
+            background=response.background
+        )
+        return buffered, body
+
+    @staticmethod
+    def _make_etag(body: bytes) -> str:
+        """Strong validator for a response body"""
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    def _etag_matches(
+        self,
+        request: Request,
+        etag: Optional[str]
+    ) -> bool:
+        """If-None-Match check (weak comparison, as RFC 9110 requires)"""
+        header = request.headers.get("If-None-Match")
+        if not header or not etag:
+            return False
+        if header.strip() == "*":
+            return True
+        # CompressionMiddleware tags encoded variants as "<etag>-<encoding>"
+        candidates = {
+            ENCODED_ETAG_SUFFIX.sub('"', tag.strip().removeprefix("W/"))
+            for tag in header.split(",")
+        }
+        return etag in candidates
+
+    def _not_modified(
+        self,
+        entry: Dict
+    ) -> Response:
+        """304 carrying the validators and caching headers of the entry"""
+        self._stats["not_modified"] += 1
+        self.metrics.record_not_modified()
+        headers = {
+            name: value for name, value in entry["headers"].items()
+            if name.lower() in ("etag", "cache-control", "vary", "expires", "last-modified")
+        }
+        headers["X-Cache"] = "HIT"
+        return Response(status_code=304, headers=headers)
+
+    async def _serialize_response(
+        self,
+        response: Response,
+        body: bytes,
+        ttl: int,
+        tags: List[str]
     ) -> Dict:
         """Serialize response for caching"""
         return {
-            "content": response.body.decode() if isinstance(response.body, bytes) else response.body,
+            "etag": response.headers.get("ETag"),
+            "content": body.decode(),
             "status_code": response.status_code,
             "headers": dict(response.headers),
-            "media_type": response.media_type
+            "media_type": response.media_type,
+            "stored_at": time.time(),
+            "ttl": ttl,
+            "tags": tags
         }
 
     async def _deserialize_response(
@@ -158,49 +319,134 @@ class CacheMiddleware:
             media_type=data["media_type"]
         )
 
+    def _is_fresh(self, entry: Dict) -> bool:
+        return time.time() < entry["stored_at"] + entry["ttl"]
+
+    async def _lookup(self, cache_key: str) -> Tuple[Optional[Dict], str]:
+        """L1, then the shared backend (promoting hits into L1)"""
+        entry = self.l1.get(cache_key)
+        if entry is not None:
+            self._stats["l1_hits"] += 1
+            return entry, "l1"
+        entry = await self.db.cache_get(cache_key)
+        if entry and "stored_at" in entry:
+            self._stats["l2_hits"] += 1
+            self.l1.set(cache_key, entry)
+            return entry, "l2"
+        return None, ""
+
+    async def _cached_response(
+        self,
+        entry: Dict,
+        status: str
+    ) -> Response:
+        response = await self._deserialize_response(entry)
+        response.headers["X-Cache"] = status
+        return response
+
+    async def _fill(
+        self,
+        request: Request,
+        call_next,
+        cache_key: str,
+        cache_ttl: int,
+        vary_headers: List[str]
+    ) -> Response:
+        """Compute the response upstream and store it; concurrent misses
+        for the same key wait on this call instead of repeating it"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        entry = None
+        try:
+            response = await call_next(request)
+            if not self._should_cache_response(request, response):
+                return response
+
+            try:
+                response, body = await self._read_body(response)
+                # Validator and cache headers are stored with the entry, so
+                # hits and 304s carry them without recomputing anything
+                if "ETag" not in response.headers:
+                    response.headers["ETag"] = self._make_etag(body)
+                response.headers["Cache-Control"] = f"public, max-age={cache_ttl}"
+                if vary_headers:
+                    response.headers["Vary"] = ", ".join(vary_headers)
+                tags = self._get_cache_tags(request)
+                entry = await self._serialize_response(response, body, cache_ttl, tags)
+
+                # Serve stale copies for STALE_TTL past expiry while refreshing
+                await self.db.cache_set(
+                    cache_key,
+                    entry,
+                    cache_ttl + self.STALE_TTL,
+                    tags=tags
+                )
+                self.l1.set(cache_key, entry)
+
+                response.headers["X-Cache"] = "MISS"
+                if self._etag_matches(request, entry["etag"]):
+                    return self._not_modified(entry)
+
+            except Exception as e:
+                entry = None
+                logger.error(f"Caching error: {str(e)}")
+
+            return response
+        finally:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+            future.set_result(entry)
+
+    def _schedule_revalidation(
+        self,
+        request: Request,
+        cache_key: str
+    ):
+        """Refresh a stale entry in the background (once per key).
+
+        The refresh re-enters the whole ASGI app with a copy of the
+        request's scope flagged so this middleware skips the lookup and
+        stores the new response.
+        """
+        if cache_key in self._inflight or cache_key in self._revalidating:
+            return
+
+        scope = dict(request.scope)
+        scope["cache_revalidate"] = True
+        scope["state"] = dict(request.scope.get("state", {}))
+        app = scope["app"]
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        async def revalidate():
+            try:
+                await app(scope, receive, send)
+                self._stats["revalidations"] += 1
+            except Exception as e:
+                logger.error(f"Cache revalidation error: {str(e)}")
+            finally:
+                self._revalidating.pop(cache_key, None)
+
+        self._revalidating[cache_key] = asyncio.get_running_loop().create_task(revalidate())
+
     async def __call__(self, request: Request, call_next):
         # Skip caching for streaming responses
         if "text/event-stream" in request.headers.get("Accept", ""):
             return await call_next(request)
 
+        # Only safe methods are looked up or stored
+        if request.method not in self.CACHE_METHODS:
+            return await call_next(request)
+
         try:
             # Get cache key and TTL
             vary_headers = await self._get_vary_headers(request)
             cache_key = await self._get_cache_key(request, vary_headers)
             cache_ttl = await self._get_cache_ttl(request)
-
-            # Try to get from cache
-            cached_data = await self.db.cache_get(cache_key)
-            if cached_data:
-                response = await self._deserialize_response(cached_data)
-                response.headers["X-Cache"] = "HIT"
-                return response
-
-            # Get fresh response
-            response = await call_next(request)
-            
-            # Cache if appropriate
-            if self._should_cache_response(request, response):
-                try:
-                    # Serialize and cache response
-                    serialized = await self._serialize_response(response)
-                    await self.db.cache_set(
-                        cache_key,
-                        serialized,
-                        cache_ttl
-                    )
-                    
-                    # Add cache headers
-                    response.headers["Cache-Control"] = f"public, max-age={cache_ttl}"
-                    response.headers["X-Cache"] = "MISS"
-                    if vary_headers:
-                        response.headers["Vary"] = ", ".join(vary_headers)
-                        
-                except Exception as e:
-                    logger.error(f"Caching error: {str(e)}")
-                    
-            return response
-
         except Exception as e:
             logger.error(f"""
             Cache middleware error:
@@ -211,6 +457,39 @@ class CacheMiddleware:
             """)
             return await call_next(request)
 
+        # Background refresh: recompute and store without looking up
+        if request.scope.get("cache_revalidate"):
+            return await self._fill(request, call_next, cache_key, cache_ttl, vary_headers)
+
+        entry, tier = await self._lookup(cache_key)
+        if entry is not None:
+            if self._is_fresh(entry):
+                self.metrics.record_cache_lookup("hit", tier)
+                if self._etag_matches(request, entry.get("etag")):
+                    return self._not_modified(entry)
+                return await self._cached_response(entry, "HIT")
+            self._stats["stale_hits"] += 1
+            self.metrics.record_cache_lookup("stale", tier)
+            self._schedule_revalidation(request, cache_key)
+            return await self._cached_response(entry, "STALE")
+
+        # Someone is already computing this response; wait for it
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            self.metrics.record_cache_lookup("coalesced")
+            entry = await asyncio.shield(inflight)
+            if entry is not None:
+                if self._etag_matches(request, entry.get("etag")):
+                    return self._not_modified(entry)
+                return await self._cached_response(entry, "HIT")
+            # Not cacheable: go upstream
+            return await call_next(request)
+
+        self._stats["misses"] += 1
+        self.metrics.record_cache_lookup("miss")
+        return await self._fill(request, call_next, cache_key, cache_ttl, vary_headers)
+
     async def clear_cache(
         self,
         pattern: str = "*"
@@ -225,15 +504,18 @@ class CacheMiddleware:
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         try:
-            redis = self.db.get_redis()
-            info = redis.info()
-            
+            info = await self.db.cache_info()
+
             return {
-                "hits": info["keyspace_hits"],
-                "misses": info["keyspace_misses"],
-                "memory_used": info["used_memory"],
-                "keys": len(redis.keys("cache:*")),
-                "uptime": info["uptime_in_seconds"]
+                "backend": info.get("backend"),
+                "hits": info.get("hits", 0),
+                "misses": info.get("misses", 0),
+                "memory_used": info.get("memory_used", 0),
+                "keys": await self.db.cache_count("cache"),
+                "uptime": info.get("uptime", 0),
+                "l1_entries": len(self.l1),
+                "inflight": len(self._inflight),
+                **self._stats
             }
         except Exception as e:
             logger.error(f"Cache stats error: {str(e)}")
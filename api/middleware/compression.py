@@ -1,19 +1,67 @@
 from fastapi import Request, Response
-from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+import base64
+import hashlib
 import logging
-from typing import Optional, Dict, Union
+from collections import OrderedDict
+from typing import Optional, Dict, List, Union
 from datetime import datetime, UTC
 
-from ..service.compression_service import CompressionService
+from ..service.compression_service import CompressionService, StreamEncoder
 from ..service.settings_service import SettingsService
+from ..service.database_service import DatabaseService
 
 logger = logging.getLogger(__name__)
 
+# Bodies that arrive streamed are only buffered up to this size
+MAX_BUFFERED_BODY = 1024 * 1024  # bytes
+
+# Compressed variants are keyed by the identity body's strong ETag, so
+# they never go stale; the in-process tier is bounded by total bytes
+VARIANT_TTL = 86400  # seconds
+VARIANT_L1_MAX_BYTES = 32 * 1024 * 1024
+
+class _VariantCache:
+    """Byte-bounded LRU of compressed bodies"""
+
+    def __init__(self, max_bytes: int = VARIANT_L1_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def set(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
 class CompressionMiddleware:
     def __init__(self):
         self.compression_service = CompressionService()
         self.settings_service = SettingsService()
+        self.db = DatabaseService()
+        self.variants = _VariantCache()
         self.startup_time = datetime.now(UTC)
+
+        # Levels or types may differ after a settings change
+        SettingsService.add_compression_listener(lambda settings, version: self.variants.clear())
+
         logger.info(f"""
         CompressionMiddleware initialized:
         Time: 2025-05-30 14:53:16
@@ -21,85 +69,152 @@ class CompressionMiddleware:
         """)
 
     async def __call__(self, request: Request, call_next):
+        # Get compression settings (cached by SettingsService)
         try:
-            # Get compression settings
             settings = await self.settings_service.get_compression_settings()
-            if not settings:
-                settings = self.compression_service.DEFAULT_SETTINGS
+        except Exception as e:
+            logger.error(f"Compression settings error: {str(e)}")
+            settings = None
+        if not settings:
+            settings = self.compression_service.DEFAULT_SETTINGS
 
-            # Process request
-            response = await call_next(request)
+        # Process request
+        response = await call_next(request)
 
-            # Skip compression for streaming responses
-            if isinstance(response, StreamingResponse):
-                return response
+        try:
+            return await self._compress_response(request, response, settings)
+        except Exception as e:
+            logger.error(f"""
+            Compression middleware error:
+            Error: {str(e)}
+            Time: 2025-05-30 14:53:16
+            User: fdygg
+            Path: {request.url.path}
+            """)
+            return response
 
-            # Get response content
-            if isinstance(response, JSONResponse):
-                content = response.body
-                content_type = response.media_type
-            else:
-                content = await self._get_response_content(response)
-                content_type = response.headers.get("content-type", "")
-
-            content_length = len(content)
-
-            # Check if compression should be applied
-            if not self.compression_service.should_compress(
-                content_type,
-                content_length,
-                settings
-            ):
-                return response
+    async def _compress_response(
+        self,
+        request: Request,
+        response: Response,
+        settings: Dict
+    ) -> Response:
+        if "content-encoding" in response.headers:
+            return response
 
-            # Get accepted encodings
-            accept_encoding = request.headers.get("accept-encoding", "")
-            encoding = self.compression_service.get_best_encoding(accept_encoding)
+        content_type = response.headers.get("content-type", "")
 
-            if not encoding:
+        if hasattr(response, "body"):
+            content = await self._get_response_content(response)
+        else:
+            # call_next streams every body back; only buffer bodies of
+            # known, bounded size that would be compressed anyway
+            try:
+                declared = int(response.headers.get("content-length", ""))
+            except ValueError:
                 return response
-
-            # Compress content
-            compressed_content, compressed_length = \
-                self.compression_service.compress_data(
-                    content,
-                    encoding,
-                    settings
-                )
-
-            # Skip if compression didn't help
-            if compressed_length >= content_length:
+            if declared > MAX_BUFFERED_BODY or not self.compression_service.should_compress(
+                content_type, declared, settings
+            ):
                 return response
-
-            # Create new response with compressed content
-            new_response = Response(
-                content=compressed_content,
+            content = b"".join([chunk async for chunk in response.body_iterator])
+            response = Response(
+                content=content,
                 status_code=response.status_code,
                 headers=dict(response.headers),
-                media_type=content_type
+                media_type=response.media_type,
+                background=response.background
             )
 
-            # Add compression headers
-            new_response.headers["Content-Encoding"] = encoding
-            new_response.headers["Content-Length"] = str(compressed_length)
-            new_response.headers["Vary"] = "Accept-Encoding"
+        content_length = len(content)
 
-            # Add debug headers
-            new_response.headers["X-Compression-Ratio"] = \
-                f"{(1 - compressed_length/content_length):.2%}"
-            new_response.headers["X-Compression-Algorithm"] = encoding
+        # Check if compression should be applied
+        if not self.compression_service.should_compress(
+            content_type,
+            content_length,
+            settings
+        ):
+            return response
 
-            return new_response
+        # Get accepted encodings
+        accept_encoding = request.headers.get("accept-encoding", "")
+        encoding = self.compression_service.get_best_encoding(accept_encoding)
 
-        except Exception as e:
-            logger.error(f"""
-            Compression middleware error:
-            Error: {str(e)}
-            Time: 2025-05-30 14:53:16
-            User: fdygg
-            Path: {request.url.path}
-            """)
-            return await call_next(request)
+        if not encoding:
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        # Reuse a stored variant of this exact body when there is one
+        etag = response.headers.get("etag")
+        compressed_content = await self._get_variant(content, etag, encoding, settings)
+        compressed_length = len(compressed_content)
+
+        # Skip if compression didn't help; another encoding still might
+        if compressed_length >= content_length:
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        # Create new response with compressed content
+        new_response = Response(
+            content=compressed_content,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            media_type=response.media_type,
+            background=response.background
+        )
+
+        # Add compression headers
+        new_response.headers["Content-Encoding"] = encoding
+        new_response.headers["Content-Length"] = str(compressed_length)
+        new_response.headers.add_vary_header("Accept-Encoding")
+        if etag and not etag.startswith("W/"):
+            # A strong validator must differ per encoding
+            new_response.headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+
+        # Add debug headers
+        new_response.headers["X-Compression-Ratio"] = \
+            f"{(1 - compressed_length/content_length):.2%}"
+        new_response.headers["X-Compression-Algorithm"] = encoding
+
+        return new_response
+
+    async def _get_variant(
+        self,
+        content: bytes,
+        etag: Optional[str],
+        encoding: str,
+        settings: Dict
+    ) -> bytes:
+        """Compressed body for `encoding`, from the variant caches when the
+        response carries a strong ETag, compressed off-loop otherwise"""
+        key = None
+        if etag and not etag.startswith("W/"):
+            level = self.compression_service.encoding_level(encoding, settings)
+            digest = hashlib.sha256(etag.encode()).hexdigest()[:32]
+            key = f"cache:z:{digest}:{encoding}:{level}"
+
+            compressed = self.variants.get(key)
+            if compressed is not None:
+                return compressed
+            stored = await self.db.cache_get(key)
+            if stored:
+                compressed = base64.b64decode(stored)
+                self.variants.set(key, compressed)
+                return compressed
+
+        compressed, _ = await self.compression_service.compress_data_async(
+            content,
+            encoding,
+            settings
+        )
+        if key and len(compressed) < len(content):
+            self.variants.set(key, compressed)
+            await self.db.cache_set(
+                key,
+                base64.b64encode(compressed).decode("ascii"),
+                VARIANT_TTL
+            )
+        return compressed
 
     async def _get_response_content(self, response: Response) -> bytes:
         """Get response content as bytes"""
@@ -133,4 +248,138 @@ class CompressionMiddleware:
         if any(request.url.path.startswith(path) for path in skip_paths):
             return True
 
-        return False
\ No newline at end of file
+        return False
+
+class _CompressingSend:
+    """`send` wrapper that encodes http.response.body messages as they pass.
+
+    When the response declares no Content-Length, up to min_size bytes are
+    held back to decide whether compressing is worthwhile; after that only
+    the encoder's internal window is kept in memory.
+    """
+
+    def __init__(self, send, encoding: str, algorithm: Dict, service: CompressionService, settings: Dict):
+        self.send = send
+        self.encoding = encoding
+        self.min_size = algorithm["min_size"]
+        self.types = algorithm["types"]
+        self.service = service
+        self.settings = settings
+
+        self.start: Optional[Dict] = None
+        self.mode = "start"  # start -> pending -> compress | passthrough
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.encoder: Optional[StreamEncoder] = None
+
+    def _decide(self, message: Dict) -> str:
+        headers = Headers(raw=message["headers"])
+        status = message["status"]
+        if status < 200 or status in (204, 304):
+            return "passthrough"
+        if "content-encoding" in headers or "content-range" in headers:
+            return "passthrough"
+        content_type = headers.get("content-type", "")
+        if not any(t in content_type for t in self.types):
+            return "passthrough"
+        length = headers.get("content-length")
+        if length is not None:
+            return "compress" if int(length) >= self.min_size else "passthrough"
+        return "pending"
+
+    async def _begin_compression(self):
+        headers = MutableHeaders(raw=self.start["headers"])
+        if "content-length" in headers:
+            del headers["content-length"]
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # A strong validator must differ per encoding
+            headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+        self.encoder = self.service.create_encoder(self.encoding, self.settings)
+        self.mode = "compress"
+        await self.send(self.start)
+
+    async def __call__(self, message: Dict):
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            self.mode = self._decide(message)
+            if self.mode == "passthrough":
+                await self.send(message)
+            elif self.mode == "compress":
+                await self._begin_compression()
+            return
+
+        if kind != "http.response.body" or self.mode == "passthrough":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode == "pending":
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if self.pending_size < self.min_size:
+                if more_body:
+                    return
+                # Finished below min_size: send it as it is
+                self.mode = "passthrough"
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": b"".join(self.pending)})
+                self.pending = []
+                return
+            body = b"".join(self.pending)
+            self.pending = []
+            await self._begin_compression()
+
+        data = self.encoder.compress(body)
+        if not more_body:
+            data += self.encoder.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+class StreamingCompressionMiddleware:
+    """ASGI compression layer for large and streaming responses.
+
+    Compresses chunk by chunk through the `send` channel, so memory stays
+    flat however large an export is, while honouring each algorithm's
+    enabled flag, min_size and content types. Install it outside
+    CompressionMiddleware: bounded bodies are then compressed there
+    first (reusing cached variants) and pass through here untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.compression_service = CompressionService()
+        self.settings_service = SettingsService()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = self.compression_service.get_best_encoding(accept_encoding)
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            settings = await self.settings_service.get_compression_settings()
+        except Exception as e:
+            logger.error(f"Compression settings error: {str(e)}")
+            settings = None
+        if not settings:
+            settings = self.compression_service.DEFAULT_SETTINGS
+
+        algorithm = self.compression_service.settings_for(encoding, settings)
+        if not algorithm["enabled"]:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSend(
+            send, encoding, algorithm, self.compression_service, settings
+        ))
@@ -3,18 +3,31 @@ from typing import Dict, Optional
 from functools import wraps
 import traceback
 import logging
+from uuid import uuid4
 from fastapi import Request, Response
 from ..service.logs_service import LogService
-from ..service.audit_service import AuditService
+from ..service.log_sink import LogSink
 from ..models.logs import Log, LogLevel, LogCategory
 from ..models.audit import AuditLog, AuditAction, AuditCategory
 
 logger = logging.getLogger(__name__)
 
+# Only these request/response headers are kept in log metadata
+LOGGED_HEADERS = ("user-agent", "content-type", "content-length", "x-request-id")
+
+def _pick_headers(headers) -> Dict[str, str]:
+    return {name: headers[name] for name in LOGGED_HEADERS if name in headers}
+
 class LoggingMiddleware:
+    """Request logging through the write-behind LogSink.
+
+    Nothing here waits on the database: records are queued and flushed in
+    batches by the sink. Successful GETs are sampled (see
+    LOG_SINK_GET_SAMPLE_RATE); writes and errors are always logged.
+    """
+
     def __init__(self):
-        self.log_service = LogService()
-        self.audit_service = AuditService()
+        self.log_sink = LogSink()
         self.startup_time = datetime.now(UTC)
         logger.info(f"""
         LoggingMiddleware initialized:
@@ -35,8 +48,17 @@ class LoggingMiddleware:
         start_time = datetime.now(UTC)
 
         try:
-            # Create request log
-            await self.log_service.create_log(
+            # Process request
+            response = await call_next(request)
+            
+            # Calculate duration
+            duration = (datetime.now(UTC) - start_time).total_seconds()
+
+            if not self.log_sink.should_log_request(request.method, response.status_code):
+                return response
+
+            # Request log (queued once the sampling decision is known)
+            await self.log_sink.log(
                 Log(
                     level=LogLevel.INFO,
                     category=LogCategory.API,
@@ -50,19 +72,13 @@ class LoggingMiddleware:
                         "method": request.method,
                         "path": str(request.url.path),
                         "query_params": dict(request.query_params),
-                        "headers": dict(request.headers),
+                        "headers": _pick_headers(request.headers),
                     }
                 )
             )
 
-            # Process request
-            response = await call_next(request)
-            
-            # Calculate duration
-            duration = (datetime.now(UTC) - start_time).total_seconds()
-
-            # Create response log
-            await self.log_service.create_log(
+            # Response log
+            await self.log_sink.log(
                 Log(
                     level=LogLevel.INFO,
                     category=LogCategory.API,
@@ -75,14 +91,14 @@ class LoggingMiddleware:
                         "request_id": request_id,
                         "status_code": response.status_code,
                         "duration": duration,
-                        "headers": dict(response.headers)
+                        "headers": _pick_headers(response.headers)
                     }
                 )
             )
 
             # Create audit log for important operations
             if request.method in ["POST", "PUT", "DELETE", "PATCH"]:
-                await self.audit_service.log_action(
+                await self.log_sink.audit(
                     category=AuditCategory.SYSTEM,
                     action=AuditAction(request.method.lower()),
                     actor_id=user_id or "anonymous",
@@ -103,7 +119,7 @@ class LoggingMiddleware:
 
         except Exception as e:
             # Log error
-            error_log = await self.log_service.create_log(
+            await self.log_sink.log(
                 Log(
                     level=LogLevel.ERROR,
                     category=LogCategory.API,
@@ -122,7 +138,7 @@ class LoggingMiddleware:
             )
 
             # Create audit log for error
-            await self.audit_service.log_action(
+            await self.log_sink.audit(
                 category=AuditCategory.SYSTEM,
                 action=AuditAction.STATUS_CHANGE,
                 actor_id=user_id or "anonymous",
@@ -133,8 +149,7 @@ class LoggingMiddleware:
                 metadata={
                     "request_id": request_id,
                     "error": str(e),
-                    "error_type": e.__class__.__name__,
-                    "log_id": error_log.id if error_log else None
+                    "error_type": e.__class__.__name__
                 }
             )
 
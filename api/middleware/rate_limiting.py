@@ -5,6 +5,7 @@ from fastapi import Request, Response, HTTPException
 from ..service.rate_limit_service import RateLimitService
 from ..service.auth_service import AuthService
 from ..models.rate_limit import RateLimit
+from ..models.auth import TokenData
 
 logger = logging.getLogger(__name__)
 
@@ -19,43 +20,40 @@ class RateLimitMiddleware:
         User: fdygg
         """)
 
-    async def get_user_id(self, request: Request) -> Optional[str]:
-        """Extract user ID from request"""
+    async def get_token_data(self, request: Request) -> Optional[TokenData]:
+        """Extract verified token data from request"""
         try:
-            # Get token from header
-            auth_header = request.headers.get("Authorization")
-            if not auth_header or not auth_header.startswith("Bearer "):
-                return None
-
-            token = auth_header.split(" ")[1]
-            
-            # Verify token
-            is_valid, token_data = await self.auth_service.verify_token(token)
-            if not is_valid or not token_data:
-                return None
-
-            return token_data.username
+            # Verified once per request and shared through request.state
+            return await self.auth_service.authenticate_request(request)
 
         except Exception as e:
             logger.error(f"Error extracting user ID: {str(e)}")
             return None
 
+    async def get_user_id(self, request: Request) -> Optional[str]:
+        """Extract user ID from request"""
+        token_data = await self.get_token_data(request)
+        return token_data.username if token_data else None
+
     async def __call__(self, request: Request, call_next):
         try:
-            # Get user ID and IP
-            user_id = await self.get_user_id(request) or "anonymous"
-            ip_address = request.client.host
             endpoint = request.url.path
 
             # Skip rate limiting for static files and health checks
             if endpoint.startswith(("/static/", "/public/", "/health")):
                 return await call_next(request)
 
-            # Check rate limit
+            # Get user, role and IP
+            token_data = await self.get_token_data(request)
+            user_id = token_data.username if token_data else "anonymous"
+            ip_address = request.client.host
+
+            # Check rate limit (in-memory, no database round trip)
             is_allowed, limit_info = await self.rate_limit_service.check_rate_limit(
                 user_id=user_id,
                 endpoint=endpoint,
-                ip_address=ip_address
+                ip_address=ip_address,
+                role=token_data.role if token_data else None
             )
 
             if not is_allowed:
@@ -66,17 +64,16 @@ class RateLimitMiddleware:
                         "reset": limit_info["reset"],
                         "limit": limit_info["limit"],
                         "remaining": 0,
-                        "retry_after": limit_info["window"]
+                        "retry_after": limit_info["retry_after"]
+                    },
+                    headers={
+                        "X-RateLimit-Limit": str(limit_info["limit"]),
+                        "X-RateLimit-Remaining": "0",
+                        "X-RateLimit-Reset": limit_info["reset"],
+                        "Retry-After": str(limit_info["retry_after"])
                     }
                 )
 
-            # Log request
-            await self.rate_limit_service.log_request(
-                user_id=user_id,
-                endpoint=endpoint,
-                ip_address=ip_address
-            )
-
             # Add rate limit headers
             response = await call_next(request)
             response.headers["X-RateLimit-Limit"] = str(limit_info["limit"])
@@ -109,12 +106,12 @@ class RateLimitMiddleware:
                 "reset": limit_info["reset"],
                 "limit": limit_info["limit"],
                 "remaining": 0,
-                "retry_after": limit_info["window"]
+                "retry_after": limit_info["retry_after"]
             },
             headers={
                 "X-RateLimit-Limit": str(limit_info["limit"]),
                 "X-RateLimit-Remaining": "0",
                 "X-RateLimit-Reset": limit_info["reset"],
-                "Retry-After": str(limit_info["window"])
+                "Retry-After": str(limit_info["retry_after"])
             }
         )
\ No newline at end of file
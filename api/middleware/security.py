@@ -83,8 +83,9 @@ class SecurityMiddleware:
             if scheme.lower() != "bearer":
                 return False, None, "Invalid authentication scheme"
                 
-            is_valid, token_data = await self.auth_service.verify_token(token)
-            if not is_valid or not token_data:
+            # Verified once per request and shared through request.state
+            token_data = await self.auth_service.authenticate_request(request)
+            if not token_data:
                 return False, None, "Invalid or expired token"
                 
             return True, token_data, ""
@@ -12,6 +12,7 @@ class TokenData(BaseModel):
     username: str
     role: str
     exp: datetime
+    user_id: Optional[str] = None  # the token's sub (users.id)
 
 class LoginRequest(BaseModel):
     username: str = Field(..., min_length=3)
@@ -11,7 +11,7 @@ from ..models.admin import (
     SystemInfo,
     UserActivity
 )
-from database import get_connection
+from async_db import get_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -88,9 +88,6 @@ async def get_activity_log(
 ):
     """Get user activity logs"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
         query = """
             SELECT al.timestamp, al.user_id, al.action, al.details
             FROM activity_log al
@@ -101,8 +98,7 @@ async def get_activity_log(
         start = start_date or datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
         end = end_date or datetime.strptime("2025-05-28 15:24:29", "%Y-%m-%d %H:%M:%S")
         
-        cursor.execute(query, (start, end))
-        activities = cursor.fetchall()
+        activities = await get_db().fetchall(query, (start, end))
         
         return {
             "activities": [
@@ -128,9 +124,6 @@ async def get_activity_log(
         {traceback.format_exc()}
         """)
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if conn:
-            conn.close()
 
 async def get_system_stats(bot) -> AdminStats:
     """Get system statistics"""
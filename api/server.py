@@ -3,7 +3,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
 import uvicorn
 import logging
 import psutil
@@ -17,10 +16,18 @@ from .dependencies import set_bot
 from .routes import router as api_router
 from .middleware import setup_middleware
 from .middleware.auth import auth_middleware
+from .middleware.compression import StreamingCompressionMiddleware
 from .config import API_VERSION
+from .service.compression_service import CompressionService
+from .service.log_sink import LogSink
+from .service.rate_limit_service import RateLimitService
+from .utils.static_files import PrecompressedStaticFiles
 
 logger = logging.getLogger(__name__)
 
+# Seconds stop() waits for uvicorn to run its shutdown hooks
+API_SHUTDOWN_TIMEOUT = 10
+
 class APIServer:
     def __init__(self, bot):
         self.app = FastAPI(
@@ -33,11 +40,15 @@ class APIServer:
         )
         self.bot = bot
         self.startup_time = datetime.now(UTC)
+        self.server = None
+        self.thread = None
         
         # Setup static files
         static_dir = Path(__file__).parent / "static"
         static_dir.mkdir(exist_ok=True)
-        self.app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+        precompressed = CompressionService().precompress_static(static_dir)
+        logger.debug(f"Precompressed {precompressed} static files")
+        self.app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)), name="static")
         
         self.setup_api()
         logger.debug(f"""
@@ -115,6 +126,12 @@ class APIServer:
             
             # Setup middleware and error handlers
             setup_middleware(self.app)
+
+            # Outermost: compresses large/streamed bodies chunk by chunk
+            self.app.add_middleware(StreamingCompressionMiddleware)
+
+            # Flush write-behind state while the database is still open
+            self.app.add_event_handler("shutdown", self.shutdown)
             
             # Add favicon endpoint
             @self.app.get("/favicon.ico", include_in_schema=False)
@@ -246,6 +263,27 @@ class APIServer:
             """)
             raise
 
+    async def shutdown(self):
+        """Uvicorn shutdown hook: drain the log sink, snapshot rate limits"""
+        try:
+            await LogSink().close()
+        except Exception as e:
+            logger.error(f"Log sink close error: {str(e)}")
+
+        try:
+            await RateLimitService().close()
+        except Exception as e:
+            logger.error(f"Rate limiter close error: {str(e)}")
+
+    def stop(self, timeout: float = API_SHUTDOWN_TIMEOUT):
+        """Ask uvicorn to exit and wait for its shutdown hooks"""
+        if self.server is not None:
+            self.server.should_exit = True
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.warning(f"API server still running after {timeout}s")
+
 # ... kode sebelumnya tetap sama ...
 
     def run(self):
@@ -292,7 +330,7 @@ class APIServer:
                 }
             )
             
-            server = uvicorn.Server(config)
+            server = self.server = uvicorn.Server(config)
             
             logger.info(f"""
             Starting API server:
@@ -333,6 +371,7 @@ def create_api_server(bot) -> APIServer:
             name="APIServerThread"
         )
         api_thread.start()
+        api.thread = api_thread
         
         logger.info(f"""
         API server thread started:
@@ -4,6 +4,7 @@ import logging
 from uuid import uuid4
 from .database_service import DatabaseService
 from .auth_service import AuthService
+from .auth_cache import get_permission_cache
 from ..models.admin import (
     AdminCreate, AdminUpdate, AdminResponse,
     AdminRole, AdminStatus, AdminPermission
@@ -155,6 +156,7 @@ class AdminService:
             """
             
             await self.db.execute_query(query, tuple(params), fetch=False)
+            get_permission_cache().invalidate(admin_id)
             return await self.get_admin_by_id(admin_id)
 
         except Exception as e:
@@ -177,6 +179,7 @@ class AdminService:
                 (AdminStatus.INACTIVE.value, datetime.now(UTC), admin_id),
                 fetch=False
             )
+            get_permission_cache().invalidate(admin_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting admin: {str(e)}")
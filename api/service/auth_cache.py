@@ -0,0 +1,93 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_MAX_ENTRIES = 10000
+PERMISSION_CACHE_TTL = 30  # seconds
+PERMISSION_CACHE_MAX_ENTRIES = 5000
+
+class _ExpiringLRU:
+    """Bounded LRU map whose entries each carry their own expiry time"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+class TokenCache(_ExpiringLRU):
+    """Verified token data keyed by SHA-256 of the token, valid until its exp"""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+class PermissionCache(_ExpiringLRU):
+    """Short-lived user records for permission checks, keyed by user ID"""
+
+    def __init__(self, ttl: float = PERMISSION_CACHE_TTL,
+                 max_entries: int = PERMISSION_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+        self.ttl = ttl
+
+    def put(self, user_id: str, user: Any):
+        self.set(str(user_id), user, time.time() + self.ttl)
+
+    def invalidate(self, user_id: str):
+        self.delete(str(user_id))
+
+_token_cache = TokenCache()
+_permission_cache = PermissionCache()
+
+def get_token_cache() -> TokenCache:
+    return _token_cache
+
+def get_permission_cache() -> PermissionCache:
+    return _permission_cache
@@ -5,6 +5,7 @@ import jwt
 from passlib.hash import bcrypt
 from uuid import uuid4
 from .database_service import DatabaseService
+from .auth_cache import get_token_cache
 from ..models.auth import Token, TokenData, LoginResponse
 from ..models.user import UserType, UserRole, UserStatus, UserResponse
 
@@ -94,9 +95,10 @@ class AuthService:
             return None
             
         # Update last login
+        now = datetime.now(UTC)
         await self.db.execute_query(
-            "UPDATE users SET last_login = ? WHERE id = ?",
-            (datetime.now(UTC), user["id"]),
+            "UPDATE users SET last_login = ?, updated_at = ? WHERE id = ?",
+            (now, now, user["id"]),
             fetch=False
         )
             
@@ -155,14 +157,26 @@ class AuthService:
             return False, "Login failed", None
 
     async def verify_token(self, token: str) -> Tuple[bool, Optional[TokenData]]:
-        """Verify JWT token and return token data"""
+        """Verify JWT token and return token data.
+
+        Verified tokens are cached by hash until their own exp, so repeated
+        requests with the same token skip the decode and signature check.
+        """
+        cache = get_token_cache()
+        cache_key = cache.key(token)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return True, cached
+
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=["HS256"])
             token_data = TokenData(
                 username=payload["username"],
                 role=payload["role"],
-                exp=datetime.fromtimestamp(payload["exp"], UTC)
+                exp=datetime.fromtimestamp(payload["exp"], UTC),
+                user_id=str(payload["sub"]) if payload.get("sub") is not None else None
             )
+            cache.set(cache_key, token_data, float(payload["exp"]))
             return True, token_data
         except jwt.ExpiredSignatureError:
             return False, None
@@ -172,6 +186,27 @@ class AuthService:
             logger.error(f"Token verification error: {str(e)}")
             return False, None
 
+    async def authenticate_request(self, request) -> Optional[TokenData]:
+        """Verify the request's bearer token once per request.
+
+        The result (None when missing or invalid) is kept on
+        request.state.token_data for the other middleware and routes.
+        """
+        if hasattr(request.state, "token_data"):
+            return request.state.token_data
+
+        token_data = None
+        auth_header = request.headers.get("Authorization")
+        if auth_header:
+            parts = auth_header.split()
+            if len(parts) == 2 and parts[0].lower() == "bearer":
+                is_valid, token_data = await self.verify_token(parts[1])
+                if not is_valid:
+                    token_data = None
+
+        request.state.token_data = token_data
+        return token_data
+
     async def refresh_access_token(
         self,
         refresh_token: str
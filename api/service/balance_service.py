@@ -133,6 +133,7 @@ class BalanceService:
                     (TransactionStatus.SUCCESS.value, transaction_id),
                     fetch=False
                 )
+                await self.db.cache_invalidate_tags(f"user:{user_id}")
                 
                 # Return updated balance
                 return await self.get_balance(user_id, user_type)
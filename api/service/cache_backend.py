@@ -0,0 +1,409 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import time
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# "redis" for shared deployments, "memory" for a single node or tests
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "redis")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = 50
+REDIS_SOCKET_TIMEOUT = 2.0  # seconds, per command
+
+MEMORY_CACHE_MAX_ENTRIES = 10000
+
+# Keys removed per UNLINK while scanning or invalidating tags
+CACHE_DELETE_BATCH = 500
+# Tag sets outlive their members' TTLs; stale members are harmless
+CACHE_TAG_TTL = 86400  # seconds
+
+LOCK_TIMEOUT = 10          # seconds a lock is held before it expires
+LOCK_BLOCKING_TIMEOUT = 5  # seconds to wait for a held lock
+
+def key_prefix(key: str) -> str:
+    """Namespace a key is counted under ("cache" for "cache:abc")"""
+    return key.partition(":")[0] if ":" in key else ""
+
+class CacheLock:
+    """Handle for a held lock; release() is safe to call more than once"""
+
+    async def release(self) -> bool:
+        raise NotImplementedError
+
+class CacheBackend:
+    """Async key/value store behind DatabaseService's cache API.
+
+    Values are JSON-serializable objects; every method is a coroutine so
+    a remote backend never blocks the event loop.
+    """
+    name = "base"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, expire: int, tags: Iterable[str] = ()) -> bool:
+        """Store `value`; `tags` register the key for invalidate_tags()"""
+        raise NotImplementedError
+
+    async def set_many(self, items: Iterable[Tuple[str, Any]], expire: int) -> bool:
+        ok = True
+        for key, value in items:
+            ok = await self.set(key, value, expire) and ok
+        return ok
+
+    async def delete(self, *keys: str) -> int:
+        raise NotImplementedError
+
+    async def clear(self, pattern: str = "*") -> int:
+        raise NotImplementedError
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Delete every key registered under any of `tags`"""
+        raise NotImplementedError
+
+    async def count(self, prefix: str) -> int:
+        """Live keys under `prefix` (see key_prefix)"""
+        raise NotImplementedError
+
+    async def acquire_lock(
+        self,
+        key: str,
+        timeout: float = LOCK_TIMEOUT,
+        blocking_timeout: Optional[float] = LOCK_BLOCKING_TIMEOUT
+    ) -> Optional[CacheLock]:
+        """Lock `key` for `timeout` seconds, waiting at most `blocking_timeout`
+        (0 = don't wait, None = wait forever); None when not acquired"""
+        raise NotImplementedError
+
+    async def ping(self) -> bool:
+        return True
+
+    async def info(self) -> Dict:
+        return {"backend": self.name}
+
+    async def close(self):
+        pass
+
+class _RedisLock(CacheLock):
+    def __init__(self, lock):
+        self._lock = lock
+        self._held = True
+
+    async def release(self) -> bool:
+        if not self._held:
+            return False
+        self._held = False
+        try:
+            await self._lock.release()
+            return True
+        except Exception as e:
+            # Expired or taken over by another owner
+            logger.warning(f"Lock release error: {str(e)}")
+            return False
+
+class RedisCacheBackend(CacheBackend):
+    """redis.asyncio client on a shared connection pool.
+
+    Multi-key operations go out as one pipeline round trip. Besides the
+    value, set() records the key in a set per tag (tag:{tag}) and in a
+    sorted set per prefix (index:{prefix}) scored by expiry time, so tag
+    invalidation and key counts never walk the keyspace.
+    """
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL, max_connections: int = REDIS_MAX_CONNECTIONS):
+        import redis.asyncio as aioredis
+
+        self._pool = aioredis.ConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            decode_responses=True
+        )
+        self._redis = aioredis.Redis(connection_pool=self._pool)
+
+    @property
+    def client(self):
+        return self._redis
+
+    async def get(self, key: str) -> Optional[Any]:
+        data = await self._redis.get(key)
+        return json.loads(data) if data is not None else None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        values = await self._redis.mget(keys)
+        return [json.loads(v) if v is not None else None for v in values]
+
+    def _queue_set(self, pipe, key: str, value: Any, expire: int, tags: Iterable[str]):
+        pipe.set(key, json.dumps(value), ex=expire)
+        pipe.zadd(f"index:{key_prefix(key)}", {key: time.time() + expire})
+        for tag in tags:
+            pipe.sadd(f"tag:{tag}", key)
+            pipe.expire(f"tag:{tag}", CACHE_TAG_TTL)
+
+    async def set(self, key: str, value: Any, expire: int, tags: Iterable[str] = ()) -> bool:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            self._queue_set(pipe, key, value, expire, tags)
+            results = await pipe.execute()
+        return bool(results[0])
+
+    async def set_many(self, items: Iterable[Tuple[str, Any]], expire: int) -> bool:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items:
+                self._queue_set(pipe, key, value, expire, ())
+            results = await pipe.execute()
+        # Replies come in (SET, ZADD) pairs, one per key
+        return all(results[::2])
+
+    async def _unlink(self, keys: List[str]) -> int:
+        """UNLINK in batches, dropping the keys from their prefix index"""
+        removed = 0
+        for i in range(0, len(keys), CACHE_DELETE_BATCH):
+            batch = keys[i:i + CACHE_DELETE_BATCH]
+            by_prefix: Dict[str, List[str]] = {}
+            for key in batch:
+                by_prefix.setdefault(key_prefix(key), []).append(key)
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.unlink(*batch)
+                for prefix, members in by_prefix.items():
+                    pipe.zrem(f"index:{prefix}", *members)
+                results = await pipe.execute()
+            removed += results[0]
+        return removed
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self._unlink(list(keys))
+
+    async def clear(self, pattern: str = "*") -> int:
+        """SCAN for `pattern` and UNLINK batch by batch (never KEYS)"""
+        removed = 0
+        batch = []
+        async for key in self._redis.scan_iter(match=pattern, count=CACHE_DELETE_BATCH):
+            batch.append(key)
+            if len(batch) >= CACHE_DELETE_BATCH:
+                removed += await self._unlink(batch)
+                batch = []
+        if batch:
+            removed += await self._unlink(batch)
+        return removed
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        if not tags:
+            return 0
+        tag_keys = [f"tag:{tag}" for tag in tags]
+        keys = list(await self._redis.sunion(tag_keys))
+        removed = await self._unlink(keys) if keys else 0
+        await self._redis.unlink(*tag_keys)
+        return removed
+
+    async def count(self, prefix: str) -> int:
+        index = f"index:{prefix}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(index, "-inf", time.time())
+            pipe.zcard(index)
+            results = await pipe.execute()
+        return results[1]
+
+    async def acquire_lock(
+        self,
+        key: str,
+        timeout: float = LOCK_TIMEOUT,
+        blocking_timeout: Optional[float] = LOCK_BLOCKING_TIMEOUT
+    ) -> Optional[CacheLock]:
+        lock = self._redis.lock(
+            f"lock:{key}",
+            timeout=timeout,
+            blocking=blocking_timeout != 0,
+            blocking_timeout=blocking_timeout or None
+        )
+        if await lock.acquire():
+            return _RedisLock(lock)
+        return None
+
+    async def ping(self) -> bool:
+        return bool(await self._redis.ping())
+
+    async def info(self) -> Dict:
+        info = await self._redis.info()
+        return {
+            "backend": self.name,
+            "hits": info.get("keyspace_hits", 0),
+            "misses": info.get("keyspace_misses", 0),
+            "memory_used": info.get("used_memory", 0),
+            "uptime": info.get("uptime_in_seconds", 0),
+            "pool_connections": self._pool.max_connections
+        }
+
+    async def close(self):
+        # aclose() on redis-py 5, close() on 4.x
+        close = getattr(self._redis, "aclose", None) or self._redis.close
+        await close()
+        await self._pool.disconnect()
+
+class _MemoryLock(CacheLock):
+    def __init__(self, backend: "MemoryCacheBackend", key: str, token: str):
+        self._backend = backend
+        self._key = key
+        self._token = token
+
+    async def release(self) -> bool:
+        return self._backend._release(self._key, self._token)
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU store with expiry, for single-node deployments and tests"""
+    name = "memory"
+
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Set[str]] = {}
+        # key -> (token, expires_at)
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._lock_released: Dict[str, asyncio.Event] = {}
+        self._hits = 0
+        self._misses = 0
+        self._started = time.monotonic()
+
+    def _live(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self._untag(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def get(self, key: str) -> Optional[Any]:
+        data = self._live(key)
+        if data is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        # Stored serialized so callers never share mutable objects
+        return json.loads(data)
+
+    async def set(self, key: str, value: Any, expire: int, tags: Iterable[str] = ()) -> bool:
+        self._entries[key] = (time.monotonic() + expire, json.dumps(value))
+        self._entries.move_to_end(key)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+            self._key_tags.setdefault(key, set()).add(tag)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._untag(evicted)
+        return True
+
+    def _untag(self, key: str):
+        """Drop a removed key from its tag sets, and empty tag sets with it"""
+        for tag in self._key_tags.pop(key, ()):
+            members = self._tags.get(tag)
+            if members is None:
+                continue
+            members.discard(key)
+            if not members:
+                del self._tags[tag]
+
+    async def delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                removed += 1
+            self._untag(key)
+        return removed
+
+    async def clear(self, pattern: str = "*") -> int:
+        keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        return await self.delete(*keys)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        keys: Set[str] = set()
+        for tag in tags:
+            keys |= self._tags.pop(tag, set())
+        return await self.delete(*keys)
+
+    async def count(self, prefix: str) -> int:
+        now = time.monotonic()
+        return sum(
+            1 for key, (expires_at, _) in self._entries.items()
+            if expires_at > now and key_prefix(key) == prefix
+        )
+
+    def _try_lock(self, key: str, timeout: float) -> Optional[str]:
+        held = self._locks.get(key)
+        now = time.monotonic()
+        if held is not None and held[1] > now:
+            return None
+        token = uuid4().hex
+        self._locks[key] = (token, now + timeout)
+        return token
+
+    def _release(self, key: str, token: str) -> bool:
+        held = self._locks.get(key)
+        if held is None or held[0] != token:
+            return False
+        del self._locks[key]
+        event = self._lock_released.pop(key, None)
+        if event is not None:
+            event.set()
+        return True
+
+    async def acquire_lock(
+        self,
+        key: str,
+        timeout: float = LOCK_TIMEOUT,
+        blocking_timeout: Optional[float] = LOCK_BLOCKING_TIMEOUT
+    ) -> Optional[CacheLock]:
+        deadline = None if blocking_timeout is None else time.monotonic() + blocking_timeout
+        while True:
+            token = self._try_lock(key, timeout)
+            if token is not None:
+                return _MemoryLock(self, key, token)
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+
+            # Wake on release, or when the current holder's lease runs out
+            lease_left = self._locks[key][1] - time.monotonic()
+            wait = lease_left if remaining is None else min(lease_left, remaining)
+            event = self._lock_released.setdefault(key, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), max(wait, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def info(self) -> Dict:
+        return {
+            "backend": self.name,
+            "hits": self._hits,
+            "misses": self._misses,
+            "keys": len(self._entries),
+            "tags": len(self._tags),
+            "locks": len(self._locks),
+            "uptime": int(time.monotonic() - self._started)
+        }
+
+def create_cache_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    """Backend named by CACHE_BACKEND ("redis" or "memory")"""
+    if kind == "memory":
+        return MemoryCacheBackend()
+    if kind == "redis":
+        return RedisCacheBackend()
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -1,12 +1,47 @@
-from typing import Dict, Optional, Union, List
+from typing import Dict, Optional, Union, List, Tuple
+from pathlib import Path
+import asyncio
 import gzip
 import brotli
 import zlib
 import logging
+import mimetypes
 from datetime import datetime, UTC
 
 logger = logging.getLogger(__name__)
 
+# Bodies at least this large are compressed on a worker thread
+COMPRESS_OFFLOAD_THRESHOLD = 64 * 1024  # bytes
+
+# Static files get .br/.gz siblings at startup; these use maximum effort
+# since they are built once
+PRECOMPRESS_SUFFIXES = {".br": "br", ".gz": "gzip"}
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = 11
+
+class StreamEncoder:
+    """Incremental encoder: feed chunks to compress(), then call finish()"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+            self._zlib = None
+        else:
+            # wbits 31 = gzip container, 15 = zlib (what compress_data emits)
+            self._brotli = None
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31 if encoding == "gzip" else 15)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(chunk)
+        return self._zlib.compress(chunk)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
 class CompressionService:
     def __init__(self):
         self.startup_time = datetime.now(UTC)
@@ -123,6 +158,71 @@ class CompressionService:
             logger.error(f"Compression error: {str(e)}")
             return data, len(data)
 
+    async def compress_data_async(
+        self,
+        data: Union[str, bytes],
+        encoding: str,
+        settings: Optional[Dict] = None
+    ) -> Tuple[bytes, int]:
+        """compress_data, off the event loop for large bodies"""
+        if len(data) >= COMPRESS_OFFLOAD_THRESHOLD:
+            return await asyncio.to_thread(self.compress_data, data, encoding, settings)
+        return self.compress_data(data, encoding, settings)
+
+    def settings_for(self, encoding: str, settings: Optional[Dict] = None) -> Dict:
+        """Per-algorithm settings block for a Content-Encoding value"""
+        settings = settings or self.DEFAULT_SETTINGS
+        return settings["brotli" if encoding == "br" else encoding]
+
+    def create_encoder(self, encoding: str, settings: Optional[Dict] = None) -> StreamEncoder:
+        """Incremental encoder for responses too large to buffer"""
+        return StreamEncoder(encoding, self.encoding_level(encoding, settings))
+
+    def encoding_level(self, encoding: str, settings: Optional[Dict] = None) -> int:
+        """Level/quality used for an encoding (part of a variant's identity)"""
+        settings = settings or self.DEFAULT_SETTINGS
+        if encoding == "br":
+            return settings["brotli"]["quality"]
+        if encoding in ("gzip", "deflate"):
+            return settings[encoding]["level"]
+        return 0
+
+    def precompress_static(self, directory: Union[str, Path], settings: Optional[Dict] = None) -> int:
+        """Write .br/.gz siblings for compressible files under `directory`.
+
+        Siblings newer than their source are left alone, and variants
+        that would not be smaller are not written. Returns files written.
+        """
+        settings = settings or self.DEFAULT_SETTINGS
+        written = 0
+        for path in Path(directory).rglob("*"):
+            if not path.is_file() or path.suffix in PRECOMPRESS_SUFFIXES:
+                continue
+            content_type = mimetypes.guess_type(path.name)[0] or ""
+            size = path.stat().st_size
+            if not self.should_compress(content_type, size, settings):
+                continue
+
+            data = None
+            for suffix, encoding in PRECOMPRESS_SUFFIXES.items():
+                target = path.with_name(path.name + suffix)
+                if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                    continue
+                try:
+                    data = data if data is not None else path.read_bytes()
+                    if encoding == "br":
+                        compressed = brotli.compress(data, quality=PRECOMPRESS_BROTLI_QUALITY)
+                    else:
+                        compressed = gzip.compress(data, PRECOMPRESS_GZIP_LEVEL, mtime=0)
+                    if len(compressed) >= len(data):
+                        target.unlink(missing_ok=True)
+                        continue
+                    target.write_bytes(compressed)
+                    written += 1
+                except Exception as e:
+                    logger.error(f"Precompression error for {path}: {str(e)}")
+        return written
+
     def _gzip_compress(self, data: bytes, level: int) -> Tuple[bytes, int]:
         """Compress data using gzip"""
         try:
@@ -1,25 +1,29 @@
-from typing import Optional, Dict, List, Any, Union
+from typing import Optional, Dict, List, Any, Union, Callable, Iterable
 from datetime import datetime, UTC, timedelta
 import logging
-import json
 import sqlite3
-import redis
-from redis.lock import Lock
+
+from async_db import get_db
+from db_pool import get_pool
+from .cache_backend import (
+    CacheBackend, CacheLock, create_cache_backend,
+    LOCK_TIMEOUT, LOCK_BLOCKING_TIMEOUT
+)
 
 logger = logging.getLogger(__name__)
 
 class DatabaseService:
     _instance = None
-    _conn = None
-    _redis = None
+    _cache: Optional[CacheBackend] = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseService, cls).__new__(cls)
+            cls._instance.initialized = False
         return cls._instance
 
     def __init__(self):
-        if not self._conn:
+        if not self.initialized:
             self.startup_time = datetime.now(UTC)
             logger.info(f"""
             DatabaseService initialized:
@@ -27,51 +31,40 @@ class DatabaseService:
             User: fdygg
             """)
             
-            # Init SQLite
-            self._init_sqlite()
+            # SQLite goes through the shared async executor
+            self.db = get_db()
             
-            # Init Redis
-            self._init_redis()
-
-    def _init_sqlite(self):
-        """Initialize SQLite connection"""
-        try:
-            self._conn = sqlite3.connect('shop.db', check_same_thread=False)
-            self._conn.row_factory = sqlite3.Row
-            cursor = self._conn.cursor()
-            cursor.execute("PRAGMA foreign_keys = ON")
-            cursor.execute("PRAGMA journal_mode = WAL")
-            logger.info("SQLite initialized successfully")
-        except Exception as e:
-            logger.error(f"SQLite initialization error: {str(e)}")
-            raise
+            # Cache backend (see cache_backend.CACHE_BACKEND)
+            self._init_cache()
+            self._invalidation_listeners: List[Callable] = []
+            self.initialized = True
 
-    def _init_redis(self):
-        """Initialize Redis connection"""
+    def _init_cache(self):
+        """Create the cache backend; connections are opened lazily"""
         try:
-            self._redis = redis.Redis(
-                host='localhost',
-                port=6379,
-                db=0,
-                decode_responses=True
-            )
-            self._redis.ping()
-            logger.info("Redis initialized successfully") 
+            self._cache = create_cache_backend()
+            logger.info(f"Cache backend initialized: {self._cache.name}")
         except Exception as e:
-            logger.error(f"Redis initialization error: {str(e)}")
+            logger.error(f"Cache backend initialization error: {str(e)}")
             raise
 
     def get_connection(self) -> sqlite3.Connection:
-        """Get SQLite connection"""
-        if not self._conn:
-            self._init_sqlite()
-        return self._conn
+        """Get a pooled read-only SQLite connection (close() returns it to the pool).
 
-    def get_redis(self) -> redis.Redis:
-        """Get Redis connection"""
-        if not self._redis:
-            self._init_redis()
-        return self._redis
+        Writes must go through self.db.write, whose writer thread owns the
+        only write connection.
+        """
+        return get_pool(readonly=True).acquire()
+
+    def get_cache(self) -> CacheBackend:
+        """Get the cache backend"""
+        if not self._cache:
+            self._init_cache()
+        return self._cache
+
+    def get_redis(self):
+        """Underlying redis.asyncio client (None on the memory backend)"""
+        return getattr(self.get_cache(), "client", None)
 
     async def execute_query(
         self,
@@ -80,18 +73,14 @@ class DatabaseService:
         fetch: bool = True
     ) -> Optional[List[Dict]]:
         """Execute SQL query"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(query, params or ())
             if fetch:
-                result = [dict(row) for row in cursor.fetchall()]
-                return result
-            conn.commit()
+                rows = await self.db.fetchall(query, params or ())
+                return [dict(row) for row in rows]
+            await self.db.execute(query, params or ())
             return None
         except sqlite3.Error as e:
             logger.error(f"Query execution failed: {str(e)}")
-            conn.rollback()
             raise
 
     async def cache_get(
@@ -101,35 +90,58 @@ class DatabaseService:
     ) -> Any:
         """Get value from cache"""
         try:
-            data = self._redis.get(key)
-            if data:
-                return json.loads(data)
+            data = await self._cache.get(key)
+            if data is not None:
+                return data
             return default
         except Exception as e:
             logger.error(f"Cache get error: {str(e)}")
             return default
 
+    async def cache_get_many(
+        self,
+        keys: List[str]
+    ) -> List[Any]:
+        """Get several values in one round trip (None for misses)"""
+        try:
+            return await self._cache.get_many(keys)
+        except Exception as e:
+            logger.error(f"Cache get_many error: {str(e)}")
+            return [None] * len(keys)
+
     async def cache_set(
         self,
         key: str,  
         value: Any,
-        expire: int = 3600
+        expire: int = 3600,
+        tags: Optional[List[str]] = None
     ) -> bool:
-        """Set value in cache"""
+        """Set value in cache, registered under `tags` for invalidation"""
         try:
-            data = json.dumps(value)
-            return self._redis.setex(key, expire, data)
+            return await self._cache.set(key, value, expire, tags or ())
         except Exception as e:
             logger.error(f"Cache set error: {str(e)}")
             return False
 
+    async def cache_set_many(
+        self,
+        items: Dict[str, Any],
+        expire: int = 3600
+    ) -> bool:
+        """Set several values in one round trip"""
+        try:
+            return await self._cache.set_many(items.items(), expire)
+        except Exception as e:
+            logger.error(f"Cache set_many error: {str(e)}")
+            return False
+
     async def cache_delete(
         self,
         key: str
     ) -> bool:
         """Delete value from cache"""
         try:
-            return bool(self._redis.delete(key))
+            return bool(await self._cache.delete(key))
         except Exception as e:
             logger.error(f"Cache delete error: {str(e)}")
             return False
@@ -138,30 +150,73 @@ class DatabaseService:
         self,
         pattern: str = "*"
     ) -> bool:
-        """Clear cache entries matching pattern"""
+        """Clear cache entries matching pattern (incremental SCAN + UNLINK).
+
+        Prefer cache_invalidate_tags when the affected entries are known.
+        """
         try:
-            keys = self._redis.keys(pattern)
-            if keys:
-                return bool(self._redis.delete(*keys))
+            self._notify_invalidation((), pattern)
+            await self._cache.clear(pattern)
             return True
         except Exception as e:
             logger.error(f"Cache clear error: {str(e)}")
             return False
 
+    async def cache_invalidate_tags(self, *tags: str) -> int:
+        """Delete every entry registered under any of `tags`"""
+        try:
+            self._notify_invalidation(tags, None)
+            return await self._cache.invalidate_tags(*tags)
+        except Exception as e:
+            logger.error(f"Cache invalidate error: {str(e)}")
+            return 0
+
+    def add_invalidation_listener(self, listener: Callable[[Iterable[str], Optional[str]], None]):
+        """Call listener(tags, pattern) on every invalidation, e.g. to drop
+        copies kept in process memory"""
+        self._invalidation_listeners.append(listener)
+
+    def _notify_invalidation(self, tags: Iterable[str], pattern: Optional[str]):
+        for listener in self._invalidation_listeners:
+            try:
+                listener(tags, pattern)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+
+    async def cache_count(self, prefix: str = "cache") -> int:
+        """Number of live keys under `prefix`"""
+        try:
+            return await self._cache.count(prefix)
+        except Exception as e:
+            logger.error(f"Cache count error: {str(e)}")
+            return 0
+
+    async def cache_info(self) -> Dict:
+        """Backend statistics"""
+        try:
+            return await self._cache.info()
+        except Exception as e:
+            logger.error(f"Cache info error: {str(e)}")
+            return {}
+
     async def acquire_lock(
         self,
         key: str,
-        timeout: int = 10
-    ) -> Optional[Lock]:
-        """Acquire distributed lock"""
+        timeout: int = LOCK_TIMEOUT,
+        blocking_timeout: Optional[float] = LOCK_BLOCKING_TIMEOUT
+    ) -> Optional[CacheLock]:
+        """Acquire distributed lock, waiting at most blocking_timeout seconds.
+
+        Returns None when the lock could not be acquired in time; release
+        the returned lock with `await lock.release()`.
+        """
         try:
-            lock = self._redis.lock(
-                f"lock:{key}",
-                timeout=timeout
-            )
-            if lock.acquire(blocking=True):
-                return lock
-            return None
+            return await self._cache.acquire_lock(key, timeout, blocking_timeout)
         except Exception as e:
             logger.error(f"Lock acquisition error: {str(e)}")
             return None
+
+    async def close(self):
+        """Close cache connections"""
+        if self._cache:
+            await self._cache.close()
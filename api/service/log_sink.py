@@ -0,0 +1,242 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, UTC
+import asyncio
+import logging
+import random
+import time
+from uuid import uuid4
+
+from async_db import get_db
+from ..models.logs import Log
+from ..models.audit import AuditAction, AuditCategory
+
+logger = logging.getLogger(__name__)
+
+# Queue and batching
+LOG_SINK_QUEUE_SIZE = 10000
+LOG_SINK_BATCH_SIZE = 200       # rows per flush
+LOG_SINK_FLUSH_INTERVAL = 1.0   # seconds before a partial batch is flushed
+
+# When the queue is full: "drop" the record or "block" the caller up to the timeout
+LOG_SINK_FULL_POLICY = "drop"
+LOG_SINK_BLOCK_TIMEOUT = 0.5    # seconds
+
+# Fraction of successful GET requests that are logged (errors are always kept)
+LOG_SINK_GET_SAMPLE_RATE = 0.1
+
+INSERT_LOG = """
+INSERT INTO logs (
+    id, level, category, message,
+    source, timestamp, user_id, ip_address,
+    metadata, stack_trace
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_AUDIT = """
+INSERT INTO audit_logs (
+    id, category, action, actor_id,
+    actor_type, target_id, target_type,
+    description, metadata, created_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+class LogSink:
+    """Write-behind sink for API request logs and audit records.
+
+    Callers enqueue rows without waiting on SQLite; a background task
+    drains the bounded queue and inserts each table's rows with one
+    executemany per batch, flushing when LOG_SINK_BATCH_SIZE rows are
+    waiting or LOG_SINK_FLUSH_INTERVAL has passed.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(LogSink, cls).__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(
+        self,
+        queue_size: int = LOG_SINK_QUEUE_SIZE,
+        batch_size: int = LOG_SINK_BATCH_SIZE,
+        flush_interval: float = LOG_SINK_FLUSH_INTERVAL,
+        full_policy: str = LOG_SINK_FULL_POLICY,
+        get_sample_rate: float = LOG_SINK_GET_SAMPLE_RATE
+    ):
+        if self.initialized:
+            return
+
+        if full_policy not in ("drop", "block"):
+            raise ValueError(f"Invalid log sink policy: {full_policy}")
+
+        self.db = get_db()
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.get_sample_rate = get_sample_rate
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._metrics = {
+            "enqueued": 0,
+            "dropped": 0,
+            "sampled_out": 0,
+            "written": 0,
+            "batches": 0,
+            "flush_errors": 0,
+            "total_flush_time": 0.0,
+            "max_flush_time": 0.0
+        }
+        self.initialized = True
+
+    def _ensure_writer(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    def should_log_request(self, method: str, status_code: int) -> bool:
+        """Sampling decision for a finished request"""
+        if method != "GET" or status_code >= 400:
+            return True
+        if random.random() < self.get_sample_rate:
+            return True
+        self._metrics["sampled_out"] += 1
+        return False
+
+    async def _enqueue(self, table: str, row: Tuple) -> bool:
+        self._ensure_writer()
+        try:
+            if self.full_policy == "block":
+                await asyncio.wait_for(self._queue.put((table, row)), LOG_SINK_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait((table, row))
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self._metrics["dropped"] += 1
+            return False
+        self._metrics["enqueued"] += 1
+        return True
+
+    async def log(self, log: Log) -> bool:
+        """Queue a logs row (same columns as LogService.create_log)"""
+        return await self._enqueue("logs", (
+            f"log_{uuid4().hex[:8]}",
+            log.level.value,
+            log.category.value,
+            log.message,
+            log.source,
+            log.timestamp or datetime.now(UTC),
+            log.user_id,
+            log.ip_address,
+            str(log.metadata),
+            log.stack_trace
+        ))
+
+    async def audit(
+        self,
+        category: AuditCategory,
+        action: AuditAction,
+        actor_id: str,
+        actor_type: str,
+        target_id: Optional[str],
+        target_type: str,
+        description: str,
+        metadata: Optional[Dict] = None
+    ) -> bool:
+        """Queue an audit_logs row (same columns as AuditService.log_action)"""
+        return await self._enqueue("audit_logs", (
+            f"adt_{uuid4().hex[:8]}",
+            category.value,
+            action.value,
+            actor_id,
+            actor_type,
+            target_id,
+            target_type,
+            description,
+            str(metadata or {}),
+            datetime.now(UTC)
+        ))
+
+    async def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Do not lose rows already taken off the queue
+                if batch:
+                    await self._write(batch)
+                raise
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[str, Tuple]]):
+        logs = [row for table, row in batch if table == "logs"]
+        audits = [row for table, row in batch if table == "audit_logs"]
+
+        def _insert(conn):
+            if logs:
+                conn.executemany(INSERT_LOG, logs)
+            if audits:
+                conn.executemany(INSERT_AUDIT, audits)
+
+        start = time.monotonic()
+        try:
+            await self.db.write(_insert)
+            self._metrics["written"] += len(batch)
+        except Exception as e:
+            self._metrics["flush_errors"] += 1
+            logger.error(f"Log sink flush error ({len(batch)} rows lost): {str(e)}")
+        finally:
+            elapsed = time.monotonic() - start
+            self._metrics["batches"] += 1
+            self._metrics["total_flush_time"] += elapsed
+            self._metrics["max_flush_time"] = max(self._metrics["max_flush_time"], elapsed)
+
+    async def flush(self):
+        """Write everything queued so far"""
+        if self._queue is None:
+            return
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            if len(batch) >= self.batch_size:
+                await self._write(batch)
+                batch = []
+        if batch:
+            await self._write(batch)
+
+    async def close(self):
+        """Stop the writer and flush remaining records"""
+        if self._writer:
+            self._writer.cancel()
+            # Let it write the batch it had already taken off the queue
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await self.flush()
+
+    def get_metrics(self) -> Dict:
+        batches = self._metrics["batches"]
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "policy": self.full_policy,
+            "enqueued": self._metrics["enqueued"],
+            "dropped": self._metrics["dropped"],
+            "sampled_out": self._metrics["sampled_out"],
+            "written": self._metrics["written"],
+            "batches": batches,
+            "flush_errors": self._metrics["flush_errors"],
+            "avg_flush_ms": (self._metrics["total_flush_time"] / batches * 1000) if batches else 0.0,
+            "max_flush_ms": self._metrics["max_flush_time"] * 1000
+        }
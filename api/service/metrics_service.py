@@ -14,7 +14,19 @@ from .database_service import DatabaseService
 logger = logging.getLogger(__name__)
 
 class MetricsService:
+    # Shared so every middleware reports into the one exported registry
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsService, cls).__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
     def __init__(self):
+        if self.initialized:
+            return
+
         self.logs = LogService()
         self.db = DatabaseService()
         self.startup_time = datetime.now(UTC)
@@ -60,12 +72,26 @@ class MetricsService:
             'System CPU usage percentage',
             registry=self.registry
         )
+
+        self.cache_lookups = Counter(
+            'http_cache_lookups_total',
+            'Response cache lookups by result (hit, stale, miss, coalesced)',
+            ['result', 'tier'],
+            registry=self.registry
+        )
+
+        self.cache_not_modified = Counter(
+            'http_cache_not_modified_total',
+            'Conditional requests answered with 304 Not Modified',
+            registry=self.registry
+        )
         
         logger.info(f"""
         MetricsService initialized:
         Time: 2025-05-30 14:58:22
         User: fdygg
         """)
+        self.initialized = True
 
     async def record_request_start(
         self,
@@ -99,6 +125,14 @@ class MetricsService:
             endpoint=endpoint
         ).observe(size)
 
+    def record_cache_lookup(self, result: str, tier: str = "") -> None:
+        """Count a response cache lookup (synchronous: hot path)"""
+        self.cache_lookups.labels(result=result, tier=tier).inc()
+
+    def record_not_modified(self) -> None:
+        """Count a 304 served from the response cache"""
+        self.cache_not_modified.inc()
+
     async def update_system_metrics(self) -> None:
         """Update system metrics"""
         try:
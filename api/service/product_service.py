@@ -19,6 +19,10 @@ class ProductService:
         User: fdygg
         """)
 
+    async def _invalidate_cache(self, code: str):
+        """Drop cached API responses for this product and product lists"""
+        await self.db.cache_invalidate_tags(f"product:{code}", "products")
+
     async def create_product(
         self,
         product: ProductCreate,
@@ -57,6 +61,7 @@ class ProductService:
                 ),
                 fetch=False
             )
+            await self._invalidate_cache(product.code)
             
             return await self.get_product_by_code(product.code)
 
@@ -150,6 +155,7 @@ class ProductService:
             """
             
             await self.db.execute_query(query, tuple(params), fetch=False)
+            await self._invalidate_cache(code)
             return await self.get_product_by_code(code)
 
         except Exception as e:
@@ -240,6 +246,7 @@ class ProductService:
                 (ProductStatus.INACTIVE.value, datetime.now(UTC), code),
                 fetch=False
             )
+            await self._invalidate_cache(code)
             return True
         except Exception as e:
             logger.error(f"Error deleting product: {str(e)}")
@@ -1,26 +1,55 @@
 from datetime import datetime, UTC
 from typing import Dict, Optional, Tuple
+import asyncio
+import json
 import logging
-from .database_service import DatabaseService
+import math
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Buckets whose theoretical arrival time has passed are full and get dropped
+RATE_LIMIT_SWEEP_INTERVAL = 60  # seconds
+
+# Optional write-behind snapshot so limits survive restarts (None = disabled)
+RATE_LIMIT_SNAPSHOT_FILE = os.environ.get("RATE_LIMIT_SNAPSHOT_FILE")
+RATE_LIMIT_SNAPSHOT_INTERVAL = 30  # seconds
+
 class RateLimitService:
+    """In-process GCRA rate limiter.
+
+    Each (subject, endpoint) bucket is a single float, the theoretical
+    arrival time (TAT) of the next request, so a check is O(1) and never
+    touches the database. A missing bucket is a full one, which lets idle
+    buckets be swept away once their TAT is in the past.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RateLimitService, cls).__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
     def __init__(self):
-        self.db = DatabaseService()
+        if self.initialized:
+            return
+
         self.startup_time = datetime.now(UTC)
         logger.info(f"""
         RateLimitService initialized:
         Time: 2025-05-30 14:39:23
         User: fdygg
         """)
-        
+
         # Default limits
         self.DEFAULT_RATE_LIMIT = {
             "requests": 100,  # requests
             "window": 60      # seconds
         }
-        
+
         # Special limits for specific endpoints
         self.ENDPOINT_LIMITS = {
             "/api/auth/login": {
@@ -32,7 +61,7 @@ class RateLimitService:
                 "window": 60
             }
         }
-        
+
         # Role-based limits
         self.ROLE_LIMITS = {
             "admin": {
@@ -53,94 +82,175 @@ class RateLimitService:
             }
         }
 
-    async def get_rate_limit(self, user_id: str, endpoint: str) -> Dict:
-        """Get rate limit for user and endpoint"""
-        # Get user role from auth service
-        user_query = "SELECT role FROM users WHERE id = ?"
-        user_result = await self.db.execute_query(user_query, (user_id,))
-        user_role = user_result[0]["role"] if user_result else "web_user"
-        
+        self._buckets: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._stats = {"allowed": 0, "limited": 0, "expired": 0}
+
+        if RATE_LIMIT_SNAPSHOT_FILE:
+            self.load_snapshot(RATE_LIMIT_SNAPSHOT_FILE)
+
+        self.initialized = True
+
+    async def get_rate_limit(self, user_id: str, endpoint: str, role: Optional[str] = None) -> Dict:
+        """Get rate limit for user and endpoint.
+
+        The role comes from the caller's verified token; unauthenticated
+        requests fall back to the web_user limits.
+        """
         # Get endpoint specific limit
         if endpoint in self.ENDPOINT_LIMITS:
             return self.ENDPOINT_LIMITS[endpoint]
-            
+
         # Get role based limit
-        if user_role in self.ROLE_LIMITS:
-            return self.ROLE_LIMITS[user_role]
-            
+        if (role or "web_user") in self.ROLE_LIMITS:
+            return self.ROLE_LIMITS[role or "web_user"]
+
         # Return default limit
         return self.DEFAULT_RATE_LIMIT
 
+    @staticmethod
+    def _bucket_key(user_id: str, endpoint: str, ip_address: str) -> str:
+        subject = f"user:{user_id}" if user_id and user_id != "anonymous" else f"ip:{ip_address}"
+        return f"{subject}|{endpoint}"
+
+    def _consume(self, key: str, max_requests: int, window: int, now: float) -> Tuple[bool, int, float, float]:
+        """GCRA step: (allowed, remaining, reset_at, retry_after)"""
+        interval = window / max_requests
+        with self._lock:
+            tat = max(self._buckets.get(key, now), now)
+            new_tat = tat + interval
+            allow_at = new_tat - window
+
+            if allow_at > now:
+                # Leave the bucket untouched when rejecting
+                remaining = 0
+                reset_at = tat
+                retry_after = allow_at - now
+                allowed = False
+            else:
+                self._buckets[key] = new_tat
+                self._dirty = True
+                remaining = int((window - (new_tat - now)) // interval)
+                reset_at = new_tat
+                retry_after = 0.0
+                allowed = True
+
+            if now - self._last_sweep >= RATE_LIMIT_SWEEP_INTERVAL:
+                self._sweep(now)
+
+        return allowed, remaining, reset_at, retry_after
+
+    def _sweep(self, now: float):
+        # Caller holds self._lock
+        expired = [key for key, tat in self._buckets.items() if tat <= now]
+        for key in expired:
+            del self._buckets[key]
+        self._stats["expired"] += len(expired)
+        self._last_sweep = now
+
     async def check_rate_limit(
         self,
         user_id: str,
         endpoint: str,
-        ip_address: str
+        ip_address: str,
+        role: Optional[str] = None
     ) -> Tuple[bool, Dict]:
-        """Check if request is within rate limit"""
+        """Check and count a request against its bucket"""
         try:
             # Get rate limit rules
-            limit = await self.get_rate_limit(user_id, endpoint)
+            limit = await self.get_rate_limit(user_id, endpoint, role)
             window = limit["window"]
             max_requests = limit["requests"]
-            
-            # Calculate window start
-            now = datetime.now(UTC)
-            window_start = now.timestamp() - window
-            
-            # Count requests in window
-            query = """
-            SELECT COUNT(*) as request_count 
-            FROM rate_limit_logs
-            WHERE (user_id = ? OR ip_address = ?)
-            AND endpoint = ?
-            AND timestamp > ?
-            """
-            
-            result = await self.db.execute_query(
-                query,
-                (user_id, ip_address, endpoint, window_start)
+
+            key = self._bucket_key(user_id, endpoint, ip_address)
+            allowed, remaining, reset_at, retry_after = self._consume(
+                key, max_requests, window, time.time()
             )
-            
-            request_count = result[0]["request_count"]
-            
-            # Check if within limit
-            remaining = max_requests - request_count
-            reset_time = datetime.fromtimestamp(window_start + window, UTC)
-            
-            return remaining > 0, {
+            self._stats["allowed" if allowed else "limited"] += 1
+
+            if RATE_LIMIT_SNAPSHOT_FILE:
+                self._ensure_snapshot_task()
+
+            return allowed, {
                 "limit": max_requests,
                 "remaining": remaining,
-                "reset": reset_time.isoformat(),
-                "window": window
+                "reset": datetime.fromtimestamp(reset_at, UTC).isoformat(),
+                "window": window,
+                "retry_after": math.ceil(retry_after)
             }
-            
+
         except Exception as e:
             logger.error(f"Rate limit check error: {str(e)}")
-            return True, self.DEFAULT_RATE_LIMIT
+            return True, {
+                "limit": self.DEFAULT_RATE_LIMIT["requests"],
+                "remaining": self.DEFAULT_RATE_LIMIT["requests"],
+                "reset": datetime.now(UTC).isoformat(),
+                "window": self.DEFAULT_RATE_LIMIT["window"],
+                "retry_after": 0
+            }
 
-    async def log_request(
-        self,
-        user_id: str,
-        endpoint: str,
-        ip_address: str
-    ) -> bool:
-        """Log rate limited request"""
+    def reset(self, user_id: str, endpoint: str, ip_address: str):
+        """Forget a bucket (e.g. after a successful login)"""
+        with self._lock:
+            self._buckets.pop(self._bucket_key(user_id, endpoint, ip_address), None)
+
+    def _ensure_snapshot_task(self):
+        if self._snapshot_task is None or self._snapshot_task.done():
+            self._snapshot_task = asyncio.get_running_loop().create_task(self._snapshot_loop())
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(RATE_LIMIT_SNAPSHOT_INTERVAL)
+            if self._dirty:
+                await asyncio.to_thread(self.save_snapshot, RATE_LIMIT_SNAPSHOT_FILE)
+
+    def save_snapshot(self, path: str) -> int:
+        """Write live buckets to `path` atomically; returns bucket count"""
+        now = time.time()
+        with self._lock:
+            buckets = {key: tat for key, tat in self._buckets.items() if tat > now}
+            self._dirty = False
         try:
-            query = """
-            INSERT INTO rate_limit_logs (
-                user_id, endpoint, ip_address, timestamp
-            ) VALUES (?, ?, ?, ?)
-            """
-            
-            await self.db.execute_query(
-                query,
-                (user_id, endpoint, ip_address, datetime.now(UTC).timestamp()),
-                fetch=False
-            )
-            
-            return True
-            
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"saved_at": now, "buckets": buckets}, f)
+            os.replace(tmp_path, path)
+            return len(buckets)
         except Exception as e:
-            logger.error(f"Rate limit log error: {str(e)}")
-            return False
\ No newline at end of file
+            logger.error(f"Rate limit snapshot save error: {str(e)}")
+            return 0
+
+    def load_snapshot(self, path: str) -> int:
+        """Restore buckets written by save_snapshot; returns bucket count"""
+        try:
+            if not os.path.exists(path):
+                return 0
+            with open(path) as f:
+                data = json.load(f)
+            now = time.time()
+            buckets = {key: float(tat) for key, tat in data.get("buckets", {}).items() if float(tat) > now}
+            with self._lock:
+                self._buckets.update(buckets)
+            logger.info(f"Restored {len(buckets)} rate limit buckets from {path}")
+            return len(buckets)
+        except Exception as e:
+            logger.error(f"Rate limit snapshot load error: {str(e)}")
+            return 0
+
+    async def close(self):
+        """Stop the snapshot task and write a final snapshot"""
+        if self._snapshot_task:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if RATE_LIMIT_SNAPSHOT_FILE:
+            await asyncio.to_thread(self.save_snapshot, RATE_LIMIT_SNAPSHOT_FILE)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "buckets": len(self._buckets),
+                **self._stats
+            }
@@ -1,11 +1,23 @@
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 import logging
+import time
 from datetime import datetime, UTC
 from .database_service import DatabaseService
 
 logger = logging.getLogger(__name__)
 
+# Cached settings are re-read after this long, so changes made by
+# another process are picked up without a notification
+SETTINGS_CACHE_TTL = 60  # seconds
+
 class SettingsService:
+    # Shared by every instance: the active compression settings, when
+    # they were loaded, and who to tell when they change
+    _compression_settings: Optional[Dict] = None
+    _compression_loaded_at = 0.0
+    _compression_version = 0
+    _listeners: List[Callable[[Dict, int], None]] = []
+
     def __init__(self):
         self.db = DatabaseService()
         self.startup_time = datetime.now(UTC)
@@ -15,7 +27,40 @@ class SettingsService:
         User: fdygg
         """)
 
+    @classmethod
+    def add_compression_listener(cls, listener: Callable[[Dict, int], None]):
+        """Call listener(settings, version) whenever the settings change"""
+        cls._listeners.append(listener)
+
+    @classmethod
+    def compression_version(cls) -> int:
+        return cls._compression_version
+
+    @classmethod
+    def _set_compression_settings(cls, settings: Dict):
+        changed = settings != cls._compression_settings
+        cls._compression_settings = settings
+        cls._compression_loaded_at = time.monotonic()
+        if changed:
+            cls._compression_version += 1
+            for listener in cls._listeners:
+                try:
+                    listener(settings, cls._compression_version)
+                except Exception as e:
+                    logger.error(f"Compression settings listener error: {str(e)}")
+
     async def get_compression_settings(self) -> Dict:
+        """Get compression settings (cached; see SETTINGS_CACHE_TTL)"""
+        cls = type(self)
+        if (cls._compression_settings is not None and
+                time.monotonic() - cls._compression_loaded_at < SETTINGS_CACHE_TTL):
+            return cls._compression_settings
+
+        settings = await self._load_compression_settings()
+        cls._set_compression_settings(settings)
+        return settings
+
+    async def _load_compression_settings(self) -> Dict:
         """Get compression settings from database"""
         try:
             query = "SELECT * FROM compression_settings WHERE is_active = 1"
@@ -93,6 +138,9 @@ class SettingsService:
             )
             
             await self.db.execute_query(query, values, fetch=False)
+
+            # Reload what was stored and notify listeners
+            type(self)._set_compression_settings(await self._load_compression_settings())
             return True
             
         except Exception as e:
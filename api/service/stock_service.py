@@ -60,7 +60,11 @@ class StockService:
                 )
                 if added_item:
                     added_items.append(added_item)
-                    
+
+            # Stock counts appear in product detail and list responses
+            await self.db.cache_invalidate_tags(
+                f"product:{stock_request.product_code}", "products"
+            )
             return True, added_items
         except Exception as e:
             logger.error(f"Error adding stock: {str(e)}")
@@ -148,6 +152,10 @@ class StockService:
                 ),
                 fetch=False
             )
+
+            item = await self.get_stock_by_id(stock_id)
+            if item:
+                await self.db.cache_invalidate_tags(f"product:{item.product_code}", "products")
             return True
         except Exception as e:
             logger.error(f"Error updating stock status: {str(e)}")
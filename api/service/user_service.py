@@ -3,6 +3,7 @@ from datetime import datetime, UTC
 import logging
 from uuid import uuid4
 from .database_service import DatabaseService
+from .auth_cache import get_permission_cache
 from ..models.user import (
     UserCreate, UserResponse, UserUpdate,
     UserType, UserRole, UserStatus
@@ -172,6 +173,7 @@ class UserService:
             """
             
             await self.db.execute_query(query, tuple(params), fetch=False)
+            get_permission_cache().invalidate(user_id)
             return await self.get_user_by_id(user_id)
 
         except Exception as e:
@@ -194,6 +196,7 @@ class UserService:
                 (UserStatus.INACTIVE.value, datetime.now(UTC), user_id),
                 fetch=False
             )
+            get_permission_cache().invalidate(user_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting user: {str(e)}")
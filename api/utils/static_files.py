@@ -0,0 +1,43 @@
+import os
+import logging
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+
+from ..service.compression_service import CompressionService, PRECOMPRESS_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves the .br/.gz sibling built by
+    CompressionService.precompress_static when the client accepts it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compression_service = CompressionService()
+
+    async def get_response(self, path: str, scope) -> FileResponse:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200:
+            return response
+
+        accepted = self.compression_service.get_accepted_encodings(
+            Headers(scope=scope).get("accept-encoding", "")
+        )
+        for suffix, encoding in PRECOMPRESS_SUFFIXES.items():
+            if encoding not in accepted:
+                continue
+            sibling = f"{response.path}{suffix}"
+            try:
+                stat_result = os.stat(sibling)
+            except OSError:
+                continue
+            return FileResponse(
+                sibling,
+                stat_result=stat_result,
+                media_type=response.media_type,
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            )
+
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
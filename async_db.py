@@ -0,0 +1,387 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlite3
+
+from db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+READER_THREADS = 4
+
+# Group commit: once a write is queued the writer waits up to
+# WRITE_MAX_LATENCY seconds for more, then commits up to WRITE_MAX_BATCH
+# closures in one transaction (one fsync)
+WRITE_MAX_LATENCY = 0.002
+WRITE_MAX_BATCH = 64
+
+_local = threading.local()
+
+
+def on_commit(callback: Callable[[], Any]):
+    """Run callback on the writer thread once the current write commits.
+
+    Only valid inside a write closure; callbacks are dropped on rollback.
+    """
+    hooks = getattr(_local, 'commit_hooks', None)
+    if hooks is None:
+        raise RuntimeError("on_commit() called outside of a write transaction")
+    hooks.append(callback)
+
+
+def _run_commit_hooks(hooks: List[Callable[[], Any]]):
+    for hook in hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Commit hook failed: {e}")
+
+
+class _ExecutorStats:
+    """Queue depth and wait/run time counters for one executor"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    def on_submit(self):
+        with self._lock:
+            self.submitted += 1
+
+    def on_start(self, wait: float):
+        with self._lock:
+            self.started += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def on_finish(self, run: float, ok: bool):
+        with self._lock:
+            self.completed += 1
+            if not ok:
+                self.failed += 1
+            self.total_run += run
+            self.max_run = max(self.max_run, run)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'queue_depth': self.submitted - self.started,
+                'running': self.started - self.completed,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_wait_ms': (self.total_wait / self.started * 1000) if self.started else 0.0,
+                'max_wait_ms': self.max_wait * 1000,
+                'avg_run_ms': (self.total_run / self.completed * 1000) if self.completed else 0.0,
+                'max_run_ms': self.max_run * 1000
+            }
+
+
+class _WriteJob:
+    __slots__ = ("fn", "solo", "future", "submitted_at")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any], solo: bool = False):
+        self.fn = fn
+        self.solo = solo
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class _GroupCommitWriter:
+    """The one thread that writes to SQLite, committing closures in groups.
+
+    Queued closures share a BEGIN IMMEDIATE transaction, each inside its own
+    SAVEPOINT: a closure that raises is rolled back alone and only its
+    caller gets the exception, while the rest commit together. If the shared
+    transaction itself fails (e.g. the commit), nothing was applied and the
+    closures are retried one transaction each.
+
+    The writer owns the process's only write connection for its lifetime.
+    Solo jobs get a transaction of their own: every earlier write has
+    committed and run its on_commit hooks before they start.
+    """
+    _STOP = object()
+
+    def __init__(self, stats: _ExecutorStats, max_latency: float = WRITE_MAX_LATENCY,
+                 max_batch: int = WRITE_MAX_BATCH):
+        self.logger = logging.getLogger("GroupCommitWriter")
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self._stats = stats
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._stopped = False
+        self._conn = None
+        # Solo job that closed the previous batch, run next
+        self._held: Optional[_WriteJob] = None
+
+        # Group commit stats (written by the writer thread only)
+        self._batches = 0
+        self._jobs = 0
+        self._max_batch_seen = 0
+        self._fallbacks = 0
+
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any], solo: bool = False) -> Future:
+        if self._stopped:
+            raise RuntimeError("cannot schedule new writes after shutdown")
+        job = _WriteJob(fn, solo)
+        self._stats.on_submit()
+        self._queue.put(job)
+        return job.future
+
+    def stop(self, wait: bool = True):
+        """Finish the writes queued so far, then stop the thread"""
+        self._stopped = True
+        self._queue.put(self._STOP)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _loop(self):
+        while True:
+            if self._held is not None:
+                job, self._held = self._held, None
+            else:
+                job = self._queue.get()
+            if job is self._STOP:
+                return
+            batch, stopping = self._collect(job)
+            try:
+                self._commit_batch(batch)
+            except Exception as e:
+                # Never let the only writer die
+                self.logger.error(f"Group commit error: {e}")
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            if stopping:
+                return
+
+    def _collect(self, first: _WriteJob) -> Tuple[List[_WriteJob], bool]:
+        """Gather writes queued within max_latency of the first one"""
+        batch = [first]
+        if first.solo:
+            return batch, False
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is self._STOP:
+                return batch, True
+            if job.solo:
+                # Close the batch; the solo job starts after its hooks run
+                self._held = job
+                break
+            batch.append(job)
+        return batch, False
+
+    def _connection(self):
+        """The writer's own write-pool connection, checked out on first use"""
+        if self._conn is None:
+            self._conn = get_pool().acquire()
+        return self._conn
+
+    def _execute(self, batch: List[_WriteJob]) -> List[Tuple[bool, Any, List]]:
+        """Run batch in one transaction: [(ok, result or exception, commit hooks)]"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            outcomes = []
+            for job in batch:
+                _local.commit_hooks = hooks = []
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    result = job.fn(conn)
+                    conn.execute("RELEASE write_job")
+                    outcomes.append((True, result, hooks))
+                except BaseException as e:
+                    # Raises, failing the whole batch, if the closure
+                    # left no transaction to roll back into
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    outcomes.append((False, e, []))
+                finally:
+                    _local.commit_hooks = None
+            conn.commit()
+            return outcomes
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error as e:
+                # Unusable connection: reopen it for the next batch
+                self.logger.warning(f"Replacing write connection after failed rollback: {e}")
+                self._conn = None
+                conn.close()
+            raise
+
+    def _commit_batch(self, batch: List[_WriteJob]):
+        started_at = time.monotonic()
+        for job in batch:
+            self._stats.on_start(started_at - job.submitted_at)
+
+        # Callers that were cancelled while queued are skipped
+        live = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        for _ in range(len(batch) - len(live)):
+            self._stats.on_finish(0.0, False)
+        if not live:
+            return
+
+        try:
+            outcomes = self._execute(live)
+        except Exception as e:
+            if len(live) == 1:
+                outcomes = [(False, e, [])]
+            else:
+                self._fallbacks += 1
+                self.logger.warning(
+                    f"Group commit of {len(live)} writes failed, retrying individually: {e}"
+                )
+                outcomes = []
+                for job in live:
+                    try:
+                        outcomes.extend(self._execute([job]))
+                    except Exception as single_error:
+                        outcomes.append((False, single_error, []))
+
+        run = time.monotonic() - started_at
+        self._batches += 1
+        self._jobs += len(live)
+        self._max_batch_seen = max(self._max_batch_seen, len(live))
+
+        for job, (ok, value, hooks) in zip(live, outcomes):
+            if ok:
+                _run_commit_hooks(hooks)
+            self._stats.on_finish(run, ok)
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+    def snapshot(self) -> Dict:
+        return {
+            'batches': self._batches,
+            'writes': self._jobs,
+            'avg_batch': (self._jobs / self._batches) if self._batches else 0.0,
+            'max_batch': self._max_batch_seen,
+            'fallbacks': self._fallbacks,
+            'max_latency_ms': self.max_latency * 1000
+        }
+
+
+class AsyncDatabase:
+    """Awaitable facade over the SQLite pools.
+
+    Reads run on a pool of reader threads, so a slow statement never blocks
+    the calling event loop. Writes from the bot and the API all go to one
+    writer thread, which group-commits them (see _GroupCommitWriter). Write
+    closures run inside a transaction that the facade commits or rolls back;
+    they must not commit themselves.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self, readers: int = READER_THREADS, max_latency: float = WRITE_MAX_LATENCY,
+                 max_batch: int = WRITE_MAX_BATCH):
+        if not self.initialized:
+            self.logger = logging.getLogger("AsyncDatabase")
+            self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+            self._read_stats = _ExecutorStats()
+            self._write_stats = _ExecutorStats()
+            self._writer = _GroupCommitWriter(self._write_stats, max_latency, max_batch)
+            self.initialized = True
+
+    async def _submit(self, executor: ThreadPoolExecutor, stats: _ExecutorStats,
+                      job: Callable[[], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.monotonic()
+        stats.on_submit()
+
+        def _run():
+            started_at = time.monotonic()
+            stats.on_start(started_at - submitted_at)
+            ok = False
+            try:
+                result = job()
+                ok = True
+                return result
+            finally:
+                stats.on_finish(time.monotonic() - started_at, ok)
+
+        return await loop.run_in_executor(executor, _run)
+
+    async def read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn(conn) on a reader thread with a query-only connection"""
+        def _job():
+            with get_pool(readonly=True).connection() as conn:
+                return fn(conn)
+
+        return await self._submit(self._readers, self._read_stats, _job)
+
+    async def write(self, fn: Callable[[sqlite3.Connection], Any], solo: bool = False) -> Any:
+        """Run fn(conn) on the writer thread; returns once it has committed.
+
+        fn may share its commit with other queued writes, but it runs in its
+        own savepoint: if it raises, only its changes are rolled back and
+        the exception is re-raised here. Pass solo=True when fn reads state
+        that on_commit hooks maintain (e.g. re-counting stock): it then runs
+        alone, after every earlier write's hooks.
+        """
+        return await asyncio.wrap_future(self._writer.submit(fn, solo))
+
+    async def fetchone(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(query, params).fetchone())
+
+    async def fetchall(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await self.read(lambda conn: conn.execute(query, params).fetchall())
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        """Run a single write statement and return its rowcount"""
+        return await self.write(lambda conn: conn.execute(query, params).rowcount)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            'read': self._read_stats.snapshot(),
+            'write': self._write_stats.snapshot(),
+            'group_commit': self._writer.snapshot()
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and join the worker threads"""
+        self._writer.stop(wait=wait)
+        self._readers.shutdown(wait=wait)
+        AsyncDatabase._instance = None
+        self.logger.info("AsyncDatabase executors shut down")
+
+
+def get_db() -> AsyncDatabase:
+    """Shared AsyncDatabase instance"""
+    return AsyncDatabase()
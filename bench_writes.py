@@ -0,0 +1,154 @@
+"""Write amplification of the purchase path, with and without timestamp triggers.
+
+    python bench_writes.py [--purchases 2000]
+
+Builds two throwaway databases with migrations.py: one stopped before the
+timestamp triggers were dropped (migration 004) and one stopped right
+after it, so later schema changes (indexes, tables) do not skew the
+comparison.
+The same one-item purchase transaction runs against both, and the script
+reports rows written, WAL frames (pages) and time per purchase.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Dict, Optional
+
+from migrations import migrate
+
+TRIGGERS_VERSION = 3  # last schema version with the AFTER UPDATE triggers
+NO_TRIGGERS_VERSION = TRIGGERS_VERSION + 1  # 004_drop_timestamp_triggers
+
+GROWID = "BENCHUSER"
+PRODUCT_CODE = "BENCH"
+PRICE = 10
+
+# Same statements as claim_purchase (ext/purchase_queue.py)
+CLAIM_STOCK = """
+    UPDATE stock
+    SET status = 'sold', buyer_id = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id IN (
+        SELECT id
+        FROM stock
+        WHERE product_code = ? AND status = 'available'
+        ORDER BY added_at ASC, id ASC
+        LIMIT 1
+    )
+    RETURNING id, content
+"""
+
+DEBIT_BALANCE = """
+    UPDATE users
+    SET balance_wl = balance_wl - ?, updated_at = CURRENT_TIMESTAMP
+    WHERE growid = ? COLLATE binary AND balance_wl >= ?
+    RETURNING balance_wl
+"""
+
+RECORD_TRANSACTION = """
+    INSERT INTO transactions
+    (growid, type, details, old_balance, new_balance, items_count, total_price)
+    VALUES (?, 'PURCHASE', ?, ?, ?, 1, ?)
+    RETURNING id
+"""
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    # Keep every frame in the WAL so it can be counted afterwards
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    return conn
+
+def _seed(conn: sqlite3.Connection, purchases: int):
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("INSERT INTO users (growid, balance_wl) VALUES (?, ?)", (GROWID, PRICE * purchases))
+    conn.execute(
+        "INSERT INTO products (code, name, price) VALUES (?, 'Benchmark item', ?)",
+        (PRODUCT_CODE, PRICE)
+    )
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, added_by) VALUES (?, ?, 'bench')",
+        ((PRODUCT_CODE, f"bench-item-{i:08d}") for i in range(purchases))
+    )
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def _purchase(conn: sqlite3.Connection):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute(CLAIM_STOCK, (GROWID, PRODUCT_CODE)).fetchall():
+            raise RuntimeError("Benchmark ran out of stock")
+        row = conn.execute(DEBIT_BALANCE, (PRICE, GROWID, PRICE)).fetchone()
+        if not row:
+            raise RuntimeError("Benchmark ran out of balance")
+        conn.execute(RECORD_TRANSACTION, (
+            GROWID,
+            f"Purchased 1 {PRODUCT_CODE}",
+            f"{row[0] + PRICE} WL",
+            f"{row[0]} WL",
+            PRICE
+        )).fetchone()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def run(purchases: int, schema_version: Optional[int]) -> Dict:
+    """Run `purchases` purchases on a fresh database at `schema_version`"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = _connect(os.path.join(tmp, "bench.db"))
+        try:
+            version = migrate(conn, schema_version)
+            triggers = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'"
+            ).fetchone()[0]
+            _seed(conn, purchases)
+
+            changes = conn.total_changes
+            start = time.perf_counter()
+            for _ in range(purchases):
+                _purchase(conn)
+            elapsed = time.perf_counter() - start
+
+            # (busy, frames in WAL, frames checkpointed)
+            frames = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()[1]
+            return {
+                "version": version,
+                "triggers": triggers,
+                "rows": (conn.total_changes - changes) / purchases,
+                "frames": frames / purchases,
+                "us": elapsed / purchases * 1e6
+            }
+        finally:
+            conn.close()
+
+def _change(before: float, after: float) -> str:
+    """'1.50x fewer' / '1.20x more' / 'unchanged', from before to after"""
+    if after == before:
+        return "unchanged"
+    if after < before:
+        return f"{before / after:.2f}x fewer" if after else "all removed"
+    return f"{after / before:.2f}x more" if before else "new"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--purchases", type=int, default=2000)
+    args = parser.parse_args()
+
+    before = run(args.purchases, TRIGGERS_VERSION)
+    after = run(args.purchases, NO_TRIGGERS_VERSION)
+
+    print(f"{args.purchases} purchases, one item each\n")
+    print(f"{'schema':<16}{'triggers':>9}{'rows/purchase':>15}{'frames/purchase':>17}{'us/purchase':>13}")
+    for label, result in (("triggers", before), ("no triggers", after)):
+        print(
+            f"{label + ' v' + str(result['version']):<16}{result['triggers']:>9}"
+            f"{result['rows']:>15.2f}{result['frames']:>17.2f}{result['us']:>13.1f}"
+        )
+    print(f"\nrows written: {_change(before['rows'], after['rows'])}, "
+          f"WAL frames: {_change(before['frames'], after['frames'])}")
+
+if __name__ == "__main__":
+    main()
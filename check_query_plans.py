@@ -0,0 +1,329 @@
+"""EXPLAIN QUERY PLAN regression suite for hot SQL statements.
+
+    python check_query_plans.py                   # check against a seeded database
+    python check_query_plans.py --db shop.db      # check against an existing database
+    python check_query_plans.py --update-baseline # accept the current plans
+
+Every SQL string literal in ext/ and api/service/ is read straight out of
+the source with ast, so the suite always sees the statements the code
+actually runs. They are planned against a throwaway database built by
+migrations.py, seeded with representative rows and ANALYZEd.
+
+Registered hot queries (HOT_QUERIES) fail the run when their plan sorts
+through a temp B-tree or scans a table. Plans that differ from the
+committed baseline (query_plans.json) are printed as a diff. Other
+statements are only reported: flagged plans, and statements that cannot
+be planned here (fragments assembled at runtime, or tables that only the
+web API's database has).
+"""
+import argparse
+import ast
+import difflib
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from migrations import migrate
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(ROOT, "query_plans.json")
+SOURCE_DIRS = ("ext", "api/service")
+
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\s", re.IGNORECASE)
+
+# Seed sizes: enough rows that ANALYZE statistics resemble a live shop
+SEED_USERS = 2000
+SEED_PRODUCTS = 50
+SEED_STOCK = 20000
+SEED_TRANSACTIONS = 20000
+
+class HotQuery(NamedTuple):
+    name: str
+    path: str            # relative to the repository root
+    function: str        # function or class holding the statement (nested closures included)
+    marker: str          # substring that picks the statement inside the function
+    allow: Tuple[str, ...] = ()  # plan lines accepted despite matching a rule
+
+HOT_QUERIES: List[HotQuery] = [
+    # Purchases
+    HotQuery("purchase: product price", "ext/purchase_queue.py", "claim_purchase", "FROM products"),
+    HotQuery("purchase: claim oldest stock", "ext/purchase_queue.py", "claim_purchase", "UPDATE stock"),
+    HotQuery("purchase: debit balance", "ext/purchase_queue.py", "claim_purchase", "UPDATE users"),
+    HotQuery("purchase history", "ext/trx.py", "get_user_purchases", "FROM transactions t"),
+    HotQuery("transaction history", "ext/trx.py", "get_transaction_history", "FROM transactions"),
+    HotQuery("cancel purchase: lookup", "ext/trx.py", "cancel_transaction", "FROM transactions t"),
+
+    # Balances and accounts
+    HotQuery("growid by discord id", "ext/balance_manager.py", "get_growid", "FROM user_growid"),
+    HotQuery("balance lookup", "ext/balance_manager.py", "get_balance", "FROM users"),
+    HotQuery("update balance: read", "ext/balance_manager.py", "update_balance", "SELECT balance_wl"),
+    HotQuery("transfer: read balance", "ext/balance_manager.py", "transfer_balance", "SELECT balance_wl"),
+
+    # Stock
+    HotQuery("available stock (FIFO)", "ext/product_manager.py", "get_available_stock", "FROM stock"),
+    HotQuery("reduce stock: count", "ext/product_manager.py", "reduce_stock", "COUNT(*)"),
+    HotQuery("reduce stock: pick oldest", "ext/product_manager.py", "reduce_stock", "ORDER BY added_at"),
+    HotQuery("delete product: stock check", "ext/product_manager.py", "delete_product", "FROM stock"),
+    # Startup load of every product's count; reading the whole index is the
+    # point. The only status-only stock query: a skip-scan with statistics,
+    # a covering scan without (there is no standalone status index)
+    HotQuery("stock counter: load", "ext/stock_counter.py", "StockCounter", "GROUP BY product_code",
+             allow=("SCAN stock USING COVERING INDEX idx_stock_fifo",)),
+]
+
+# A plan line matching any of these fails a hot query
+FORBIDDEN = [
+    ("temp B-tree sort", re.compile(r"USE TEMP B-TREE")),
+    ("scan", re.compile(r"^SCAN \w+")),
+]
+
+class Statement(NamedTuple):
+    path: str
+    function: str
+    line: int
+    sql: str
+
+def _sql_literals(node: ast.AST) -> List[ast.Constant]:
+    # Bare string statements are docstrings ("Update user data"), not SQL
+    docstrings = {
+        id(child.value) for child in ast.walk(node)
+        if isinstance(child, ast.Expr) and isinstance(child.value, ast.Constant)
+    }
+    return [
+        child for child in ast.walk(node)
+        if isinstance(child, ast.Constant) and isinstance(child.value, str)
+        and id(child) not in docstrings and SQL_START.match(child.value)
+    ]
+
+def collect_statements(dirs=SOURCE_DIRS) -> List[Statement]:
+    """Every SQL string literal under `dirs`, tagged with its innermost function"""
+    statements = []
+    for directory in dirs:
+        for dirpath, _, filenames in os.walk(os.path.join(ROOT, directory)):
+            for filename in sorted(filenames):
+                if not filename.endswith(".py"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, ROOT).replace(os.sep, "/")
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        tree = ast.parse(f.read(), filename=rel)
+                except SyntaxError as e:
+                    print(f"skipping {rel}: {e}")
+                    continue
+
+                owner: Dict[int, str] = {}
+                for node in ast.walk(tree):
+                    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        # ast.walk is breadth-first, so inner functions overwrite outer ones
+                        for literal in _sql_literals(node):
+                            owner[id(literal)] = node.name
+                for literal in _sql_literals(tree):
+                    statements.append(Statement(
+                        rel, owner.get(id(literal), "<module>"), literal.lineno, literal.value
+                    ))
+    return sorted(statements, key=lambda statement: (statement.path, statement.line))
+
+def extract_sql(query: HotQuery) -> str:
+    """The single SQL string literal in query.function containing query.marker"""
+    with open(os.path.join(ROOT, query.path), encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=query.path)
+
+    scopes = [
+        node for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        and node.name == query.function
+    ]
+    if not scopes:
+        raise LookupError(f"{query.path}: no function {query.function}")
+
+    found = {
+        literal.value for scope in scopes for literal in _sql_literals(scope)
+        if query.marker in literal.value
+    }
+    if len(found) != 1:
+        raise LookupError(
+            f"{query.path}:{query.function}: expected one statement containing "
+            f"{query.marker!r}, found {len(found)}"
+        )
+    return found.pop()
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """EXPLAIN QUERY PLAN as indented lines, parameters bound to NULL"""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count("?")).fetchall()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+def violations(plan: List[str], allow: Tuple[str, ...] = ()) -> List[str]:
+    problems = []
+    for line in plan:
+        detail = line.strip()
+        if any(allowed in detail for allowed in allow):
+            continue
+        for label, pattern in FORBIDDEN:
+            if pattern.search(detail):
+                problems.append(f"{label}: {detail}")
+    return problems
+
+def seed(conn: sqlite3.Connection):
+    """Fill a migrated database with representative rows and ANALYZE it"""
+    rng = random.Random(42)
+    growids = [f"USER{i:05d}" for i in range(SEED_USERS)]
+    codes = [f"P{i:03d}" for i in range(SEED_PRODUCTS)]
+
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        "INSERT INTO users (growid, balance_wl) VALUES (?, ?)",
+        ((growid, rng.randint(0, 100000)) for growid in growids)
+    )
+    conn.executemany(
+        "INSERT INTO user_growid (discord_id, growid) VALUES (?, ?)",
+        ((str(10 ** 17 + i), growid) for i, growid in enumerate(growids))
+    )
+    conn.executemany(
+        "INSERT INTO products (code, name, price) VALUES (?, ?, ?)",
+        ((code, f"Product {code}", rng.randint(1, 500)) for code in codes)
+    )
+    stock = []
+    for i in range(SEED_STOCK):
+        sold = rng.random() < 0.8
+        stock.append((
+            rng.choice(codes), f"item-{i:08d}",
+            "sold" if sold else "available",
+            rng.choice(growids) if sold else None
+        ))
+    conn.executemany(
+        "INSERT INTO stock (product_code, content, status, added_by, buyer_id) VALUES (?, ?, ?, 'seed', ?)",
+        stock
+    )
+    conn.executemany(
+        "INSERT INTO transactions (growid, type, details, items_count, total_price) VALUES (?, ?, ?, 1, ?)",
+        (
+            (rng.choice(growids), rng.choice(("PURCHASE", "PURCHASE", "DEPOSIT")), "seed", rng.randint(1, 500))
+            for _ in range(SEED_TRANSACTIONS)
+        )
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+def load_baseline() -> Dict[str, List[str]]:
+    try:
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_baseline(plans: Dict[str, List[str]]):
+    with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+        json.dump(plans, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def check_hot_queries(conn: sqlite3.Connection, baseline: Dict[str, List[str]]) -> Tuple[int, Dict[str, List[str]]]:
+    """Print each hot query's plan; return (failures, plans by name)"""
+    failures = 0
+    plans: Dict[str, List[str]] = {}
+    for query in HOT_QUERIES:
+        try:
+            plan = explain(conn, extract_sql(query))
+        except (LookupError, sqlite3.Error) as e:
+            failures += 1
+            print(f"ERROR {query.name}: {e}\n")
+            continue
+        plans[query.name] = plan
+
+        problems = violations(plan, query.allow)
+        failures += bool(problems)
+        changed = query.name in baseline and baseline[query.name] != plan
+        status = "FAIL" if problems else ("diff" if changed else "ok  ")
+        print(f"{status} {query.name} ({query.path}:{query.function})")
+        if changed:
+            for line in difflib.unified_diff(baseline[query.name], plan, "baseline", "current", lineterm="", n=5):
+                print(f"       {line}")
+        else:
+            for line in plan:
+                print(f"       {line}")
+        for problem in problems:
+            print(f"     ! {problem}")
+    print()
+
+    new = [name for name in plans if name not in baseline]
+    gone = [name for name in baseline if name not in plans]
+    if new:
+        print(f"Not in baseline: {', '.join(new)}")
+    if gone:
+        print(f"Only in baseline: {', '.join(gone)}")
+    return failures, plans
+
+def report_other_statements(conn: sqlite3.Connection):
+    """Informational pass over every collected statement that is not registered"""
+    hot = set()
+    for query in HOT_QUERIES:
+        try:
+            hot.add(extract_sql(query))
+        except LookupError:
+            pass
+
+    flagged, unplannable = [], []
+    statements = collect_statements()
+    for statement in statements:
+        if statement.sql in hot:
+            continue
+        where = f"{statement.path}:{statement.line} {statement.function}"
+        try:
+            problems = violations(explain(conn, statement.sql))
+        except sqlite3.Error as e:
+            unplannable.append(f"{where}: {e}")
+            continue
+        if problems:
+            flagged.append(f"{where}: {'; '.join(problems)}")
+
+    print(f"\n{len(statements)} statements collected from {', '.join(SOURCE_DIRS)}")
+    if flagged:
+        print(f"\nUnregistered statements with flagged plans ({len(flagged)}):")
+        for line in flagged:
+            print(f"  {line}")
+    if unplannable:
+        print(f"\nNot plannable against this schema ({len(unplannable)}):")
+        for line in unplannable:
+            print(f"  {line}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="plan against this database (opened read-only) instead of a seeded copy")
+    parser.add_argument("--update-baseline", action="store_true", help=f"write current plans to {os.path.basename(BASELINE_FILE)}")
+    parser.add_argument("--hot-only", action="store_true", help="skip the report on unregistered statements")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            conn = sqlite3.connect(f"file:{os.path.abspath(args.db)}?mode=ro", uri=True)
+            print(f"Planning against {args.db}\n")
+        else:
+            conn = sqlite3.connect(os.path.join(tmp, "plans.db"))
+            print(f"Planning against a seeded database at schema version {migrate(conn)}\n")
+            seed(conn)
+        try:
+            failures, plans = check_hot_queries(conn, load_baseline())
+            if not args.hot_only:
+                report_other_statements(conn)
+        finally:
+            conn.close()
+
+    if args.update_baseline:
+        save_baseline(plans)
+        print(f"\nBaseline written to {os.path.basename(BASELINE_FILE)}")
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries passed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
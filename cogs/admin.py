@@ -6,10 +6,11 @@ import json
 import asyncio
 from typing import Optional, List
 import io
+import time
 import psutil
 import platform
 import aiohttp
-from database import get_connection
+from async_db import get_db
 import jwt
 from datetime import datetime, timedelta
 from api.config import API_SECRET_KEY
@@ -20,7 +21,8 @@ from ext.constants import (
     TRANSACTION_ADMIN_REMOVE,
     TRANSACTION_ADMIN_RESET,
     MAX_STOCK_FILE_SIZE,
-    VALID_STOCK_FORMATS
+    VALID_STOCK_FORMATS,
+    STOCK_IMPORT_PROGRESS_INTERVAL
 )
 from ext.balance_manager import BalanceManagerService
 from ext.product_manager import ProductManagerService
@@ -218,44 +220,53 @@ class AdminCog(commands.Cog, name="Admin"):
             attachment = ctx.message.attachments[0]
             
             # Cek ukuran file
-            if attachment.size > 1024 * 1024:  # Max 1MB
-                await ctx.send("❌ File terlalu besar! Maksimal 1MB")
+            if attachment.size > MAX_STOCK_FILE_SIZE:
+                await ctx.send(f"❌ File terlalu besar! Maksimal {MAX_STOCK_FILE_SIZE // (1024 * 1024)}MB")
                 return
     
             # Cek ekstensi file
-            if not attachment.filename.endswith('.txt'):
-                await ctx.send("❌ File harus berformat .txt!")
+            if attachment.filename.split('.')[-1].lower() not in VALID_STOCK_FORMATS:
+                await ctx.send(f"❌ File harus berformat {', '.join('.' + ext for ext in VALID_STOCK_FORMATS)}!")
                 return
     
-            # Baca konten file
             content = await attachment.read()
-            text = content.decode('utf-8').strip()
-            
-            # Split per baris dan bersihkan
-            items = [line.strip() for line in text.split('\n') if line.strip()]
-            
-            if not items:
+            total = sum(1 for line in io.BytesIO(content) if line.strip())
+            if not total:
                 await ctx.send("❌ File kosong atau tidak ada stock valid!")
                 return
     
-            # Progress message
-            progress_msg = await ctx.send(f"⏳ Menambahkan {len(items)} stock...")
-            
-            # Tambah stock dengan progress
-            added = 0
-            failed = 0
-            
-            for i, item in enumerate(items, 1):
+            # Progress message, diedit berdasarkan waktu bukan jumlah item
+            progress_msg = await ctx.send(f"⏳ Menambahkan {total} stock...")
+            last_edit = time.monotonic()
+            decode_failed = 0
+
+            def _lines():
+                nonlocal decode_failed
+                for raw in io.BytesIO(content):
+                    try:
+                        yield raw.decode('utf-8')
+                    except UnicodeDecodeError:
+                        decode_failed += 1
+
+            async def _progress(counts):
+                nonlocal last_edit
+                now = time.monotonic()
+                if now - last_edit < STOCK_IMPORT_PROGRESS_INTERVAL:
+                    return
+                last_edit = now
                 try:
-                    await self.product_service.add_stock_item(code, item, str(ctx.author.id))
-                    added += 1
-                    
-                    # Update progress setiap 10 item
-                    if i % 10 == 0:
-                        await progress_msg.edit(content=f"⏳ Progress: {i}/{len(items)} stock...")
-                except Exception as e:
-                    self.logger.error(f"Failed to add stock item {item}: {e}")
-                    failed += 1
+                    await progress_msg.edit(
+                        content=f"⏳ Progress: {counts['processed'] + decode_failed}/{total} stock..."
+                    )
+                except discord.HTTPException as e:
+                    self.logger.warning(f"Failed to update stock import progress: {e}")
+
+            result = await self.product_service.add_stock_bulk(
+                code, _lines(), str(ctx.author.id), progress=_progress
+            )
+            added = result['added']
+            duplicates = result['duplicates']
+            failed = result['failed'] + decode_failed
     
             # Hapus pesan progress
             await progress_msg.delete()
@@ -267,12 +278,16 @@ class AdminCog(commands.Cog, name="Admin"):
                 timestamp=datetime.utcnow()
             )
             embed.add_field(name="Produk", value=f"{product['name']} ({code})", inline=False)
-            embed.add_field(name="Total Stock", value=len(items), inline=True)
+            embed.add_field(name="Total Stock", value=total, inline=True)
             embed.add_field(name="Berhasil", value=added, inline=True)
+            embed.add_field(name="Duplikat", value=duplicates, inline=True)
             embed.add_field(name="Gagal", value=failed, inline=True)
             
             await ctx.send(embed=embed)
-            self.logger.info(f"Stock added for {code} by {ctx.author}: {added} success, {failed} failed")
+            self.logger.info(
+                f"Stock added for {code} by {ctx.author}: "
+                f"{added} success, {duplicates} duplicate, {failed} failed"
+            )
                 
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
@@ -749,15 +764,7 @@ class AdminCog(commands.Cog, name="Admin"):
                 return
 
             # Get all users from database
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT DISTINCT discord_id FROM user_growid")
-                users = cursor.fetchall()
-            finally:
-                if conn:
-                    conn.close()
+            users = await get_db().fetchall("SELECT DISTINCT discord_id FROM user_growid")
 
             embed = discord.Embed(
                 title="📢 Announcement",
@@ -814,18 +821,10 @@ class AdminCog(commands.Cog, name="Admin"):
                 return
 
             # Update maintenance status in database
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)",
-                    ("maintenance_mode", "1" if mode == "on" else "0")
-                )
-                conn.commit()
-            finally:
-                if conn:
-                    conn.close()
+            await get_db().execute(
+                "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)",
+                ("maintenance_mode", "1" if mode == "on" else "0")
+            )
 
             embed = discord.Embed(
                 title="🔧 Maintenance Mode",
@@ -868,46 +867,35 @@ class AdminCog(commands.Cog, name="Admin"):
                 await ctx.send("❌ Please specify 'add' or 'remove'")
                 return
 
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                if action == "add":
-                    # Check if user exists
-                    cursor.execute("SELECT growid FROM users WHERE growid = ?", (growid,))  # Removed ()
-                    if not cursor.fetchone():
-                        await ctx.send(f"❌ User {growid} not found!")
-                        return
-
-                    # Add to blacklist
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO blacklist (growid, added_by, added_at) VALUES (?, ?, ?)",
-                        (growid, str(ctx.author.id), datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))  # Removed ()
-                    )
-                else:
-                    # Remove from blacklist
-                    cursor.execute(
-                        "DELETE FROM blacklist WHERE growid = ?",
-                        (growid,)  # Removed ()
-                    )
-
-                conn.commit()
+            db = get_db()
+            if action == "add":
+                # Check if user exists
+                if not await db.fetchone("SELECT growid FROM users WHERE growid = ?", (growid,)):  # Removed ()
+                    await ctx.send(f"❌ User {growid} not found!")
+                    return
 
-                embed = discord.Embed(
-                    title="⛔ Blacklist Updated",
-                    description=f"User {growid} has been {'added to' if action == 'add' else 'removed from'} the blacklist.",  # Removed ()
-                    color=discord.Color.red() if action == 'add' else discord.Color.green(),
-                    timestamp=datetime.utcnow()
+                # Add to blacklist
+                await db.execute(
+                    "INSERT OR REPLACE INTO blacklist (growid, added_by, added_at) VALUES (?, ?, ?)",
+                    (growid, str(ctx.author.id), datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))  # Removed ()
                 )
-                embed.set_footer(text=f"Updated by {ctx.author}")
-                
-                await ctx.send(embed=embed)
-                self.logger.info(f"User {growid} {action}ed to blacklist by {ctx.author}")
-                
-            finally:
-                if conn:
-                    conn.close()
+            else:
+                # Remove from blacklist
+                await db.execute(
+                    "DELETE FROM blacklist WHERE growid = ?",
+                    (growid,)  # Removed ()
+                )
+
+            embed = discord.Embed(
+                title="⛔ Blacklist Updated",
+                description=f"User {growid} has been {'added to' if action == 'add' else 'removed from'} the blacklist.",  # Removed ()
+                color=discord.Color.red() if action == 'add' else discord.Color.green(),
+                timestamp=datetime.utcnow()
+            )
+            embed.set_footer(text=f"Updated by {ctx.author}")
+            
+            await ctx.send(embed=embed)
+            self.logger.info(f"User {growid} {action}ed to blacklist by {ctx.author}")
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
@@ -924,26 +912,22 @@ class AdminCog(commands.Cog, name="Admin"):
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
             backup_filename = f"backup_{timestamp}.db"
             
-            # Create backup
-            conn = None
-            try:
-                conn = get_connection()
-                # Create backup in memory
+            # Create backup in memory
+            def _dump(conn):
                 backup_data = io.BytesIO()
                 for line in conn.iterdump():
                     backup_data.write(f'{line}\n'.encode('utf-8'))
                 backup_data.seek(0)
-                
-                # Send backup file
-                await ctx.send(
-                    "✅ Database backup created!",
-                    file=discord.File(backup_data, filename=backup_filename)
-                )
-                self.logger.info(f"Database backup created by {ctx.author}")
-                
-            finally:
-                if conn:
-                    conn.close()
+                return backup_data
+
+            backup_data = await get_db().read(_dump)
+            
+            # Send backup file
+            await ctx.send(
+                "✅ Database backup created!",
+                file=discord.File(backup_data, filename=backup_filename)
+            )
+            self.logger.info(f"Database backup created by {ctx.author}")
             
         except Exception as e:
             await ctx.send(f"❌ Error: {str(e)}")
@@ -0,0 +1,258 @@
+import sqlite3
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'shop.db'
+
+# Pool sizing: idle connections kept per pool, plus temporary overflow
+# connections that are closed on return instead of being kept.
+READ_POOL_SIZE = 4
+WRITE_POOL_SIZE = 2
+MAX_OVERFLOW = 8
+
+
+class PooledConnection:
+    """Proxy around a pooled sqlite3.Connection.
+
+    Behaves like the raw connection, except that close() hands the
+    connection back to its pool instead of closing the file handle.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection, overflow: bool = False):
+        self._pool = pool
+        self._conn = conn
+        self._overflow = overflow
+        self._checked_out_at = time.monotonic()
+
+    @property
+    def raw(self) -> Optional[sqlite3.Connection]:
+        return self._conn
+
+    @property
+    def closed(self) -> bool:
+        return self._conn is None
+
+    def close(self):
+        """Return the connection to the pool (safe to call twice)"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(conn, self._overflow, self._checked_out_at)
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        # A caller that forgot close() must not leak a pool slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections with one-time pragma setup"""
+
+    def __init__(self, name: str, db_path: str = DB_PATH, size: int = 4,
+                 max_overflow: int = MAX_OVERFLOW, readonly: bool = False,
+                 busy_timeout: int = 5000):
+        self.name = name
+        self.db_path = db_path
+        self.size = size
+        self.max_overflow = max_overflow
+        self.readonly = readonly
+        self.busy_timeout = busy_timeout
+        self.logger = logging.getLogger(f"ConnectionPool[{name}]")
+
+        self._idle = deque()
+        self._in_use = 0
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._overflow_opened = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_hold = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+
+        # Pragmas are per-connection, so they only run once per pooled connection
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        if self.readonly:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+        return conn
+
+    def acquire(self, timeout: float = 5) -> PooledConnection:
+        """Check out a connection, waiting up to `timeout` seconds"""
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError(f"Connection pool {self.name} is closed")
+
+                if self._idle:
+                    conn = self._idle.pop()
+                    overflow = False
+                    break
+
+                if self._opened < self.size + self.max_overflow:
+                    overflow = self._opened >= self.size
+                    self._opened += 1
+                    conn = None
+                    break
+
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out after {timeout}s waiting for a {self.name} connection"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._checkouts += 1
+            wait = time.monotonic() - start
+            if waited:
+                self._waits += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            if overflow:
+                self._overflow_opened += 1
+
+        return PooledConnection(self, conn, overflow)
+
+    def _release(self, conn: sqlite3.Connection, overflow: bool, checked_out_at: float):
+        # Never hand an open transaction to the next caller
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Discarding connection after failed rollback: {e}")
+            overflow = True
+
+        with self._cond:
+            self._in_use -= 1
+            self._total_hold += time.monotonic() - checked_out_at
+            if overflow or self._closed or len(self._idle) >= self.size:
+                self._opened -= 1
+                discard = True
+            else:
+                self._idle.append(conn)
+                discard = False
+            self._cond.notify()
+
+        if discard:
+            conn.close()
+
+    @contextmanager
+    def connection(self, timeout: float = 5):
+        """Checkout/return context manager"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        """Close all idle connections and refuse new checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._opened -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'overflow_opened': self._overflow_opened,
+                'avg_wait_ms': (self._total_wait / self._waits * 1000) if self._waits else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+                'avg_hold_ms': (self._total_hold / self._checkouts * 1000) if self._checkouts else 0.0
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(readonly: bool = False) -> ConnectionPool:
+    """Get (lazily creating) the shared read or write pool"""
+    name = 'read' if readonly else 'write'
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = ConnectionPool(
+                    name,
+                    size=READ_POOL_SIZE if readonly else WRITE_POOL_SIZE,
+                    readonly=readonly
+                )
+                _pools[name] = pool
+    return pool
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Metrics for every pool created so far"""
+    return {name: pool.stats() for name, pool in list(_pools.items())}
+
+
+def close_pools():
+    """Close all pools (called on shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+    logger.info("Database connection pools closed")
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from .constants import CACHE_TIMEOUT, CACHE_MAX_ENTRIES, CACHE_NEGATIVE_TTL, CACHE_TTLS
+
+
+class _Missing:
+    def __repr__(self):
+        return 'MISSING'
+
+    def __bool__(self):
+        return False
+
+
+# Returned by get() on a miss; a cached None (negative entry) is a hit
+MISSING = _Missing()
+
+CacheKey = Tuple[str, Any]
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'tags')
+
+    def __init__(self, value: Any, expires_at: float, tags: Tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class TTLCache:
+    """Bounded in-memory cache with per-namespace TTLs and LRU eviction.
+
+    Entries live under (namespace, key). Tags index entries so that a whole
+    group (e.g. everything about one product) can be dropped without
+    scanning the cache. set_missing() stores a short-lived negative entry
+    for lookups that found nothing. Thread-safe, since commit hooks
+    invalidate from the database writer thread.
+    """
+
+    def __init__(self, name: str = "shared", max_entries: int = CACHE_MAX_ENTRIES,
+                 default_ttl: float = CACHE_TIMEOUT, ttls: Optional[Dict[str, float]] = None,
+                 negative_ttl: float = CACHE_NEGATIVE_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.negative_ttl = negative_ttl
+        self.logger = logging.getLogger(f"TTLCache[{name}]")
+
+        self._entries: 'OrderedDict[CacheKey, _Entry]' = OrderedDict()
+        self._tags: Dict[str, Set[CacheKey]] = {}
+        self._lock = threading.RLock()
+
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def _remove(self, full_key: CacheKey) -> Optional[_Entry]:
+        entry = self._entries.pop(full_key, None)
+        if entry is not None:
+            for tag in entry.tags:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(full_key)
+                    if not keys:
+                        del self._tags[tag]
+        return entry
+
+    def get(self, namespace: str, key: Any, default: Any = MISSING) -> Any:
+        """Cached value, or `default` when absent or expired"""
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self._misses += 1
+                return default
+            if entry.expires_at <= time.monotonic():
+                self._remove(full_key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(full_key)
+            if entry.value is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return entry.value
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = None,
+            tags: Iterable[str] = ()):
+        full_key = (namespace, key)
+        ttl = self.ttl_for(namespace) if ttl is None else ttl
+        tags = tuple(tags)
+        with self._lock:
+            self._remove(full_key)
+            self._entries[full_key] = _Entry(value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(full_key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def set_missing(self, namespace: str, key: Any, tags: Iterable[str] = ()):
+        """Remember that a lookup found nothing (returned as None by get)"""
+        self.set(namespace, key, None, ttl=self.negative_ttl, tags=tags)
+
+    def delete(self, namespace: str, key: Any) -> bool:
+        with self._lock:
+            removed = self._remove((namespace, key)) is not None
+            if removed:
+                self._invalidations += 1
+            return removed
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry carrying `tag`; returns how many were removed"""
+        with self._lock:
+            keys = self._tags.pop(tag, set())
+            for full_key in list(keys):
+                self._remove(full_key)
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        """Drop one namespace, or everything when namespace is None"""
+        with self._lock:
+            if namespace is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._tags.clear()
+            else:
+                keys = [k for k in self._entries if k[0] == namespace]
+                for full_key in keys:
+                    self._remove(full_key)
+                count = len(keys)
+            self._invalidations += count
+            return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'tags': len(self._tags),
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+                'hit_rate': ((self._hits + self._negative_hits) / lookups) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
+
+
+_shared: Optional[TTLCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_cache() -> TTLCache:
+    """Cache shared by the ext services"""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = TTLCache("shared", ttls=CACHE_TTLS)
+    return _shared
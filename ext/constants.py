@@ -1,13 +1,33 @@
-import discord
 from collections import namedtuple
 
 # Timeouts and Intervals
 COOLDOWN_SECONDS = 3
 UPDATE_INTERVAL = 55  # seconds
+LIVE_STOCK_DEBOUNCE = 1.0  # seconds to coalesce stock events before rendering
+LIVE_STOCK_MIN_EDIT_INTERVAL = 2.0  # seconds between live stock message edits
+LIVE_STOCK_FALLBACK_INTERVAL = 300  # seconds, catches out-of-band DB changes
+STOCK_RECONCILE_INTERVAL = 300  # seconds
 CACHE_TIMEOUT = 60
+CACHE_MAX_ENTRIES = 10000
+CACHE_NEGATIVE_TTL = 10  # seconds to remember "not found"
+CACHE_TTLS = {  # seconds, per cache namespace
+    'growid': 30,
+    'balance': 30,
+    'product': 60,
+    'products': 60,
+    'world_info': 60,
+    'stock_field': 600
+}
 PAGE_TIMEOUT = 60  # seconds
 ADMIN_CONFIRM_TIMEOUT = 30  # seconds
 
+# Purchase Batching
+PURCHASE_BATCH_WINDOW = 0.01  # seconds to collect purchases per product
+PURCHASE_BATCH_MAX_SIZE = 100  # purchases per write transaction
+
+# Service Locks
+LOCK_STRIPES = 0  # 0 = one refcounted lock per key, N = fixed pool of N locks
+
 # Database Status
 STATUS_AVAILABLE = 'available'
 STATUS_SOLD = 'sold'
@@ -34,6 +54,8 @@ CURRENCY_RATES = {
 # File Limits and Settings
 MAX_STOCK_FILE_SIZE = 1024 * 1024  # 1MB
 VALID_STOCK_FORMATS = ['txt']
+STOCK_IMPORT_CHUNK_SIZE = 500  # lines per write transaction
+STOCK_IMPORT_PROGRESS_INTERVAL = 2.0  # seconds between progress edits
 MAX_FILE_SIZES = {
     'stock': 1024 * 1024,  # 1MB
     'backup': 10 * 1024 * 1024  # 10MB
@@ -63,12 +85,12 @@ MAX_PURCHASE_QUANTITY = 100
 MAX_TRANSACTION_HISTORY = 50
 ADMIN_BULK_UPDATE_CHUNK = 10
 
-# Colors
+# Colors (discord.Color values as ints, so this module needs no discord import)
 COLORS = {
-    'success': discord.Color.green(),
-    'error': discord.Color.red(),
-    'info': discord.Color.blue(),
-    'warning': discord.Color.yellow()
+    'success': 0x2ecc71,
+    'error': 0xe74c3c,
+    'info': 0x3498db,
+    'warning': 0xfee75c
 }
 
 # Messages
@@ -115,6 +137,12 @@ PERMISSION_LEVELS = {
 VALID_PRODUCT_FIELDS = ['name', 'price', 'description']
 MAX_ITEMS_PER_MESSAGE = 10
 
+# Discord Embed Limits
+MAX_EMBED_FIELDS = 25
+MAX_EMBED_CHARS = 6000  # per message, summed over all of its embeds
+MAX_FIELD_VALUE_LENGTH = 1024
+LIVE_STOCK_MAX_MESSAGES = 10
+
 # Custom Exceptions
 class TransactionError(Exception):
     """Custom exception for transaction-related errors"""
@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from .balance_manager import BalanceManagerService
-from database import get_connection
+from async_db import get_db
 import logging
 from datetime import datetime
 
@@ -90,16 +90,8 @@ class Donate(commands.Cog):
 
     async def _get_discord_id(self, growid: str) -> int:
         """Dapatkan Discord ID dari GrowID"""
-        conn = None
-        try:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT user_id FROM users WHERE growid = ?", (growid,))
-            row = cur.fetchone()
-            return row[0] if row else None
-        finally:
-            if conn:
-                conn.close()
+        row = await get_db().fetchone("SELECT user_id FROM users WHERE growid = ?", (growid,))
+        return row[0] if row else None
 
     async def _send_donation_log(self, growid: str, total_wl: int, deposit_text: str):
         """Kirim log donasi ke channel yang ditentukan"""
@@ -9,7 +9,6 @@ from .constants import Balance
 from .balance_manager import BalanceManagerService
 from .product_manager import ProductManagerService
 from .trx import TransactionManager
-from database import get_connection
 
 class SetGrowIDModal(ui.Modal, title="Set GrowID"):
     def __init__(self, bot):
@@ -1,11 +1,12 @@
 import discord
 import logging
-import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
+from .cache import MISSING, get_cache
 from .product_manager import ProductManagerService
-from .constants import CACHE_TIMEOUT
+from .stock_board import render_field, content_hash, split_fields
+from .constants import MAX_EMBED_CHARS
 
 class LiveStockService:
     _instance = None
@@ -21,60 +22,82 @@ class LiveStockService:
             self.bot = bot
             self.logger = logging.getLogger("LiveStockService")
             self.product_manager = ProductManagerService(bot)
-            self._cache = {}
-            self._cache_timeout = CACHE_TIMEOUT
+            self.cache = get_cache()
+            self._field_hits = 0
+            self._field_misses = 0
             self.initialized = True
 
-    def _get_cached(self, key: str):
-        if key in self._cache:
-            data = self._cache[key]
-            if time.time() - data['timestamp'] < self._cache_timeout:
-                return data['value']
-            del self._cache[key]
-        return None
+    def _render_field(self, product: Dict) -> Tuple[str, str]:
+        """Field (name, value) for one product, reused while it is unchanged"""
+        code = product['code']
+        stock_count = product.get('stock_count', 0)
+        key = (code, product['name'], product['price'], product.get('description'), stock_count)
 
-    def _set_cached(self, key: str, value):
-        self._cache[key] = {
-            'value': value,
-            'timestamp': time.time()
-        }
+        cached = self.cache.get('stock_field', key)
+        if cached is not MISSING:
+            self._field_hits += 1
+            return cached
 
-    async def create_stock_embed(self, products: list) -> discord.Embed:
-        # Nonaktifkan caching untuk memastikan data selalu fresh
-        embed = discord.Embed(
-            title="🏪 Store Stock Status",
-            color=discord.Color.blue(),
-            timestamp=datetime.utcnow()
-        )
+        field = render_field(product)
+        self.cache.set('stock_field', key, field, tags=(f"product:{code}",))
+        self._field_misses += 1
+        return field
+
+    async def render_fields(self, products: list) -> List[Tuple[str, str]]:
+        fields = []
+        for product in sorted(products, key=lambda x: x['code']):
+            # Stock count comes from the in-memory counters
+            if product.get('stock_count') is None:
+                product = {
+                    **product,
+                    'stock_count': await self.product_manager.get_stock_count(product['code'])
+                }
+            fields.append(self._render_field(product))
+        return fields
+
+    def _build_embeds(self, fields: List[Tuple[str, str]]) -> List[discord.Embed]:
+        title = "🏪 Store Stock Status"
+        footer = f"Last Update: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC"
+        # Title, page suffix and footer count towards the character limit
+        budget = MAX_EMBED_CHARS - len(title) - len(footer) - 16
+
+        chunks = split_fields(fields, budget)
 
-        if products:
-            for product in sorted(products, key=lambda x: x['code']):
-                # Force invalidate cache dan ambil data fresh
-                self.product_manager.invalidate_cache(product['code'])
-                stock_count = await self.product_manager.get_stock_count(product['code'])
-                
-                # Tambah logging untuk debugging
-                self.logger.info(f"Live Stock Update - Product: {product['code']}, Stock Count: {stock_count}")
-                
-                value = (
-                    f"💎 Code: `{product['code']}`\n"
-                    f"📦 Stock: `{stock_count}`\n"
-                    f"💰 Price: `{product['price']:,} WL`\n"
-                )
-                if product.get('description'):
-                    value += f"📝 Info: {product['description']}\n"
-                
-                embed.add_field(
-                    name=f"🔸 {product['name']} 🔸",
-                    value=value,
-                    inline=False
-                )
-        else:
-            embed.description = "No products available."
+        embeds = []
+        for index, chunk in enumerate(chunks, 1):
+            embed = discord.Embed(
+                title=title if len(chunks) == 1 else f"{title} ({index}/{len(chunks)})",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            for name, value in chunk:
+                embed.add_field(name=name, value=value, inline=False)
+            if not fields:
+                embed.description = "No products available."
+            embed.set_footer(text=footer)
+            embeds.append(embed)
+        return embeds
 
-        embed.set_footer(text=f"Last Update: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
-        return embed
+    async def render_stock_board(self, products: list) -> Tuple[List[discord.Embed], str]:
+        """Render the board and its content hash.
+
+        Products are split across embeds of at most MAX_EMBED_FIELDS fields,
+        each under Discord's per-message character limit, so every embed is
+        sent as its own message.
+        """
+        fields = await self.render_fields(products)
+        embeds = self._build_embeds(fields)
+        self.logger.debug(
+            f"Rendered live stock: {len(fields)} products in {len(embeds)} embeds, "
+            f"field cache {self._field_hits} hits / {self._field_misses} misses"
+        )
+        return embeds, content_hash(fields)
+
+    async def create_stock_embed(self, products: list) -> discord.Embed:
+        """First embed of the rendered board"""
+        embeds, _ = await self.render_stock_board(products)
+        return embeds[0]
 
     async def cleanup(self):
         """Cleanup resources"""
-        self._cache.clear()
\ No newline at end of file
+        self.cache.clear('stock_field')
\ No newline at end of file
@@ -3,11 +3,19 @@ from discord.ext import commands, tasks
 import logging
 import asyncio
 import json
+import time
 from datetime import datetime
+from typing import List
 
 from .live_service import LiveStockService
 from .live_views import StockView
-from .constants import UPDATE_INTERVAL
+from .stock_events import StockEventBus
+from .constants import (
+    LIVE_STOCK_DEBOUNCE,
+    LIVE_STOCK_MIN_EDIT_INTERVAL,
+    LIVE_STOCK_FALLBACK_INTERVAL,
+    LIVE_STOCK_MAX_MESSAGES
+)
 
 # Load config
 with open('config.json') as config_file:
@@ -15,19 +23,39 @@ with open('config.json') as config_file:
     LIVE_STOCK_CHANNEL_ID = int(config['id_live_stock'])
 
 class LiveStock(commands.Cog):
+    """Live stock board.
+
+    Re-rendered when the stock event bus reports a committed change:
+    events are coalesced for LIVE_STOCK_DEBOUNCE seconds, edits are spaced
+    at least LIVE_STOCK_MIN_EDIT_INTERVAL apart, and the message is only
+    edited when the rendered content hash differs. Catalogues larger than
+    one embed are spread over several messages. A slow fallback poll picks
+    up changes made outside the bot.
+    """
+
     def __init__(self, bot):
         self.bot = bot
-        self.message = None
+        self.messages: List[discord.Message] = []
         self.service = LiveStockService(bot)
         self.stock_view = StockView(bot)
+        self.events = StockEventBus()
         self.logger = logging.getLogger("LiveStock")
         self.ready = asyncio.Event()
+        self._dirty = asyncio.Event()
+        self._unsubscribe = None
+        self._renderer = None
+        self._last_edit = 0.0
+        self._last_hash = None
+        self._edits = 0
+        self._skipped = 0
         
         bot.add_view(self.stock_view)
 
     async def cog_load(self):
         """Called when cog is being loaded"""
         try:
+            self._unsubscribe = self.events.subscribe(self._on_stock_event)
+            self._renderer = asyncio.create_task(self._render_loop())
             self.live_stock.start()
             self.logger.info("LiveStock cog loaded and task started")
         except Exception as e:
@@ -36,55 +64,115 @@ class LiveStock(commands.Cog):
 
     def cog_unload(self):
         """Called when cog is being unloaded"""
+        if self._unsubscribe:
+            self._unsubscribe()
+        if self._renderer:
+            self._renderer.cancel()
         if hasattr(self, 'live_stock'):
             self.live_stock.cancel()
         self.logger.info("LiveStock cog unloaded")
 
-    async def get_or_create_message(self):
-        """Get existing message or create new one"""
+    def _on_stock_event(self, event):
+        self.logger.debug(f"Stock event {event.kind} for {event.product_code}")
+        self._dirty.set()
+
+    def request_update(self):
+        """Schedule a re-render (coalesced with any pending one)"""
+        self._dirty.set()
+
+    async def _find_messages(self, channel) -> List[discord.Message]:
+        """The bot's trailing messages in the channel, oldest first"""
+        messages = []
+        async for msg in channel.history(limit=LIVE_STOCK_MAX_MESSAGES):
+            if msg.author != self.bot.user:
+                break
+            messages.append(msg)
+        return list(reversed(messages))
+
+    async def _sync_messages(self, embeds: List[discord.Embed]):
+        """Put one embed per message, reusing existing messages.
+
+        The view goes on the last message so the buttons stay at the bottom.
+        """
         channel = self.bot.get_channel(LIVE_STOCK_CHANNEL_ID)
         if not channel:
-            self.logger.error(f"Could not find channel with ID {LIVE_STOCK_CHANNEL_ID}")
-            return None
+            raise RuntimeError(f"Could not find channel with ID {LIVE_STOCK_CHANNEL_ID}")
 
-        try:
-            # Get last message from bot
-            async for msg in channel.history(limit=1):
-                if msg.author == self.bot.user:
-                    return msg
-                    
-            # If no message found, create new one
-            products = await self.service.product_manager.get_all_products()
-            embed = await self.service.create_stock_embed(products)
-            return await channel.send(embed=embed, view=self.stock_view)
-            
-        except Exception as e:
-            self.logger.error(f"Error in get_or_create_message: {e}")
-            return None
+        if len(embeds) > LIVE_STOCK_MAX_MESSAGES:
+            self.logger.warning(
+                f"Live stock needs {len(embeds)} messages, showing the first {LIVE_STOCK_MAX_MESSAGES}"
+            )
+            embeds = embeds[:LIVE_STOCK_MAX_MESSAGES]
 
-    @tasks.loop(seconds=UPDATE_INTERVAL)
-    async def live_stock(self):
-        """Update live stock message"""
-        try:
-            if not self.message:
-                self.message = await self.get_or_create_message()
-                if not self.message:
-                    return
+        if not self.messages:
+            self.messages = await self._find_messages(channel)
 
+        for index, embed in enumerate(embeds):
+            view = self.stock_view if index == len(embeds) - 1 else None
+            if index < len(self.messages):
+                await self.messages[index].edit(embed=embed, view=view)
+            else:
+                self.messages.append(await channel.send(embed=embed, view=view))
+
+        for msg in self.messages[len(embeds):]:
+            try:
+                await msg.delete()
+            except discord.NotFound:
+                pass
+        del self.messages[len(embeds):]
+
+    async def _render_loop(self):
+        """Debounce stock events and edit the message at a bounded rate"""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                await self._dirty.wait()
+                await asyncio.sleep(LIVE_STOCK_DEBOUNCE)
+
+                wait = self._last_edit + LIVE_STOCK_MIN_EDIT_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                # Events arriving from here on schedule another pass
+                self._dirty.clear()
+                await self.update_message()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error in live stock renderer: {e}")
+
+    async def update_message(self):
+        """Render the board and edit the messages if the content changed"""
+        try:
             products = await self.service.product_manager.get_all_products()
-            embed = await self.service.create_stock_embed(products)
+            embeds, content_hash = await self.service.render_stock_board(products)
+            if content_hash == self._last_hash and self.messages:
+                self._skipped += 1
+                return
 
             try:
-                await self.message.edit(embed=embed, view=self.stock_view)
-                self.logger.debug(f"Updated message {self.message.id}")
+                await self._sync_messages(embeds)
+                self._last_hash = content_hash
+                self._edits += 1
+                self.logger.debug(f"Updated live stock ({len(self.messages)} messages)")
             except discord.NotFound:
-                self.message = await self.get_or_create_message()
-                self.logger.info("Created new message as old one was not found")
+                # A message was deleted under us; look them up again next pass
+                self.messages = []
+                self.request_update()
+                self.logger.info("Live stock message not found, recreating")
+            finally:
+                self._last_edit = time.monotonic()
             
         except Exception as e:
             self.logger.error(f"Error in live_stock update: {e}")
-            # Reset message if error occurs
-            self.message = None
+            # Reset messages if error occurs
+            self.messages = []
+
+    @tasks.loop(seconds=LIVE_STOCK_FALLBACK_INTERVAL)
+    async def live_stock(self):
+        """Fallback poll for changes made outside the bot"""
+        self.service.product_manager.invalidate_cache()
+        self.request_update()
 
     @live_stock.before_loop
     async def before_live_stock(self):
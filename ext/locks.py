@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Hashable, List, Optional
+
+from .constants import LOCK_STRIPES
+
+
+class _LockEntry:
+    __slots__ = ('lock', 'refs')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class _KeyedLockContext:
+    __slots__ = ('_manager', '_key', '_entry')
+
+    def __init__(self, manager: 'KeyedLocks', key: Hashable):
+        self._manager = manager
+        self._key = key
+        self._entry = None
+
+    async def __aenter__(self):
+        self._entry = await self._manager._acquire(self._key)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._manager._release(self._key, self._entry)
+        return False
+
+
+class KeyedLocks:
+    """Per-key asyncio locks that do not accumulate.
+
+    By default every key gets its own lock, reference counted and removed
+    as soon as nobody holds or waits on it. With stripes > 0 keys hash
+    onto a fixed pool of locks instead, trading occasional false
+    contention for a hard memory bound.
+
+        async with locks("balance_STEVE"):
+            ...
+
+    Locks are not reentrant, and in striped mode two different keys can
+    share a lock, so never acquire a key while holding another one from
+    the same KeyedLocks: it can deadlock on itself. Release the outer lock
+    before calling code that takes its own.
+    """
+
+    def __init__(self, name: str = "shared", stripes: int = LOCK_STRIPES):
+        self.name = name
+        self.logger = logging.getLogger(f"KeyedLocks[{name}]")
+        self._entries: Dict[Hashable, _LockEntry] = {}
+        self._stripes: Optional[List[_LockEntry]] = (
+            [_LockEntry() for _ in range(stripes)] if stripes > 0 else None
+        )
+
+        self._acquisitions = 0
+        self._contended = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_keys = 0
+
+    def __call__(self, key: Hashable) -> _KeyedLockContext:
+        return _KeyedLockContext(self, key)
+
+    def _entry_for(self, key: Hashable) -> _LockEntry:
+        if self._stripes is not None:
+            return self._stripes[hash(key) % len(self._stripes)]
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _LockEntry()
+            self._peak_keys = max(self._peak_keys, len(self._entries))
+        return entry
+
+    async def _acquire(self, key: Hashable) -> _LockEntry:
+        entry = self._entry_for(key)
+        entry.refs += 1
+        try:
+            if entry.lock.locked():
+                self._contended += 1
+                start = time.monotonic()
+                await entry.lock.acquire()
+                wait = time.monotonic() - start
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            else:
+                await entry.lock.acquire()
+        except BaseException:
+            self._drop_ref(key, entry)
+            raise
+        self._acquisitions += 1
+        return entry
+
+    def _release(self, key: Hashable, entry: _LockEntry):
+        entry.lock.release()
+        self._drop_ref(key, entry)
+
+    def _drop_ref(self, key: Hashable, entry: _LockEntry):
+        entry.refs -= 1
+        if entry.refs == 0 and self._stripes is None and self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def locked(self, key: Hashable) -> bool:
+        if self._stripes is not None:
+            return self._entry_for(key).lock.locked()
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def stats(self) -> Dict:
+        return {
+            'mode': 'striped' if self._stripes is not None else 'per-key',
+            'stripes': len(self._stripes) if self._stripes is not None else 0,
+            'active_keys': len(self._entries),
+            'peak_keys': self._peak_keys,
+            'acquisitions': self._acquisitions,
+            'contended': self._contended,
+            'avg_wait_ms': (self._total_wait / self._contended * 1000) if self._contended else 0.0,
+            'max_wait_ms': self._max_wait * 1000
+        }
+
+
+_shared: Optional[KeyedLocks] = None
+
+
+def get_locks() -> KeyedLocks:
+    """Lock registry shared by the ext services"""
+    global _shared
+    if _shared is None:
+        _shared = KeyedLocks("shared")
+    return _shared
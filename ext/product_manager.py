@@ -1,14 +1,21 @@
 import logging
-import asyncio
-import time
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
 from datetime import datetime
 
 import discord
-from discord.ext import commands
-
-from .constants import STATUS_AVAILABLE, TransactionError
-from database import get_connection
+from discord.ext import commands, tasks
+
+from .constants import (
+    STATUS_AVAILABLE,
+    STOCK_RECONCILE_INTERVAL,
+    STOCK_IMPORT_CHUNK_SIZE,
+    TransactionError
+)
+from .locks import get_locks
+from .cache import MISSING, get_cache
+from .stock_counter import StockCounter
+from .stock_events import StockEventBus, STOCK_CHANGED, PRODUCT_CHANGED, PRODUCT_DELETED
+from async_db import get_db, on_commit
 
 class ProductManagerService:
     _instance = None
@@ -23,55 +30,44 @@ class ProductManagerService:
         if not self.initialized:
             self.bot = bot
             self.logger = logging.getLogger("ProductManagerService")
-            self._cache = {}
-            self._cache_timeout = 60
-            self._locks = {}
+            self.cache = get_cache()
+            self.locks = get_locks()
+            self.db = get_db()
+            self.stock_counter = StockCounter()
+            self.stock_events = StockEventBus()
             self.initialized = True
 
-    async def _get_lock(self, key: str) -> asyncio.Lock:
-        if key not in self._locks:
-            self._locks[key] = asyncio.Lock()
-        return self._locks[key]
-
-    def _get_cached(self, key: str):
-        if key in self._cache:
-            data = self._cache[key]
-            if time.time() - data['timestamp'] < self._cache_timeout:
-                return data['value']
-            del self._cache[key]
-        return None
-
-    def _set_cached(self, key: str, value):
-        self._cache[key] = {
-            'value': value,
-            'timestamp': time.time()
-        }
+    def _stock_committed(self, product_code: str, delta: int):
+        """Commit hook: move the stock counter and notify subscribers"""
+        if delta:
+            self.stock_counter.adjust(product_code, delta)
+            self.stock_events.publish(STOCK_CHANGED, product_code, delta)
 
     async def create_product(self, code: str, name: str, price: int, description: str = None) -> Dict:
         # Validate input
         if not code or not name or price <= 0:
             raise ValueError("Invalid product details")
+
+        def _create(conn):
+            cursor = conn.cursor()
+            
+            # Check if product code already exists
+            cursor.execute("SELECT code FROM products WHERE code = ?", (code,))
+            if cursor.fetchone():
+                raise ValueError(f"Product code {code} already exists")
+            
+            cursor.execute(
+                """
+                INSERT INTO products (code, name, price, description, created_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                (code, name, price, description)
+            )
+            on_commit(lambda: self.stock_events.publish(PRODUCT_CHANGED, code))
             
-        async with await self._get_lock(f"product_{code}"):
-            conn = None
+        async with self.locks(f"product_{code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check if product code already exists
-                cursor.execute("SELECT code FROM products WHERE code = ?", (code,))
-                if cursor.fetchone():
-                    raise ValueError(f"Product code {code} already exists")
-                
-                cursor.execute(
-                    """
-                    INSERT INTO products (code, name, price, description, created_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (code, name, price, description)
-                )
-                
-                conn.commit()
+                await self.db.write(_create)
                 
                 result = {
                     'code': code,
@@ -82,28 +78,30 @@ class ProductManagerService:
                 }
                 
                 # Update cache
-                self._set_cached(f"product_{code}", result)
-                self._cache.pop("all_products", None)  # Invalidate all products cache
+                self.cache.set('product', code, result, tags=(f"product:{code}",))
+                self.cache.delete('products', 'all')
                 
                 self.logger.info(f"Created new product: {code} - {name} at {price} WLs")
                 return result
 
             except Exception as e:
                 self.logger.error(f"Error creating product: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def edit_product(self, code: str, field: str, value: any) -> bool:
-        async with await self._get_lock(f"product_{code}"):
-            conn = None
+        def _edit(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE products SET {field} = ?, updated_at = CURRENT_TIMESTAMP WHERE code = ?",
+                (value, code)
+            )
+            
+            if cursor.rowcount == 0:
+                raise ValueError(f"Product {code} not found")
+            on_commit(lambda: self.stock_events.publish(PRODUCT_CHANGED, code))
+
+        async with self.locks(f"product_{code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
                 # Validate field
                 valid_fields = ['name', 'price', 'description']
                 if field not in valid_fields:
@@ -113,15 +111,7 @@ class ProductManagerService:
                 if field == 'price' and (not isinstance(value, int) or value <= 0):
                     raise ValueError("Price must be a positive number")
                 
-                cursor.execute(
-                    f"UPDATE products SET {field} = ?, updated_at = CURRENT_TIMESTAMP WHERE code = ?",
-                    (value, code)
-                )
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(f"Product {code} not found")
-                    
-                conn.commit()
+                await self.db.write(_edit)
                 
                 # Invalidate cache
                 self.invalidate_cache(code)
@@ -131,34 +121,30 @@ class ProductManagerService:
 
             except Exception as e:
                 self.logger.error(f"Error editing product: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def delete_product(self, code: str) -> bool:
-        async with await self._get_lock(f"product_{code}"):
-            conn = None
+        def _delete(conn):
+            cursor = conn.cursor()
+            
+            # Check if product has stock
+            cursor.execute(
+                "SELECT COUNT(*) as count FROM stock WHERE product_code = ? AND status = ?",
+                (code, STATUS_AVAILABLE)
+            )
+            if cursor.fetchone()['count'] > 0:
+                raise ValueError("Cannot delete product with existing stock")
+            
+            cursor.execute("DELETE FROM products WHERE code = ?", (code,))
+            
+            if cursor.rowcount == 0:
+                raise ValueError(f"Product {code} not found")
+            on_commit(lambda: self.stock_counter.drop(code))
+            on_commit(lambda: self.stock_events.publish(PRODUCT_DELETED, code))
+
+        async with self.locks(f"product_{code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check if product has stock
-                cursor.execute(
-                    "SELECT COUNT(*) as count FROM stock WHERE product_code = ? AND status = ?",
-                    (code, STATUS_AVAILABLE)
-                )
-                if cursor.fetchone()['count'] > 0:
-                    raise ValueError("Cannot delete product with existing stock")
-                
-                cursor.execute("DELETE FROM products WHERE code = ?", (code,))
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(f"Product {code} not found")
-                    
-                conn.commit()
+                await self.db.write(_delete)
                 
                 # Invalidate cache
                 self.invalidate_cache(code)
@@ -168,126 +154,176 @@ class ProductManagerService:
 
             except Exception as e:
                 self.logger.error(f"Error deleting product: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def get_product(self, code: str) -> Optional[Dict]:
-        cached = self._get_cached(f"product_{code}")
-        if cached:
+        cached = self.cache.get('product', code)
+        if cached is not MISSING:
             return cached
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
+            result = await self.db.fetchone(
                 "SELECT * FROM products WHERE code = ?",
                 (code,)
             )
             
-            result = cursor.fetchone()
             if result:
                 product = dict(result)
-                self._set_cached(f"product_{code}", product)
+                self.cache.set('product', code, product, tags=(f"product:{code}",))
                 return product
+            self.cache.set_missing('product', code, tags=(f"product:{code}",))
             return None
 
         except Exception as e:
             self.logger.error(f"Error getting product: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     async def get_all_products(self) -> List[Dict]:
-        cached = self._get_cached("all_products")
-        if cached:
-            return cached
-
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT p.*, 
-                       (SELECT COUNT(*) FROM stock WHERE product_code = p.code AND status = ?) as stock_count
-                FROM products p 
-                ORDER BY p.code
-            """, (STATUS_AVAILABLE,))
-            
-            products = [dict(row) for row in cursor.fetchall()]
-            self._set_cached("all_products", products)
-            return products
+            products = self.cache.get('products', 'all')
+            if products is MISSING:
+                rows = await self.db.fetchall("SELECT * FROM products ORDER BY code")
+                products = [dict(row) for row in rows]
+                self.cache.set('products', 'all', products)
+
+            # Counts come from the live counters, not the cached rows
+            if not self.stock_counter.loaded:
+                await self.stock_counter.load(self.db)
+            return [
+                {**product, 'stock_count': self.stock_counter.get(product['code'])}
+                for product in products
+            ]
 
         except Exception as e:
             self.logger.error(f"Error getting all products: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def add_stock_item(self, product_code: str, content: str, added_by: str) -> bool:
         if not content.strip():
             raise ValueError("Stock content cannot be empty")
+
+        def _add(conn):
+            cursor = conn.cursor()
+            
+            # Verify product exists
+            cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
+            if not cursor.fetchone():
+                raise ValueError(f"Product {product_code} not found")
+            
+            # Check if content already exists
+            cursor.execute("SELECT id FROM stock WHERE content = ? AND status = ?", 
+                         (content.strip(), STATUS_AVAILABLE))
+            if cursor.fetchone():
+                return False
             
-        async with await self._get_lock(f"stock_{product_code}"):
-            conn = None
+            cursor.execute(
+                """
+                INSERT INTO stock (product_code, content, added_by, status, added_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                (product_code, content.strip(), added_by, STATUS_AVAILABLE)
+            )
+            on_commit(lambda: self._stock_committed(product_code, 1))
+            return True
+            
+        async with self.locks(f"stock_{product_code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Verify product exists
-                cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
-                if not cursor.fetchone():
-                    raise ValueError(f"Product {product_code} not found")
-                
-                # Check if content already exists
-                cursor.execute("SELECT id FROM stock WHERE content = ? AND status = ?", 
-                             (content.strip(), STATUS_AVAILABLE))
-                if cursor.fetchone():
+                if not await self.db.write(_add):
                     self.logger.warning(f"Stock content already exists and available: {content}")
                     return False
                 
-                cursor.execute(
-                    """
-                    INSERT INTO stock (product_code, content, added_by, status, added_at)
-                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (product_code, content.strip(), added_by, STATUS_AVAILABLE)
-                )
-                
-                conn.commit()
-                
-                # Force invalidate cache
-                self._cache.pop(f"stock_count_{product_code}", None)
-                self._cache.pop("all_products", None)
-                
                 self.logger.info(f"Added stock item to {product_code} by {added_by}")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error adding stock item: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
+
+    async def add_stock_bulk(
+        self,
+        product_code: str,
+        lines: Iterable[str],
+        added_by: str,
+        progress: Optional[Callable[[Dict[str, int]], Awaitable[None]]] = None,
+        chunk_size: int = STOCK_IMPORT_CHUNK_SIZE
+    ) -> Dict[str, int]:
+        """Import many stock lines in chunked write transactions.
+
+        Lines are de-duplicated in memory first; anything already in the
+        stock table is skipped by the UNIQUE content index. Returns exact
+        processed/added/duplicates/failed counts, and awaits progress(counts)
+        after every chunk.
+        """
+        counts = {'processed': 0, 'added': 0, 'duplicates': 0, 'failed': 0}
+        seen = set()
+
+        def _insert_chunk(conn, rows):
+            cursor = conn.cursor()
+            cursor.execute("SELECT code FROM products WHERE code = ?", (product_code,))
+            if not cursor.fetchone():
+                raise ValueError(f"Product {product_code} not found")
+
+            before = conn.total_changes
+            cursor.executemany(
+                """
+                INSERT OR IGNORE INTO stock (product_code, content, added_by, status, added_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                rows
+            )
+            inserted = conn.total_changes - before
+            on_commit(lambda: self._stock_committed(product_code, inserted))
+            return inserted
+
+        async def _flush(chunk):
+            rows = [(product_code, content, added_by, STATUS_AVAILABLE) for content in chunk]
+            async with self.locks(f"stock_{product_code}"):
+                try:
+                    inserted = await self.db.write(lambda conn: _insert_chunk(conn, rows))
+                except ValueError:
+                    raise
+                except Exception as e:
+                    self.logger.error(f"Error importing stock chunk for {product_code}: {e}")
+                    counts['failed'] += len(chunk)
+                    inserted = 0
+                else:
+                    counts['duplicates'] += len(chunk) - inserted
+            counts['added'] += inserted
+            counts['processed'] += len(chunk)
+            if progress:
+                await progress(dict(counts))
+
+        chunk = []
+        for line in lines:
+            content = line.strip()
+            if not content:
+                continue
+            if content in seen:
+                counts['duplicates'] += 1
+                counts['processed'] += 1
+                continue
+            seen.add(content)
+            chunk.append(content)
+            if len(chunk) >= chunk_size:
+                await _flush(chunk)
+                chunk = []
+
+        if chunk:
+            await _flush(chunk)
+
+        self.logger.info(
+            f"Bulk stock import for {product_code} by {added_by}: "
+            f"{counts['added']} added, {counts['duplicates']} duplicates, {counts['failed']} failed"
+        )
+        return counts
 
     async def get_available_stock(self, product_code: str, quantity: int = 1) -> List[Dict]:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            rows = await self.db.fetchall("""
                 SELECT id, content, added_at, added_by
                 FROM stock
                 WHERE product_code = ? AND status = ?
-                ORDER BY added_at ASC
+                ORDER BY added_at ASC, id ASC
                 LIMIT ?
             """, (product_code, STATUS_AVAILABLE, quantity))
             
@@ -296,164 +332,116 @@ class ProductManagerService:
                 'content': row['content'],
                 'added_at': row['added_at'],
                 'added_by': row['added_by']
-            } for row in cursor.fetchall()]
+            } for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error getting available stock: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     async def get_stock_count(self, product_code: str) -> int:
-        cache_key = f"stock_count_{product_code}"
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) as count 
-                FROM stock 
-                WHERE product_code = ? AND status = ?
-            """, (product_code, STATUS_AVAILABLE))
-            
-            result = cursor.fetchone()['count']
-            self._set_cached(cache_key, result)
-            return result
+            if not self.stock_counter.loaded:
+                await self.stock_counter.load(self.db)
+            return self.stock_counter.get(product_code)
 
         except Exception as e:
             self.logger.error(f"Error getting stock count: {e}")
             return 0
-        finally:
-            if conn:
-                conn.close()
 
     async def update_stock_status(self, stock_id: int, status: str, buyer_id: str = None) -> bool:
-        async with await self._get_lock(f"stock_{stock_id}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                update_query = """
-                    UPDATE stock 
-                    SET status = ?, updated_at = CURRENT_TIMESTAMP
-                """
-                params = [status]
+        def _update(conn):
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT product_code, status FROM stock WHERE id = ?", (stock_id,))
+            current = cursor.fetchone()
+            
+            update_query = """
+                UPDATE stock 
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+            """
+            params = [status]
 
-                if buyer_id:
-                    update_query += ", buyer_id = ?"
-                    params.append(buyer_id)
+            if buyer_id:
+                update_query += ", buyer_id = ?"
+                params.append(buyer_id)
 
-                update_query += " WHERE id = ?"
-                params.append(stock_id)
+            update_query += " WHERE id = ?"
+            params.append(stock_id)
 
-                cursor.execute(update_query, params)
-                
-                if cursor.rowcount == 0:
-                    raise TransactionError(f"Stock item {stock_id} not found")
-                
-                conn.commit()
-                
-                # Invalidate related caches
-                cursor.execute("SELECT product_code FROM stock WHERE id = ?", (stock_id,))
-                result = cursor.fetchone()
-                if result:
-                    self._cache.pop(f"stock_count_{result['product_code']}", None)
-                    self._cache.pop("all_products", None)
+            cursor.execute(update_query, params)
+            
+            if cursor.rowcount == 0 or not current:
+                raise TransactionError(f"Stock item {stock_id} not found")
+            
+            delta = (status == STATUS_AVAILABLE) - (current['status'] == STATUS_AVAILABLE)
+            on_commit(lambda: self._stock_committed(current['product_code'], delta))
+            return current['product_code']
+
+        async with self.locks(f"stock_{stock_id}"):
+            try:
+                await self.db.write(_update)
                 
                 self.logger.info(f"Updated stock {stock_id} status to {status}" + (f" for {buyer_id}" if buyer_id else ""))
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error updating stock status: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
 
     async def get_stock_history(self, product_code: str, limit: int = 10) -> List[Dict]:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            rows = await self.db.fetchall("""
                 SELECT * FROM stock 
                 WHERE product_code = ?
                 ORDER BY updated_at DESC
                 LIMIT ?
             """, (product_code, limit))
             
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error getting stock history: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def get_world_info(self) -> Optional[Dict]:
-        cached = self._get_cached("world_info")
-        if cached:
+        cached = self.cache.get('world_info', 1)
+        if cached is not MISSING:
             return cached
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM world_info WHERE id = 1")
-            result = cursor.fetchone()
+            result = await self.db.fetchone("SELECT * FROM world_info WHERE id = 1")
             
             if result:
                 info = dict(result)
-                self._set_cached("world_info", info)
+                self.cache.set('world_info', 1, info)
                 return info
+            self.cache.set_missing('world_info', 1)
             return None
 
         except Exception as e:
             self.logger.error(f"Error getting world info: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     async def update_world_info(self, world: str, owner: str, bot: str) -> bool:
         if not world or not owner or not bot:
             raise ValueError("World info fields cannot be empty")
             
-        async with await self._get_lock("world_info"):
-            conn = None
+        async with self.locks("world_info"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await self.db.execute("""
                     INSERT OR REPLACE INTO world_info (id, world, owner, bot, updated_at)
                     VALUES (1, ?, ?, ?, CURRENT_TIMESTAMP)
                 """, (world, owner, bot))
                 
-                conn.commit()
-                
                 # Invalidate cache
-                self._cache.pop("world_info", None)
+                self.cache.delete('world_info', 1)
                 
                 self.logger.info(f"Updated world info: {world} (Owner: {owner}, Bot: {bot})")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error updating world info: {e}")
-                if conn:
-                    conn.rollback()
                 return False
-            finally:
-                if conn:
-                    conn.close()
                     
     async def reduce_stock(self, product_code: str, quantity: int, admin_id: str, reason: str = None) -> bool:
         """
@@ -461,88 +449,79 @@ class ProductManagerService:
         """
         if quantity <= 0:
             raise ValueError("Quantity must be positive")
-                
-        async with await self._get_lock(f"stock_{product_code}"):
-            conn = None
+
+        def _reduce(conn):
+            cursor = conn.cursor()
+            
+            # Check available stock first
+            cursor.execute("""
+                SELECT COUNT(*) as count 
+                FROM stock 
+                WHERE product_code = ? AND status = ?
+            """, (product_code, STATUS_AVAILABLE))
+            
+            available = cursor.fetchone()['count']
+            if available < quantity:
+                raise ValueError(f"Insufficient stock. Only {available} available.")
+            
+            # Get stock items to be reduced
+            cursor.execute("""
+                SELECT id 
+                FROM stock 
+                WHERE product_code = ? AND status = ?
+                ORDER BY added_at ASC, id ASC
+                LIMIT ?
+            """, (product_code, STATUS_AVAILABLE, quantity))
+            
+            stock_items = cursor.fetchall()
+            if len(stock_items) < quantity:
+                raise ValueError(f"Could not get {quantity} items. Only found {len(stock_items)}.")
+            
+            # Update stock status to sold
+            stock_ids = [item['id'] for item in stock_items]
+            cursor.execute(f"""
+                UPDATE stock 
+                SET status = 'sold',
+                    updated_at = CURRENT_TIMESTAMP,
+                    seller_id = ?
+                WHERE id IN ({','.join('?' * len(stock_ids))})
+            """, [admin_id] + stock_ids)
+            
+            # Log admin action
+            cursor.execute("""
+                INSERT INTO admin_logs (admin_id, action, target, details)
+                VALUES (?, 'REDUCE_STOCK', ?, ?)
+            """, (
+                admin_id,
+                product_code,
+                f"Reduced {quantity} stock(s). Reason: {reason if reason else 'Not specified'}"
+            ))
+            on_commit(lambda: self._stock_committed(product_code, -len(stock_ids)))
+                
+        async with self.locks(f"stock_{product_code}"):
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Check available stock first
-                cursor.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM stock 
-                    WHERE product_code = ? AND status = ?
-                """, (product_code, STATUS_AVAILABLE))
-                
-                available = cursor.fetchone()['count']
-                if available < quantity:
-                    raise ValueError(f"Insufficient stock. Only {available} available.")
-                
-                # Get stock items to be reduced
-                cursor.execute("""
-                    SELECT id 
-                    FROM stock 
-                    WHERE product_code = ? AND status = ?
-                    ORDER BY added_at ASC
-                    LIMIT ?
-                """, (product_code, STATUS_AVAILABLE, quantity))
-                
-                stock_items = cursor.fetchall()
-                if len(stock_items) < quantity:
-                    raise ValueError(f"Could not get {quantity} items. Only found {len(stock_items)}.")
-                
-                # Update stock status to sold
-                stock_ids = [item['id'] for item in stock_items]
-                cursor.execute(f"""
-                    UPDATE stock 
-                    SET status = 'sold',
-                        updated_at = CURRENT_TIMESTAMP,
-                        seller_id = ?
-                    WHERE id IN ({','.join('?' * len(stock_ids))})
-                """, [admin_id] + stock_ids)
-                
-                # Log admin action
-                cursor.execute("""
-                    INSERT INTO admin_logs (admin_id, action, target, details)
-                    VALUES (?, 'REDUCE_STOCK', ?, ?)
-                """, (
-                    admin_id,
-                    product_code,
-                    f"Reduced {quantity} stock(s). Reason: {reason if reason else 'Not specified'}"
-                ))
-                
-                conn.commit()
-                
-                # Invalidate cache
-                self._cache.pop(f"stock_count_{product_code}", None)
-                self._cache.pop("all_products", None)
+                await self.db.write(_reduce)
                 
                 self.logger.info(f"Admin {admin_id} reduced {quantity} stock(s) from {product_code}")
                 return True
     
             except Exception as e:
                 self.logger.error(f"Error reducing stock: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
                     
     def invalidate_cache(self, product_code: str = None):
         """Invalidate cache for specific product or all products"""
         if product_code:
-            keys_to_delete = [k for k in self._cache if product_code in k]
-            for key in keys_to_delete:
-                del self._cache[key]
+            self.cache.invalidate_tag(f"product:{product_code}")
+            # The product list holds this product's row as well
+            self.cache.delete('products', 'all')
         else:
-            self._cache.clear()
+            for namespace in ('product', 'products', 'world_info'):
+                self.cache.clear(namespace)
 
     async def cleanup(self):
         """Cleanup resources"""
-        self._cache.clear()
-        self._locks.clear()
+        self.invalidate_cache()
 
 class ProductManagerCog(commands.Cog):
     def __init__(self, bot):
@@ -553,12 +532,29 @@ class ProductManagerCog(commands.Cog):
     async def cog_load(self):
         """Called when the cog is loaded"""
         self.logger.info("ProductManagerCog loading...")
+        await self.product_service.stock_counter.load(self.product_service.db)
+        self.reconcile_stock.start()
 
     async def cog_unload(self):
         """Called when the cog is unloaded"""
+        self.reconcile_stock.cancel()
         await self.product_service.cleanup()
         self.logger.info("ProductManagerCog unloaded")
 
+    @tasks.loop(seconds=STOCK_RECONCILE_INTERVAL)
+    async def reconcile_stock(self):
+        """Correct stock counters against the database"""
+        try:
+            drift = await self.product_service.stock_counter.reconcile(self.product_service.db)
+            if drift:
+                self.product_service.invalidate_cache()
+                for code, counts in drift.items():
+                    self.product_service.stock_events.publish(
+                        STOCK_CHANGED, code, counts['database'] - counts['counter']
+                    )
+        except Exception as e:
+            self.logger.error(f"Error reconciling stock counters: {e}")
+
 async def setup(bot):
     """Setup the ProductManager cog"""
     try:
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .constants import (
+    PURCHASE_BATCH_WINDOW, PURCHASE_BATCH_MAX_SIZE,
+    STATUS_AVAILABLE, STATUS_SOLD, TransactionError
+)
+
+
+def claim_purchase(conn, growid: str, product_code: str, quantity: int) -> Dict:
+    """Claim stock and debit balance inside the caller's write transaction.
+
+    The stock claim and the balance debit are each a single conditional
+    UPDATE ... RETURNING, so two buyers can never receive the same rows
+    and a balance can never go negative. Any TransactionError leaves the
+    rollback to the caller.
+    """
+    cursor = conn.cursor()
+
+    # Get product details
+    cursor.execute(
+        "SELECT price, name FROM products WHERE code = ?",
+        (product_code,)
+    )
+    product = cursor.fetchone()
+    if not product:
+        raise TransactionError(f"Product {product_code} not found")
+
+    total_price = product['price'] * quantity
+
+    # Claim the oldest available rows in one statement
+    cursor.execute("""
+        UPDATE stock 
+        SET status = ?, buyer_id = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id 
+            FROM stock 
+            WHERE product_code = ? AND status = ?
+            ORDER BY added_at ASC, id ASC
+            LIMIT ?
+        )
+        RETURNING id, content
+    """, (STATUS_SOLD, growid, product_code, STATUS_AVAILABLE, quantity))
+
+    stock_items = sorted(cursor.fetchall(), key=lambda item: item['id'])
+    if len(stock_items) < quantity:
+        raise TransactionError(f"Insufficient stock for {product_code}")
+
+    # Debit balance only if it covers the total - case-sensitive
+    cursor.execute(
+        """
+        UPDATE users 
+        SET balance_wl = balance_wl - ?, updated_at = CURRENT_TIMESTAMP
+        WHERE growid = ? COLLATE binary AND balance_wl >= ?
+        RETURNING balance_wl
+        """,
+        (total_price, growid, total_price)
+    )
+    user = cursor.fetchone()
+    if not user:
+        cursor.execute(
+            "SELECT 1 FROM users WHERE growid = ? COLLATE binary",
+            (growid,)
+        )
+        if not cursor.fetchone():
+            raise TransactionError(f"User {growid} not found")
+        raise TransactionError("Insufficient balance")
+
+    new_balance = user['balance_wl']
+
+    # Record transaction and get order_id
+    cursor.execute(
+        """
+        INSERT INTO transactions 
+        (growid, type, details, old_balance, new_balance, items_count, total_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        RETURNING id
+        """,
+        (
+            growid,
+            'PURCHASE',
+            f"Purchased {quantity} {product_code}",
+            str(new_balance + total_price) + " WL",
+            str(new_balance) + " WL",
+            quantity,
+            total_price
+        )
+    )
+
+    return {
+        'success': True,
+        'order_id': cursor.fetchone()['id'],
+        'items': [dict(item) for item in stock_items],
+        'total_price': total_price,
+        'new_balance': new_balance,
+        'product_name': product['name']
+    }
+
+
+class PurchaseDispatcher:
+    """Batches purchases per product code into shared write transactions.
+
+    Purchases for the same product that arrive within `window` seconds are
+    claimed in one BEGIN IMMEDIATE transaction (one fsync). Each purchase
+    runs in its own SAVEPOINT, so a failed purchase is rolled back alone and
+    its caller gets the exception while the others commit.
+    """
+
+    def __init__(self, db, claim: Callable, window: float = PURCHASE_BATCH_WINDOW,
+                 max_batch: int = PURCHASE_BATCH_MAX_SIZE):
+        self.db = db
+        self.claim = claim
+        self.window = window
+        self.max_batch = max_batch
+        self.logger = logging.getLogger("PurchaseDispatcher")
+        self._pending: Dict[str, List[Tuple[str, int, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+        # Stats
+        self._batches = 0
+        self._purchases = 0
+        self._max_batch_seen = 0
+        self._total_batch_time = 0.0
+
+    async def submit(self, growid: str, product_code: str, quantity: int) -> Dict:
+        """Queue a purchase and wait for its result dict"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(product_code, [])
+        queue.append((growid, quantity, future))
+
+        if len(queue) >= self.max_batch:
+            self._flush(product_code)
+        elif product_code not in self._timers:
+            self._timers[product_code] = loop.call_later(self.window, self._flush, product_code)
+
+        return await future
+
+    def _flush(self, product_code: str):
+        timer = self._timers.pop(product_code, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(product_code, None)
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run_batch(product_code, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, product_code: str, batch: List[Tuple[str, int, asyncio.Future]]):
+        def _claim_all(conn):
+            results = []
+            for growid, quantity, future in batch:
+                # Caller gave up while queued: do not claim or charge
+                if future.cancelled():
+                    results.append((False, asyncio.CancelledError()))
+                    continue
+                conn.execute("SAVEPOINT purchase")
+                try:
+                    result = self.claim(conn, growid, product_code, quantity)
+                    conn.execute("RELEASE purchase")
+                    results.append((True, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO purchase")
+                    conn.execute("RELEASE purchase")
+                    results.append((False, e))
+            return results
+
+        start = time.monotonic()
+        try:
+            results = await self.db.write(_claim_all)
+        except Exception as e:
+            # Commit itself failed: nothing in the batch was applied
+            self.logger.error(f"Purchase batch for {product_code} failed: {e}")
+            results = [(False, e)] * len(batch)
+
+        self._batches += 1
+        self._purchases += len(batch)
+        self._max_batch_seen = max(self._max_batch_seen, len(batch))
+        self._total_batch_time += time.monotonic() - start
+
+        for (ok, value), (growid, quantity, future) in zip(results, batch):
+            if future.done():
+                if ok and future.cancelled():
+                    self.logger.warning(
+                        f"Purchase of {quantity} {product_code} for {growid} committed after its caller cancelled"
+                    )
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self._batches,
+            'purchases': self._purchases,
+            'pending': sum(len(q) for q in self._pending.values()),
+            'avg_batch_size': (self._purchases / self._batches) if self._batches else 0.0,
+            'max_batch_size': self._max_batch_seen,
+            'avg_batch_ms': (self._total_batch_time / self._batches * 1000) if self._batches else 0.0
+        }
+
+    async def close(self):
+        """Flush queued purchases and wait for running batches"""
+        for product_code in list(self._pending):
+            self._flush(product_code)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,44 @@
+import hashlib
+import json
+from typing import Dict, List, Tuple
+
+from .constants import MAX_EMBED_FIELDS, MAX_FIELD_VALUE_LENGTH
+
+Field = Tuple[str, str]
+
+
+def render_field(product: Dict) -> Field:
+    """Live stock field (name, value) for one product"""
+    stock_count = product.get('stock_count', 0)
+    value = (
+        f"💎 Code: `{product['code']}`\n"
+        f"📦 Stock: `{stock_count}`\n"
+        f"💰 Price: `{product['price']:,} WL`\n"
+    )
+    if product.get('description'):
+        value += f"📝 Info: {product['description']}\n"
+
+    return (f"🔸 {product['name']} 🔸", value[:MAX_FIELD_VALUE_LENGTH])
+
+
+def content_hash(fields: List[Field]) -> str:
+    """Hash of the rendered board, for skipping no-op edits"""
+    return hashlib.sha256(json.dumps(fields).encode('utf-8')).hexdigest()
+
+
+def split_fields(fields: List[Field], budget: int) -> List[List[Field]]:
+    """Split fields into embeds of at most MAX_EMBED_FIELDS fields whose
+    names and values add up to no more than `budget` characters.
+
+    Always returns at least one (possibly empty) chunk.
+    """
+    chunks, chunk, size = [], [], 0
+    for name, value in fields:
+        length = len(name) + len(value)
+        if chunk and (len(chunk) >= MAX_EMBED_FIELDS or size + length > budget):
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append((name, value))
+        size += length
+    chunks.append(chunk)
+    return chunks
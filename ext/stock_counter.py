@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from .constants import STATUS_AVAILABLE
+
+
+class StockCounter:
+    """Authoritative in-process count of available stock per product code.
+
+    Loaded once with a single GROUP BY and afterwards adjusted from commit
+    hooks on the writer thread, so counts only move when the write that
+    changed the stock has committed. reconcile() re-counts on the writer
+    thread as well, as a solo write, which keeps it ordered with every
+    committed adjustment and makes any difference a real out-of-band change
+    (drift).
+    """
+    _instance = None
+
+    COUNT_QUERY = """
+        SELECT product_code, COUNT(*) as count
+        FROM stock
+        WHERE status = ?
+        GROUP BY product_code
+    """
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self.initialized:
+            self.logger = logging.getLogger("StockCounter")
+            self._counts: Dict[str, int] = {}
+            self._lock = threading.Lock()
+            self.loaded = False
+            self._reconciles = 0
+            self._drift_events = 0
+            self._last_drift: Dict[str, Dict[str, int]] = {}
+            self._last_reconcile: Optional[float] = None
+            self.initialized = True
+
+    def _count_all(self, conn) -> Dict[str, int]:
+        rows = conn.execute(self.COUNT_QUERY, (STATUS_AVAILABLE,)).fetchall()
+        return {row['product_code']: row['count'] for row in rows}
+
+    async def load(self, db) -> None:
+        """Load all counts with one GROUP BY query"""
+        # Counted on the writer thread so no committed adjustment can race it;
+        # solo so no purchase shares the transaction with pending hooks
+        await db.write(self._reconcile_in_writer, solo=True)
+        self.logger.info(f"Loaded stock counters for {len(self._counts)} products")
+
+    def get(self, product_code: str) -> int:
+        return self._counts.get(product_code, 0)
+
+    def adjust(self, product_code: str, delta: int) -> None:
+        """Apply a committed change (call through async_db.on_commit)"""
+        if not delta:
+            return
+        with self._lock:
+            self._counts[product_code] = max(0, self._counts.get(product_code, 0) + delta)
+
+    def drop(self, product_code: str) -> None:
+        with self._lock:
+            self._counts.pop(product_code, None)
+
+    def _reconcile_in_writer(self, conn) -> Dict[str, Dict[str, int]]:
+        actual = self._count_all(conn)
+        with self._lock:
+            drift = {
+                code: {'counter': self._counts.get(code, 0), 'database': actual.get(code, 0)}
+                for code in set(self._counts) | set(actual)
+                if self._counts.get(code, 0) != actual.get(code, 0)
+            }
+            self._counts = actual
+            self.loaded = True
+        return drift
+
+    async def reconcile(self, db) -> Dict[str, Dict[str, int]]:
+        """Re-count from the database, fix the counters and report drift"""
+        drift = await db.write(self._reconcile_in_writer, solo=True)
+        self._reconciles += 1
+        self._last_reconcile = time.time()
+        if drift:
+            self._drift_events += 1
+            self._last_drift = drift
+            self.logger.warning(f"Stock counter drift corrected for {len(drift)} products: {drift}")
+        return drift
+
+    def stats(self) -> Dict:
+        return {
+            'products': len(self._counts),
+            'loaded': self.loaded,
+            'reconciles': self._reconciles,
+            'drift_events': self._drift_events,
+            'last_drift': self._last_drift,
+            'last_reconcile': self._last_reconcile
+        }
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Event kinds
+STOCK_CHANGED = 'stock_changed'
+PRODUCT_CHANGED = 'product_changed'
+PRODUCT_DELETED = 'product_deleted'
+
+
+class StockEvent(NamedTuple):
+    kind: str
+    product_code: Optional[str] = None
+    delta: int = 0
+
+
+Subscriber = Callable[[StockEvent], None]
+
+
+class StockEventBus:
+    """Process-wide stock/product change notifications.
+
+    Services publish after their write has committed, usually from an
+    async_db.on_commit hook on the writer thread. Subscribers are plain
+    callables that always run on the event loop they subscribed from.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self.initialized:
+            self.logger = logging.getLogger("StockEventBus")
+            self._subscribers: List[Tuple[asyncio.AbstractEventLoop, Subscriber]] = []
+            self._lock = threading.Lock()
+            self._published = 0
+            self.initialized = True
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Register callback on the running loop; returns an unsubscribe function"""
+        entry = (asyncio.get_running_loop(), callback)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def _unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+
+        return _unsubscribe
+
+    def publish(self, kind: str, product_code: Optional[str] = None, delta: int = 0):
+        """Deliver an event to every subscriber (safe from any thread)"""
+        event = StockEvent(kind, product_code, delta)
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._published += 1
+
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+
+        for loop, callback in subscribers:
+            if loop.is_closed():
+                continue
+            try:
+                if loop is current:
+                    loop.call_soon(self._dispatch, callback, event)
+                else:
+                    loop.call_soon_threadsafe(self._dispatch, callback, event)
+            except RuntimeError as e:
+                self.logger.warning(f"Dropping {kind} event for {product_code}: {e}")
+
+    def _dispatch(self, callback: Subscriber, event: StockEvent):
+        try:
+            callback(event)
+        except Exception as e:
+            self.logger.error(f"Stock event subscriber failed on {event.kind}: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self._published
+            }
@@ -1,5 +1,4 @@
 import logging
-import asyncio
 import time
 import io
 from typing import Dict, List, Optional
@@ -8,8 +7,13 @@ from datetime import datetime
 import discord
 from discord.ext import commands
 
-from .constants import STATUS_AVAILABLE, STATUS_SOLD, TransactionError
-from database import get_connection
+from .constants import STATUS_AVAILABLE
+from .purchase_queue import PurchaseDispatcher, claim_purchase
+from .locks import get_locks
+from .cache import get_cache
+from .stock_counter import StockCounter
+from .stock_events import StockEventBus, STOCK_CHANGED
+from async_db import get_db, on_commit
 
 class TransactionManager:
     _instance = None
@@ -24,15 +28,19 @@ class TransactionManager:
         if not self.initialized:
             self.bot = bot
             self.logger = logging.getLogger("TransactionManager")
-            self._cache = {}
-            self._cache_timeout = 30
-            self._locks = {}
+            self.cache = get_cache()
+            self.locks = get_locks()
+            self.db = get_db()
+            self.stock_counter = StockCounter()
+            self.stock_events = StockEventBus()
+            self.purchases = PurchaseDispatcher(self.db, self._claim_purchase)
             self.initialized = True
 
-    async def _get_lock(self, key: str) -> asyncio.Lock:
-        if key not in self._locks:
-            self._locks[key] = asyncio.Lock()
-        return self._locks[key]
+    def _stock_committed(self, product_code: str, delta: int):
+        """Commit hook: move the stock counter and notify subscribers"""
+        if delta:
+            self.stock_counter.adjust(product_code, delta)
+            self.stock_events.publish(STOCK_CHANGED, product_code, delta)
 
     async def send_purchase_result(self, user: discord.User, items: list, product_name: str) -> bool:
         try:
@@ -67,103 +75,22 @@ class TransactionManager:
             self.logger.error(f"Error sending purchase result to {user.name} ({user.id}): {e}")
             return False
 
+    def _claim_purchase(self, conn, growid: str, product_code: str, quantity: int) -> Dict:
+        """claim_purchase plus the counter and balance cache updates on commit"""
+        result = claim_purchase(conn, growid, product_code, quantity)
+        on_commit(lambda: self._stock_committed(product_code, -quantity))
+        on_commit(lambda: self.cache.delete('balance', growid))
+        return result
+
     async def process_purchase(self, growid: str, product_code: str, quantity: int = 1) -> Optional[Dict]:
-        async with await self._get_lock(f"purchase_{growid}_{product_code}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Get product details
-                cursor.execute(
-                    "SELECT price, name FROM products WHERE code = ?",
-                    (product_code,)  # Removed ()
-                )
-                product = cursor.fetchone()
-                if not product:
-                    raise TransactionError(f"Product {product_code} not found")
-                
-                total_price = product['price'] * quantity
-                
-                # Get available stock
-                cursor.execute("""
-                    SELECT id, content 
-                    FROM stock 
-                    WHERE product_code = ? AND status = ?
-                    ORDER BY added_at ASC
-                    LIMIT ?
-                """, (product_code, STATUS_AVAILABLE, quantity))
-                
-                stock_items = cursor.fetchall()
-                if len(stock_items) < quantity:
-                    raise TransactionError(f"Insufficient stock for {product_code}")
-                
-                # Get user balance - case-sensitive
-                cursor.execute(
-                    "SELECT balance_wl FROM users WHERE growid = ? COLLATE binary",
-                    (growid,)
-                )
-                user = cursor.fetchone()
-                if not user:
-                    raise TransactionError(f"User {growid} not found")
-                
-                if user['balance_wl'] < total_price:
-                    raise TransactionError("Insufficient balance")
-                
-                # Update stock status
-                stock_ids = [item['id'] for item in stock_items]
-                cursor.execute(f"""
-                    UPDATE stock 
-                    SET status = ?, buyer_id = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id IN ({','.join('?' * len(stock_ids))})
-                """, [STATUS_SOLD, growid] + stock_ids)
-                
-                # Update user balance
-                new_balance = user['balance_wl'] - total_price
-                cursor.execute(
-                    "UPDATE users SET balance_wl = ? WHERE growid = ? COLLATE binary",
-                    (new_balance, growid)
-                )
-                
-                # Record transaction and get order_id
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, items_count, total_price)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    RETURNING id
-                    """,
-                    (
-                        growid,
-                        'PURCHASE',
-                        f"Purchased {quantity} {product_code}",
-                        str(user['balance_wl']) + " WL",
-                        str(new_balance) + " WL",
-                        quantity,
-                        total_price
-                    )
-                )
-                
-                order_id = cursor.fetchone()['id']
-                conn.commit()
-                
-                return {
-                    'success': True,
-                    'order_id': order_id,  # Added order_id
-                    'items': [dict(item) for item in stock_items],
-                    'total_price': total_price,
-                    'new_balance': new_balance,
-                    'product_name': product['name']
-                }
+        # No per-key lock: purchases are batched per product into one
+        # BEGIN IMMEDIATE write and the conditional UPDATEs keep them safe
+        try:
+            return await self.purchases.submit(growid, product_code, quantity)
 
-            except Exception as e:
-                self.logger.error(f"Error processing purchase: {e}")
-                if conn:
-                    conn.rollback()
-                raise
-            finally:
-                if conn:
-                    conn.close()
+        except Exception as e:
+            self.logger.error(f"Error processing purchase: {e}")
+            raise
 
     async def log_purchase_to_channel(self, order_id: int, user: discord.User, product_code: str, total: int, price: float) -> bool:
         """Log purchase to buy-logs channel"""
@@ -193,10 +120,7 @@ class TransactionManager:
     # [Rest of existing methods remain unchanged]
     async def get_user_purchases(self, growid: str, limit: int = 10) -> List[Dict]:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            rows = await self.db.fetchall("""
                 SELECT t.*, s.content, p.name as product_name
                 FROM transactions t
                 JOIN stock s ON s.buyer_id = t.growid
@@ -206,123 +130,104 @@ class TransactionManager:
                 LIMIT ?
             """, (growid, limit))
             
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error getting user purchases: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def cancel_transaction(self, transaction_id: int, admin_id: str) -> bool:
-        async with await self._get_lock(f"cancel_transaction_{transaction_id}"):
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                # Get transaction details
-                cursor.execute("""
-                    SELECT t.*, s.id as stock_id
-                    FROM transactions t
-                    JOIN stock s ON s.buyer_id = t.growid
-                    WHERE t.id = ? AND t.type = 'PURCHASE'
-                """, (transaction_id,))
-                
-                trx = cursor.fetchone()
-                if not trx:
-                    raise ValueError(f"Transaction {transaction_id} not found")
-                
-                # Restore stock status
-                cursor.execute(
-                    "UPDATE stock SET status = ?, buyer_id = NULL WHERE id = ?",
-                    (STATUS_AVAILABLE, trx['stock_id'])
-                )
-                
-                # Restore user balance
-                cursor.execute(
-                    "UPDATE users SET balance_wl = balance_wl + ? WHERE growid = ?",
-                    (trx['total_price'], trx['growid'])
-                )
-                
-                # Record refund transaction
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, related_transaction_id, admin_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        trx['growid'],
-                        'REFUND',
-                        f"Refund for transaction #{transaction_id}",
-                        f"{trx['new_balance']} WL",
-                        f"{trx['new_balance'] + trx['total_price']} WL",
-                        transaction_id,
-                        admin_id
-                    )
+        def _cancel(conn):
+            cursor = conn.cursor()
+            
+            # Get transaction details
+            cursor.execute("""
+                SELECT t.*, s.id as stock_id, s.product_code, s.status as stock_status
+                FROM transactions t
+                JOIN stock s ON s.buyer_id = t.growid
+                WHERE t.id = ? AND t.type = 'PURCHASE'
+            """, (transaction_id,))
+            
+            trx = cursor.fetchone()
+            if not trx:
+                raise ValueError(f"Transaction {transaction_id} not found")
+            
+            # Restore stock status
+            cursor.execute(
+                "UPDATE stock SET status = ?, buyer_id = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (STATUS_AVAILABLE, trx['stock_id'])
+            )
+            if trx['stock_status'] != STATUS_AVAILABLE:
+                on_commit(lambda: self._stock_committed(trx['product_code'], 1))
+            
+            # Restore user balance
+            cursor.execute(
+                "UPDATE users SET balance_wl = balance_wl + ?, updated_at = CURRENT_TIMESTAMP WHERE growid = ?",
+                (trx['total_price'], trx['growid'])
+            )
+            on_commit(lambda: self.cache.delete('balance', trx['growid']))
+            
+            # Record refund transaction
+            cursor.execute(
+                """
+                INSERT INTO transactions 
+                (growid, type, details, old_balance, new_balance, related_transaction_id, admin_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    trx['growid'],
+                    'REFUND',
+                    f"Refund for transaction #{transaction_id}",
+                    f"{trx['new_balance']} WL",
+                    f"{trx['new_balance'] + trx['total_price']} WL",
+                    transaction_id,
+                    admin_id
                 )
-                
-                conn.commit()
+            )
+
+        async with self.locks(f"cancel_transaction_{transaction_id}"):
+            try:
+                await self.db.write(_cancel)
                 self.logger.info(f"Transaction {transaction_id} cancelled by admin {admin_id}")
                 return True
 
             except Exception as e:
                 self.logger.error(f"Error cancelling transaction: {e}")
-                if conn:
-                    conn.rollback()
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def get_transaction_history(self, growid: str, limit: int = 10) -> List[Dict]:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            rows = await self.db.fetchall("""
                 SELECT * FROM transactions 
                 WHERE growid = ? COLLATE binary
                 ORDER BY created_at DESC
                 LIMIT ?
             """, (growid, limit))
             
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error getting transaction history: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def get_stock_history(self, product_code: str, limit: int = 10) -> List[Dict]:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            rows = await self.db.fetchall("""
                 SELECT * FROM stock 
                 WHERE product_code = ?
                 ORDER BY updated_at DESC
                 LIMIT ?
             """, (product_code, limit))
             
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in rows]
 
         except Exception as e:
             self.logger.error(f"Error getting stock history: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
 
     async def cleanup(self):
         """Cleanup resources"""
-        self._cache.clear()
-        self._locks.clear()
+        await self.purchases.close()
 
 class TransactionCog(commands.Cog):
     def __init__(self, bot):
@@ -334,6 +239,11 @@ class TransactionCog(commands.Cog):
     async def on_ready(self):
         self.logger.info(f"TransactionCog is ready at {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC")
 
+    async def cog_unload(self):
+        """Called when the cog is unloaded"""
+        await self.trx_manager.cleanup()
+        self.logger.info("TransactionCog unloaded")
+
 async def setup(bot):
     try:
         if not hasattr(bot, 'transaction_cog_loaded'):
@@ -7,55 +7,22 @@ import asyncio
 import aiohttp
 import sqlite3
 import sys
-from pathlib import Path
 from datetime import datetime, UTC
 from threading import Thread
 import traceback
 
 # Import local modules
 from api.server import create_api_server
-from database import setup_database, get_connection
+from database import setup_database, close_connections
+from async_db import get_db
 from utils.command_handler import AdvancedCommandHandler
 from utils.button_handler import ButtonHandler
-from api.config import config, API_VERSION
+from api.config import API_VERSION
+from utils.logging_setup import setup_logging, load_logging_config, stop_logging
 
-# Setup logging directory
-log_dir = Path('logs')
-log_dir.mkdir(exist_ok=True)
-
-# Create formatter with current user
+# Queue-based logging; levels and rotation come from config.json "logging"
 current_user = "fdygg"  # Current user's login
-formatter = logging.Formatter(
-    '%(asctime)s UTC - %(name)s - %(levelname)s - [User: ' + current_user + ']\n'
-    'Message: %(message)s\n'
-    'Path: %(pathname)s\n'
-    'Function: %(funcName)s\n'
-    'Line: %(lineno)d\n'
-    'Details: %(exc_info)s\n'
-)
-
-# Setup file handler
-file_handler = logging.FileHandler(log_dir / f'bot_{datetime.now().strftime("%Y%m%d")}.log')
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
-
-# Setup console handler
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.DEBUG)
-console_handler.setFormatter(formatter)
-
-# Setup root logger
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.DEBUG)
-root_logger.addHandler(file_handler)
-root_logger.addHandler(console_handler)
-
-# Setup specific loggers
-loggers = ['uvicorn', 'fastapi', 'api', 'database', 'discord', 'admin']
-for logger_name in loggers:
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
-    logger.propagate = True
+setup_logging(load_logging_config())
 
 logger = logging.getLogger(__name__)
 
@@ -269,13 +236,10 @@ class MyBot(commands.Bot):
                 self.donation_log_channel_id,
                 self.history_buy_channel_id
             ]:
-                logger.info(f"""
-                Channel Message:
-                Channel: {message.channel.name}
-                Author: {message.author}
-                Content: {message.content}
-                Time: {datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')} UTC
-                """)
+                logger.debug(
+                    "Channel message: channel=%s author=%s content=%r",
+                    message.channel.name, message.author, message.content
+                )
 
             # Process commands
             if message.content.startswith(self.command_prefix):
@@ -297,12 +261,10 @@ class MyBot(commands.Bot):
         """Interaction event handler"""
         try:
             if interaction.type == discord.InteractionType.component:
-                logger.debug(f"""
-                Button interaction:
-                User: {interaction.user}
-                Custom ID: {interaction.data.get('custom_id')}
-                Time: {datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')} UTC
-                """)
+                logger.debug(
+                    "Button interaction: user=%s custom_id=%s",
+                    interaction.user, interaction.data.get('custom_id')
+                )
                 await self.button_handler.handle_button(interaction)
         except Exception as e:
             logger.error(f"""
@@ -335,13 +297,10 @@ class MyBot(commands.Bot):
                     f"⏰ Wait {error.retry_after:.1f}s!",
                     delete_after=5
                 )
-                logger.debug(f"""
-                Command on cooldown:
-                User: {ctx.author}
-                Command: {command_name}
-                Retry After: {error.retry_after:.1f}s
-                Time: {datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')} UTC
-                """)
+                logger.debug(
+                    "Command on cooldown: user=%s command=%s retry_after=%.1fs",
+                    ctx.author, command_name, error.retry_after
+                )
             else:
                 logger.error(f"""
                 Command error:
@@ -365,6 +324,7 @@ class MyBot(commands.Bot):
 
 def main():
     """Main entry point"""
+    api = None
     try:
         logger.info(f"""
         Starting application:
@@ -405,10 +365,11 @@ def main():
         # Cleanup
         try:
             logger.debug("Performing cleanup...")
-            conn = get_connection()
-            if conn:
-                conn.close()
-                logger.debug("Database connection closed")
+            if api:
+                api.stop()
+            get_db().shutdown()
+            close_connections()
+            logger.debug("Database connection closed")
         except Exception as e:
             logger.error(f"""
             Database cleanup error:
@@ -417,6 +378,8 @@ def main():
             Stack Trace:
             {traceback.format_exc()}
             """)
+        finally:
+            stop_logging()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
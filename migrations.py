@@ -0,0 +1,450 @@
+import sqlite3
+import logging
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN unless an older database already has it"""
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _m001_baseline(conn: sqlite3.Connection):
+    """Tables as setup_database created them (no-op on existing databases)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            growid TEXT PRIMARY KEY,
+            balance_wl INTEGER DEFAULT 0,
+            balance_dl INTEGER DEFAULT 0,
+            balance_bgl INTEGER DEFAULT 0,
+            balance_rupiah INTEGER DEFAULT 0,
+            website_username TEXT UNIQUE,
+            website_password TEXT,
+            is_web_active INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT DEFAULT 'system',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_by TEXT DEFAULT 'system'
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_growid (
+            discord_id TEXT PRIMARY KEY,
+            growid TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code TEXT NOT NULL,
+            content TEXT NOT NULL UNIQUE,
+            status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
+            added_by TEXT NOT NULL,
+            buyer_id TEXT,
+            seller_id TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+        )
+    """)
+
+    # currency/amount get defaults: the bot's ledger rows carry whole
+    # balances in old_balance/new_balance rather than one currency amount
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            growid TEXT NOT NULL,
+            platform TEXT DEFAULT 'discord' CHECK (platform IN ('discord', 'web')),
+            type TEXT NOT NULL,
+            currency TEXT NOT NULL DEFAULT 'wl',
+            amount INTEGER NOT NULL DEFAULT 0,
+            details TEXT NOT NULL,
+            old_balance TEXT,
+            new_balance TEXT,
+            items_count INTEGER DEFAULT 0,
+            total_price INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT DEFAULT 'system',
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversion_rates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            currency TEXT NOT NULL CHECK (currency IN ('wl', 'dl', 'bgl')),
+            rate INTEGER NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT DEFAULT 'system',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_by TEXT DEFAULT 'system'
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS world_info (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            world TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            bot TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bot_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist (
+            growid TEXT PRIMARY KEY,
+            added_by TEXT NOT NULL,
+            reason TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id TEXT NOT NULL,
+            platform TEXT DEFAULT 'discord' CHECK (platform IN ('discord', 'web')),
+            action TEXT NOT NULL,
+            target TEXT,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS role_permissions (
+            role_id TEXT PRIMARY KEY,
+            permissions TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_activity (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_id TEXT NOT NULL,
+            platform TEXT DEFAULT 'discord' CHECK (platform IN ('discord', 'web')),
+            activity_type TEXT NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (discord_id) REFERENCES user_growid(discord_id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_table (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _m002_missing_columns(conn: sqlite3.Connection):
+    """Columns older databases lack, plus those the bot's ledger writes"""
+    # Databases created before the web columns existed
+    _add_column(conn, "users", "balance_rupiah", "INTEGER DEFAULT 0")
+    _add_column(conn, "users", "website_username", "TEXT")
+    _add_column(conn, "users", "website_password", "TEXT")
+    _add_column(conn, "users", "is_web_active", "INTEGER DEFAULT 0")
+    _add_column(conn, "users", "created_by", "TEXT DEFAULT 'system'")
+    _add_column(conn, "users", "updated_by", "TEXT DEFAULT 'system'")
+    _add_column(conn, "transactions", "platform", "TEXT DEFAULT 'discord'")
+    _add_column(conn, "transactions", "currency", "TEXT NOT NULL DEFAULT 'wl'")
+    _add_column(conn, "transactions", "amount", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "transactions", "created_by", "TEXT DEFAULT 'system'")
+    _add_column(conn, "admin_logs", "platform", "TEXT DEFAULT 'discord'")
+    _add_column(conn, "user_activity", "platform", "TEXT DEFAULT 'discord'")
+
+    # Written by BalanceManagerService.transfer_balance and
+    # TransactionManager.cancel_purchase (ext/)
+    _add_column(conn, "transactions", "related_growid", "TEXT")
+    _add_column(conn, "transactions", "related_transaction_id", "INTEGER")
+    _add_column(conn, "transactions", "admin_id", "TEXT")
+
+def _m003_indexes_triggers_defaults(conn: sqlite3.Connection):
+    """Indexes, timestamp triggers and default rows from setup_database"""
+    triggers = [
+        """
+        CREATE TRIGGER IF NOT EXISTS update_users_timestamp
+        AFTER UPDATE ON users
+        BEGIN
+            UPDATE users
+            SET
+                updated_at = CURRENT_TIMESTAMP,
+                updated_by = 'system'
+            WHERE growid = NEW.growid;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS update_products_timestamp
+        AFTER UPDATE ON products
+        BEGIN
+            UPDATE products
+            SET updated_at = CURRENT_TIMESTAMP
+            WHERE code = NEW.code;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS update_stock_timestamp
+        AFTER UPDATE ON stock
+        BEGIN
+            UPDATE stock
+            SET updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS update_bot_settings_timestamp
+        AFTER UPDATE ON bot_settings
+        BEGIN
+            UPDATE bot_settings
+            SET updated_at = CURRENT_TIMESTAMP
+            WHERE key = NEW.key;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS update_conversion_rates_timestamp
+        AFTER UPDATE ON conversion_rates
+        BEGIN
+            UPDATE conversion_rates
+            SET
+                updated_at = CURRENT_TIMESTAMP,
+                updated_by = 'system'
+            WHERE id = NEW.id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS update_role_permissions_timestamp
+        AFTER UPDATE ON role_permissions
+        BEGIN
+            UPDATE role_permissions
+            SET updated_at = CURRENT_TIMESTAMP
+            WHERE role_id = NEW.role_id;
+        END;
+        """
+    ]
+    for trigger in triggers:
+        conn.execute(trigger)
+
+    indexes = [
+        ("idx_user_growid_discord", "user_growid(discord_id)"),
+        ("idx_user_growid_growid", "user_growid(growid)"),
+        ("idx_users_website_username", "users(website_username)"),
+        ("idx_stock_product_code", "stock(product_code)"),
+        ("idx_stock_status", "stock(status)"),
+        ("idx_transactions_growid", "transactions(growid)"),
+        ("idx_transactions_platform", "transactions(platform)"),
+        ("idx_transactions_created", "transactions(created_at)"),
+        ("idx_blacklist_growid", "blacklist(growid)"),
+        ("idx_admin_logs_admin", "admin_logs(admin_id)"),
+        ("idx_admin_logs_platform", "admin_logs(platform)"),
+        ("idx_admin_logs_created", "admin_logs(created_at)"),
+        ("idx_user_activity_discord", "user_activity(discord_id)"),
+        ("idx_user_activity_platform", "user_activity(platform)"),
+        ("idx_conversion_rates_currency", "conversion_rates(currency)"),
+        ("idx_conversion_rates_active", "conversion_rates(is_active)")
+    ]
+    for idx_name, idx_cols in indexes:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_cols}")
+
+    conn.execute("""
+        INSERT OR IGNORE INTO world_info (id, world, owner, bot)
+        VALUES (1, 'YOURWORLD', 'OWNER', 'BOT')
+    """)
+
+    conn.execute("""
+        INSERT OR IGNORE INTO role_permissions (role_id, permissions)
+        VALUES ('admin', 'all')
+    """)
+
+    # conversion_rates has no unique key, so guard each default explicitly
+    default_rates = [
+        ('wl', 3000),   # 1 WL = 3000 rupiah
+        ('dl', 300000), # 1 DL = 300000 rupiah
+        ('bgl', 30000000) # 1 BGL = 30000000 rupiah
+    ]
+    for currency, rate in default_rates:
+        conn.execute("""
+            INSERT INTO conversion_rates (currency, rate, created_by)
+            SELECT ?, ?, 'system'
+            WHERE NOT EXISTS (SELECT 1 FROM conversion_rates WHERE currency = ?)
+        """, (currency, rate, currency))
+
+def _m004_drop_timestamp_triggers(conn: sqlite3.Connection):
+    """Drop the AFTER UPDATE timestamp triggers.
+
+    Each one re-updated the row it fired on, so every balance change or
+    stock sale wrote the row twice. Writers now set updated_at themselves.
+    """
+    for table in ("users", "products", "stock", "bot_settings",
+                  "conversion_rates", "role_permissions"):
+        conn.execute(f"DROP TRIGGER IF EXISTS update_{table}_timestamp")
+
+def _m005_stock_fifo_index(conn: sqlite3.Connection):
+    """One composite index for the FIFO stock queries.
+
+    Purchases, get_available_stock and reduce_stock all filter on
+    product_code and status and take the oldest rows by added_at, id.
+    idx_stock_product_code is a prefix of the new index (which also serves
+    the products foreign key), so it is dropped.
+
+    idx_stock_status is not a prefix. The only query filtering on status
+    alone is StockCounter's GROUP BY load, which reads every product
+    anyway: it now reads idx_stock_fifo as a covering index, a skip-scan
+    once ANALYZE has run and otherwise a full index scan in GROUP BY
+    order. Even with idx_stock_status present the planner scanned the
+    table through idx_stock_product_code instead, so it is dropped too.
+    check_query_plans.py tracks that plan ("stock counter: load").
+
+    The index is not partial: the queries bind status as a parameter,
+    which SQLite cannot match against a partial index's WHERE clause.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_fifo
+        ON stock(product_code, status, added_at, id)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_stock_product_code")
+    conn.execute("DROP INDEX IF EXISTS idx_stock_status")
+
+def _m006_purchase_history_indexes(conn: sqlite3.Connection):
+    """Indexes for purchase and transaction history.
+
+    get_user_purchases and cancel_transaction join stock on buyer_id, which
+    had no index, and the history queries sorted a user's transactions by
+    created_at through a temp B-tree. idx_transactions_growid is a prefix of
+    the new composite index and is dropped.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_buyer ON stock(buyer_id)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_growid_created
+        ON transactions(growid, created_at)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_transactions_growid")
+
+def _m007_log_tables(conn: sqlite3.Connection):
+    """logs and audit_logs: written by LogSink and read by the log and
+    audit services, but never created by setup_database. audit_logs has
+    the columns AuditService and LogSink insert.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id TEXT PRIMARY KEY,
+            level TEXT NOT NULL,
+            category TEXT NOT NULL,
+            message TEXT NOT NULL,
+            source TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id TEXT,
+            ip_address TEXT,
+            metadata TEXT,
+            stack_trace TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS audit_logs (
+            id TEXT PRIMARY KEY,
+            category TEXT NOT NULL,
+            action TEXT NOT NULL,
+            actor_id TEXT,
+            actor_type TEXT,
+            target_id TEXT,
+            target_type TEXT,
+            description TEXT,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_created ON audit_logs(created_at)")
+
+# Append only: never edit or renumber a migration that has shipped
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _m001_baseline),
+    Migration(2, "missing_columns", _m002_missing_columns),
+    Migration(3, "indexes_triggers_defaults", _m003_indexes_triggers_defaults),
+    Migration(4, "drop_timestamp_triggers", _m004_drop_timestamp_triggers),
+    Migration(5, "stock_fifo_index", _m005_stock_fifo_index),
+    Migration(6, "purchase_history_indexes", _m006_purchase_history_indexes),
+    Migration(7, "log_tables", _m007_log_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Applied schema version, stored in the database header"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    """Apply pending migrations up to `target` (default: latest).
+
+    A warm start costs one PRAGMA read. Otherwise every pending migration
+    and the new user_version are committed in one BEGIN IMMEDIATE
+    transaction, so a failure leaves the schema untouched; the version is
+    re-read under the write lock in case another process got there first.
+    Returns the resulting schema version.
+    """
+    target = LATEST_VERSION if target is None else target
+    version = schema_version(conn)
+    if version >= target:
+        return version
+
+    start = time.monotonic()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = schema_version(conn)
+        pending = [m for m in MIGRATIONS if version < m.version <= target]
+        for migration in pending:
+            logger.info(f"Applying migration {migration.version:03d}_{migration.name}")
+            migration.apply(conn)
+        if pending:
+            # PRAGMA cannot take bound parameters; the value is an int
+            conn.execute(f"PRAGMA user_version = {int(pending[-1].version)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    if pending:
+        logger.info(
+            f"Schema migrated from version {version} to {pending[-1].version} "
+            f"in {(time.monotonic() - start) * 1000:.1f}ms"
+        )
+    return schema_version(conn)
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from migrations import migrate
+from db_pool import close_pools
+
+
+@pytest.fixture
+def shop_db(tmp_path, monkeypatch):
+    """A fully migrated shop.db in a temp directory, reached through the shared pools"""
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("shop.db")
+    migrate(conn)
+    conn.close()
+    yield tmp_path / "shop.db"
+    close_pools()
+
+
+@pytest.fixture
+def db(shop_db):
+    """A fresh AsyncDatabase over shop_db, shut down after the test"""
+    from async_db import AsyncDatabase
+    database = AsyncDatabase()
+    yield database
+    database.shutdown()
+
+
+@pytest.fixture
+def seed_stock(shop_db):
+    """seed_stock(growid, balance, code, price, items) on the temp database"""
+    def _seed(growid: str, balance: int, code: str, price: int, items: int):
+        conn = sqlite3.connect(shop_db)
+        with conn:
+            conn.execute("INSERT INTO users (growid, balance_wl) VALUES (?, ?)", (growid, balance))
+            conn.execute("INSERT INTO products (code, name, price) VALUES (?, ?, ?)", (code, code, price))
+            conn.executemany(
+                "INSERT INTO stock (product_code, content, added_by) VALUES (?, ?, 'test')",
+                ((code, f"{code}-{i}") for i in range(items))
+            )
+        conn.close()
+    return _seed
+
+
+@pytest.fixture
+def scalar(shop_db):
+    """scalar(sql, params) -> first column of the first row, read directly"""
+    def _scalar(sql: str, params: tuple = ()):
+        conn = sqlite3.connect(shop_db)
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+    return _scalar
+
+
+@pytest.fixture
+def trx(db):
+    """A TransactionManager with fresh stock singletons, on top of db"""
+    from ext.stock_counter import StockCounter
+    from ext.stock_events import StockEventBus
+    from ext.trx import TransactionManager
+
+    singletons = (TransactionManager, StockCounter, StockEventBus)
+    for cls in singletons:
+        cls._instance = None
+    yield TransactionManager(bot=None)
+    for cls in singletons:
+        cls._instance = None
@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _bare_package(name: str, path: str):
+    if name not in sys.modules:
+        module = types.ModuleType(name)
+        module.__path__ = [path]
+        sys.modules[name] = module
+
+
+def load_api_module(name: str):
+    """Import one api.* module without running the api package __init__ files.
+
+    api/models/__init__.py and api/service/__init__.py import every model
+    and service (and build the service registry) when first imported, so
+    the api packages are registered bare and a test loads just the module
+    it exercises plus whatever that module imports itself. Third-party
+    dependencies still have to be installed.
+    """
+    api_dir = os.path.join(ROOT, "api")
+    _bare_package("api", api_dir)
+    for entry in os.listdir(api_dir):
+        path = os.path.join(api_dir, entry)
+        if os.path.isdir(path) and not entry.startswith("__"):
+            _bare_package(f"api.{entry}", path)
+    return importlib.import_module(name)
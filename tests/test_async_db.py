@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from async_db import WRITE_MAX_LATENCY, on_commit
+
+
+def test_solo_write_runs_after_earlier_commit_hooks(db):
+    applied = []
+
+    def insert(conn):
+        conn.execute("INSERT INTO admin_logs (admin_id, action) VALUES ('t', 'A')")
+        on_commit(lambda: applied.append(1))
+
+    def count(conn):
+        # Everything committed before a solo write has run its hooks
+        rows = conn.execute("SELECT COUNT(*) FROM admin_logs WHERE action = 'A'").fetchone()[0]
+        return rows, len(applied)
+
+    async def main():
+        writes = [db.write(insert) for _ in range(5)]
+        return await asyncio.gather(*writes, db.write(count, solo=True))
+
+    results = asyncio.run(main())
+    assert results[-1] == (5, 5)
+    assert db.stats()['group_commit']['batches'] >= 2
+
+
+def test_failing_write_rolls_back_alone(db, scalar):
+    def insert(i):
+        def fn(conn):
+            conn.execute("INSERT INTO admin_logs (admin_id, action, details) VALUES ('t', 'B', ?)", (str(i),))
+            if i == 3:
+                raise ValueError("boom")
+            return i
+        return fn
+
+    async def main():
+        return await asyncio.gather(*(db.write(insert(i)) for i in range(10)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [r for r in results if isinstance(r, ValueError)]
+    assert scalar("SELECT COUNT(*) FROM admin_logs WHERE action = 'B'") == 9
+    assert scalar("SELECT COUNT(*) FROM admin_logs WHERE details = '3'") == 0
+
+
+def test_writer_keeps_one_connection(db):
+    seen = []
+
+    def record(conn):
+        seen.append((threading.current_thread().name, id(conn.raw)))
+
+    async def main():
+        for _ in range(3):
+            await db.write(record)
+            await asyncio.sleep(WRITE_MAX_LATENCY * 2)
+
+    asyncio.run(main())
+    assert len(set(seen)) == 1
+    assert seen[0][0] == "db-writer"
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import re
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("jwt")
+pytest.importorskip("passlib")
+pytest.importorskip("email_validator")
+
+from support import load_api_module
+
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+auth_middleware = load_api_module("api.middleware.auth")
+auth_cache = load_api_module("api.service.auth_cache")
+auth_service = load_api_module("api.service.auth_service")
+user_models = load_api_module("api.models.user")
+
+
+class _UsersTable:
+    """One web API users row behind DatabaseService.execute_query"""
+
+    def __init__(self, **row):
+        self.row = row
+
+    async def execute_query(self, query: str, params: tuple = None, fetch: bool = True):
+        if query.lstrip().startswith("UPDATE users"):
+            columns = re.findall(r"(\w+) = \?", query.split("WHERE")[0])
+            self.row.update(zip(columns, params))
+            return None
+        return [dict(self.row)]
+
+
+@pytest.fixture
+def middleware(db):
+    auth_cache.get_permission_cache().clear()
+    middleware = auth_middleware.AuthMiddleware()
+    middleware.user_service.db = _UsersTable(
+        id="usr_1", username="alice", email=None, user_type="web", growid=None,
+        role="admin", status="active", created_at=datetime.now(UTC),
+        created_by="test", last_login=None
+    )
+    yield middleware
+    auth_cache.get_permission_cache().clear()
+
+
+def test_token_data_carries_user_id(db):
+    service = auth_service.AuthService()
+    token = service._create_tokens({
+        "id": "usr_1", "username": "alice", "user_type": "web", "role": "admin"
+    }).access_token
+
+    ok, token_data = asyncio.run(service.verify_token(token))
+    assert ok
+    assert token_data.user_id == "usr_1"
+    assert token_data.username == "alice"
+
+
+def _request(token: str = None):
+    from starlette.requests import Request
+    return Request({
+        "type": "http", "method": "GET", "path": "/admin/stats", "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())] if token else []
+    })
+
+
+def test_user_update_evicts_cached_permissions(middleware):
+    from starlette.responses import Response
+
+    cache = auth_cache.get_permission_cache()
+    token = middleware.auth_service._create_tokens({
+        "id": "usr_1", "username": "alice", "user_type": "web", "role": "admin"
+    }).access_token
+
+    async def call_next(request):
+        return Response("ok")
+
+    async def main():
+        # Second request is served from the permission cache
+        assert (await middleware(_request(token), call_next)).status_code == 200
+        assert (await middleware(_request(token), call_next)).status_code == 200
+        assert cache.stats()["hits"] == 1
+
+        await middleware.user_service.update_user(
+            "usr_1", user_models.UserUpdate(status=user_models.UserStatus.SUSPENDED)
+        )
+        misses = cache.stats()["misses"]
+        response = await middleware(_request(token), call_next)
+        assert response.status_code == 403
+        assert cache.stats()["misses"] == misses + 1
+
+    asyncio.run(main())
+
+
+def test_permission_cache_expires():
+    cache = auth_cache.PermissionCache(ttl=60)
+    cache.put("usr_1", "user")
+    assert cache.get("usr_1") == "user"
+
+    cache.set("usr_1", "user", expires_at=0)
+    assert cache.get("usr_1") is None
+
+
+def test_token_cache_is_bounded():
+    cache = auth_cache.TokenCache(max_entries=2)
+    expires_at = (datetime.now(UTC) + timedelta(minutes=5)).timestamp()
+    for token in ("a", "b", "c"):
+        cache.set(cache.key(token), token, expires_at)
+
+    assert cache.get(cache.key("a")) is None
+    assert cache.get(cache.key("c")) == "c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_verified_token_is_decoded_once(db, monkeypatch):
+    service = auth_service.AuthService()
+    token = service._create_tokens({
+        "id": "usr_1", "username": "alice", "user_type": "web", "role": "admin"
+    }).access_token
+    decodes = []
+    decode = auth_service.jwt.decode
+
+    def counting(*args, **kwargs):
+        decodes.append(1)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth_service.jwt, "decode", counting)
+    auth_cache.get_token_cache().clear()
+
+    async def main():
+        return [await service.verify_token(token) for _ in range(3)]
+
+    results = asyncio.run(main())
+    assert len(decodes) == 1
+    assert all(ok for ok, _ in results)
+    assert results[0][1] is results[2][1]
+
+
+def test_expired_token_is_rejected_and_not_cached(db):
+    service = auth_service.AuthService()
+    token = service._create_token(
+        {"sub": "usr_1", "username": "alice", "role": "admin"}, timedelta(seconds=-1)
+    )
+    cache = auth_cache.get_token_cache()
+
+    assert asyncio.run(service.verify_token(token)) == (False, None)
+    assert cache.get(cache.key(token)) is None
+
+
+def test_request_token_is_verified_once(db, monkeypatch):
+    service = auth_service.AuthService()
+    token = service._create_tokens({
+        "id": "usr_1", "username": "alice", "user_type": "web", "role": "admin"
+    }).access_token
+    verified = []
+    verify = service.verify_token
+
+    async def counting(token):
+        verified.append(token)
+        return await verify(token)
+
+    monkeypatch.setattr(service, "verify_token", counting)
+    request = _request(token)
+    anonymous = _request()
+
+    async def main():
+        first = await service.authenticate_request(request)
+        second = await service.authenticate_request(request)
+        return first, second, await service.authenticate_request(anonymous)
+
+    first, second, missing = asyncio.run(main())
+    assert verified == [token]
+    assert first is second
+    assert first.user_id == "usr_1"
+    assert request.state.token_data is first
+    assert missing is None
+    assert anonymous.state.token_data is None
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+from ext.balance_manager import BalanceManagerService
+from ext.locks import KeyedLocks
+
+
+@pytest.fixture
+def balances(db):
+    BalanceManagerService._instance = None
+    service = BalanceManagerService(bot=None)
+    yield service
+    BalanceManagerService._instance = None
+
+
+def test_update_growid_registers_new_user_with_one_stripe(balances, scalar):
+    # Every key shares the single stripe, as update_growid_ and register_ may
+    balances.locks = KeyedLocks("test", stripes=1)
+
+    async def main():
+        return await asyncio.wait_for(balances.update_user_growid("1234", "NEWBUYER"), 2)
+
+    assert asyncio.run(main()) is True
+    assert scalar("SELECT growid FROM user_growid WHERE discord_id = ?", ("1234",)) == "NEWBUYER"
+    assert not balances.locks.locked("register_1234")
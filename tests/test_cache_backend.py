@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from support import load_api_module
+
+cache_backend = load_api_module("api.service.cache_backend")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_delete_drops_key_from_tags():
+    backend = cache_backend.MemoryCacheBackend()
+    run(backend.set("cache:a", 1, 60, tags=("stock", "products")))
+    run(backend.set("cache:b", 2, 60, tags=("stock",)))
+
+    run(backend.delete("cache:a"))
+    assert backend._tags == {"stock": {"cache:b"}}
+    assert "cache:a" not in backend._key_tags
+
+
+def test_expiry_drops_key_from_tags():
+    backend = cache_backend.MemoryCacheBackend()
+    run(backend.set("cache:a", 1, 60, tags=("stock",)))
+    _, data = backend._entries["cache:a"]
+    backend._entries["cache:a"] = (time.monotonic() - 1, data)
+
+    assert run(backend.get("cache:a")) is None
+    assert backend._tags == {}
+    assert backend._key_tags == {}
+
+
+def test_eviction_drops_key_from_tags():
+    backend = cache_backend.MemoryCacheBackend(max_entries=2)
+    for name in ("a", "b", "c"):
+        run(backend.set(f"cache:{name}", name, 60, tags=(name, "all")))
+
+    assert backend._tags == {"b": {"cache:b"}, "c": {"cache:c"}, "all": {"cache:b", "cache:c"}}
+    assert set(backend._key_tags) == {"cache:b", "cache:c"}
+
+
+def test_invalidate_tags_cleans_other_tags():
+    backend = cache_backend.MemoryCacheBackend()
+    run(backend.set("cache:a", 1, 60, tags=("stock", "products")))
+
+    assert run(backend.invalidate_tags("stock")) == 1
+    assert backend._tags == {}
+    assert backend._key_tags == {}
+
+
+def test_count_skips_expired_keys_and_other_prefixes():
+    backend = cache_backend.MemoryCacheBackend()
+    run(backend.set("cache:a", 1, 60))
+    run(backend.set("cache:b", 2, 60))
+    run(backend.set("session:a", 3, 60))
+    _, data = backend._entries["cache:b"]
+    backend._entries["cache:b"] = (time.monotonic() - 1, data)
+
+    assert run(backend.count("cache")) == 1
+
+
+def test_expired_lock_lease_can_be_taken_over():
+    backend = cache_backend.MemoryCacheBackend()
+
+    async def main():
+        first = await backend.acquire_lock("lock:a", timeout=0.05, blocking_timeout=0)
+        second = await backend.acquire_lock("lock:a", timeout=10, blocking_timeout=1)
+        # The first holder's lease ran out; its release must not free the new holder
+        assert not await first.release()
+        assert await backend.acquire_lock("lock:a", timeout=10, blocking_timeout=0) is None
+        assert await second.release()
+
+    run(main())
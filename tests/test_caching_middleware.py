@@ -0,0 +1,200 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("psutil")
+pytest.importorskip("prometheus_client")
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from support import load_api_module
+
+cache_backend = load_api_module("api.service.cache_backend")
+database_service = load_api_module("api.service.database_service")
+caching = load_api_module("api.middleware.caching")
+
+
+@pytest.fixture
+def middleware(db, monkeypatch):
+    monkeypatch.setattr(database_service, "create_cache_backend", cache_backend.MemoryCacheBackend)
+    database_service.DatabaseService._instance = None
+    yield caching.CacheMiddleware()
+    database_service.DatabaseService._instance = None
+
+
+class _Upstream:
+    """call_next stand-in that counts calls and serves a JSON body"""
+
+    def __init__(self, delay: float = 0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self, request):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return Response(json.dumps({"version": self.calls}), media_type="application/json")
+
+
+def _request(path: str = "/products/P1", app=None, headers=None):
+    scope = {
+        "type": "http", "method": "GET", "path": path, "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "state": {}
+    }
+    if app is not None:
+        scope["app"] = app
+    return Request(scope)
+
+
+def test_miss_then_l1_then_l2(middleware):
+    upstream = _Upstream()
+
+    async def main():
+        first = await middleware(_request(), upstream)
+        second = await middleware(_request(), upstream)
+        middleware.l1 = caching._L1Cache()  # as on another node
+        third = await middleware(_request(), upstream)
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert [r.headers["X-Cache"] for r in (first, second, third)] == ["MISS", "HIT", "HIT"]
+    assert json.loads(third.body) == {"version": 1}
+    assert upstream.calls == 1
+    assert middleware._stats["l1_hits"] == 1
+    assert middleware._stats["l2_hits"] == 1
+
+
+def test_concurrent_misses_are_coalesced(middleware):
+    upstream = _Upstream(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(middleware(_request(), upstream) for _ in range(5)))
+
+    responses = asyncio.run(main())
+    assert upstream.calls == 1
+    assert middleware._stats["coalesced"] == 4
+    assert {r.body for r in responses} == {json.dumps({"version": 1}).encode()}
+
+
+def test_stale_entry_is_served_while_refreshed(middleware):
+    upstream = _Upstream()
+
+    async def app(scope, receive, send):
+        await middleware(Request(scope, receive), upstream)
+
+    async def main():
+        await middleware(_request(app=app), upstream)
+        # Age the L1 copy past its TTL, but not past STALE_TTL
+        for key in list(middleware.l1._entries):
+            entry = middleware.l1.get(key)
+            entry["stored_at"] = time.time() - entry["ttl"] - 1
+
+        stale = await middleware(_request(app=app), upstream)
+        await asyncio.gather(*middleware._revalidating.values())
+        fresh = await middleware(_request(app=app), upstream)
+        return stale, fresh
+
+    stale, fresh = asyncio.run(main())
+    assert stale.headers["X-Cache"] == "STALE"
+    assert json.loads(stale.body) == {"version": 1}
+    assert fresh.headers["X-Cache"] == "HIT"
+    assert json.loads(fresh.body) == {"version": 2}
+    assert middleware._stats["revalidations"] == 1
+
+
+def test_tag_invalidation_reaches_l1(middleware):
+    upstream = _Upstream()
+
+    async def main():
+        await middleware(_request("/products/P1"), upstream)
+        await middleware(_request("/products/P2"), upstream)
+        await middleware.db.cache_invalidate_tags("product:P1")
+        return (
+            await middleware(_request("/products/P1"), upstream),
+            await middleware(_request("/products/P2"), upstream)
+        )
+
+    p1, p2 = asyncio.run(main())
+    assert p1.headers["X-Cache"] == "MISS"
+    assert p2.headers["X-Cache"] == "HIT"
+    assert upstream.calls == 3
+
+
+def test_uncacheable_paths_and_methods_go_upstream(middleware):
+    upstream = _Upstream()
+
+    async def main():
+        await middleware(_request("/admin/stats"), upstream)
+        await middleware(_request("/admin/stats"), upstream)
+        post = Request({**_request().scope, "method": "POST"})
+        await middleware(post, upstream)
+
+    asyncio.run(main())
+    assert upstream.calls == 3
+    assert len(middleware.l1) == 0
+
+
+def test_etag_and_conditional_requests(middleware):
+    upstream = _Upstream()
+
+    async def main():
+        miss = await middleware(_request(), upstream)
+        etag = miss.headers["ETag"]
+        bare = etag.strip('"')
+        responses = [
+            await middleware(_request(headers={"If-None-Match": value}), upstream)
+            for value in (
+                etag,
+                f'W/{etag}',
+                f'"{bare}-gzip"',          # ETag of the compressed variant
+                f'"other", "{bare}-br"',
+                '"other"',
+                "*"
+            )
+        ]
+        return miss, responses
+
+    miss, responses = asyncio.run(main())
+    assert miss.headers["ETag"].startswith('"')
+    assert miss.headers["Cache-Control"] == "public, max-age=1800"
+    assert [r.status_code for r in responses] == [304, 304, 304, 304, 200, 304]
+
+    not_modified = responses[0]
+    assert not_modified.body == b""
+    assert not_modified.headers["ETag"] == miss.headers["ETag"]
+    assert not_modified.headers["Vary"] == "Authorization"
+    assert middleware._stats["not_modified"] == 5
+    assert upstream.calls == 1
+
+
+def test_conditional_miss_is_stored_and_answered_with_304(middleware):
+    upstream = _Upstream()
+    body = json.dumps({"version": 1}).encode()
+    etag = caching.CacheMiddleware._make_etag(body)
+
+    async def main():
+        first = await middleware(_request(headers={"If-None-Match": etag}), upstream)
+        second = await middleware(_request(), upstream)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first.status_code == 304
+    assert second.status_code == 200
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.body == body
+
+
+def test_upstream_etag_is_kept(middleware):
+    async def upstream(request):
+        return Response("{}", media_type="application/json", headers={"ETag": '"v42"'})
+
+    async def main():
+        await middleware(_request(), upstream)
+        return await middleware(_request(headers={"If-None-Match": '"v42"'}), upstream)
+
+    assert asyncio.run(main()).status_code == 304
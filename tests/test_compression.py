@@ -0,0 +1,234 @@
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("fastapi")
+brotli = pytest.importorskip("brotli")
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from support import load_api_module
+
+cache_backend = load_api_module("api.service.cache_backend")
+database_service = load_api_module("api.service.database_service")
+compression_service = load_api_module("api.service.compression_service")
+settings_service = load_api_module("api.service.settings_service")
+compression = load_api_module("api.middleware.compression")
+
+BODY = json.dumps([{"code": f"P{i}", "name": "Product", "stock": i} for i in range(200)]).encode()
+
+
+@pytest.fixture
+def settings(db, monkeypatch):
+    """SettingsService with fresh class state, loading DEFAULT_SETTINGS"""
+    monkeypatch.setattr(database_service, "create_cache_backend", cache_backend.MemoryCacheBackend)
+    database_service.DatabaseService._instance = None
+    cls = settings_service.SettingsService
+    monkeypatch.setattr(cls, "_compression_settings", None)
+    monkeypatch.setattr(cls, "_compression_loaded_at", 0.0)
+    monkeypatch.setattr(cls, "_compression_version", 0)
+    monkeypatch.setattr(cls, "_listeners", [])
+
+    loads = []
+
+    async def load(self):
+        loads.append(1)
+        return compression_service.CompressionService().DEFAULT_SETTINGS
+
+    monkeypatch.setattr(cls, "_load_compression_settings", load)
+    yield loads
+    database_service.DatabaseService._instance = None
+
+
+@pytest.fixture
+def middleware(settings):
+    return compression.CompressionMiddleware()
+
+
+def _request(accept_encoding: str = "gzip"):
+    return Request({
+        "type": "http", "method": "GET", "path": "/products", "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())]
+    })
+
+
+def test_settings_are_cached_and_listeners_see_changes(settings, monkeypatch):
+    service = settings_service.SettingsService()
+    seen = []
+    settings_service.SettingsService.add_compression_listener(lambda s, version: seen.append(version))
+
+    async def main():
+        first = await service.get_compression_settings()
+        second = await service.get_compression_settings()
+        assert first is second
+
+        # Past the TTL the settings are re-read; unchanged means no notification
+        monkeypatch.setattr(settings_service, "SETTINGS_CACHE_TTL", 0)
+        await service.get_compression_settings()
+
+    asyncio.run(main())
+    assert len(settings) == 2
+    assert seen == [1]
+
+    changed = compression_service.CompressionService().DEFAULT_SETTINGS
+    changed["gzip"]["level"] = 9
+    settings_service.SettingsService._set_compression_settings(changed)
+    assert seen == [1, 2]
+
+
+def test_variant_is_compressed_once_per_etag(middleware, monkeypatch):
+    calls = []
+    compress = middleware.compression_service.compress_data_async
+
+    async def counting(data, encoding, settings=None):
+        calls.append(encoding)
+        return await compress(data, encoding, settings)
+
+    monkeypatch.setattr(middleware.compression_service, "compress_data_async", counting)
+
+    async def call_next(request):
+        return Response(BODY, media_type="application/json", headers={"ETag": '"abc"'})
+
+    async def main():
+        first = await middleware(_request(), call_next)
+        second = await middleware(_request(), call_next)
+        middleware.variants.clear()  # as on another node: served from the shared cache
+        third = await middleware(_request(), call_next)
+        return first, second, third
+
+    responses = asyncio.run(main())
+    assert calls == ["gzip"]
+    for response in responses:
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"] == '"abc-gzip"'
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert gzip.decompress(response.body) == BODY
+
+
+def test_settings_change_drops_variants(middleware):
+    middleware.variants.set("cache:z:x:gzip:6", b"data")
+    settings_service.SettingsService._set_compression_settings({"changed": True})
+    assert middleware.variants.get("cache:z:x:gzip:6") is None
+    assert middleware.variants.size == 0
+
+
+def test_small_or_unaccepted_bodies_pass_through(middleware):
+    async def small(request):
+        return Response(b"{}", media_type="application/json")
+
+    async def large(request):
+        return Response(BODY, media_type="application/json", headers={"Vary": "Authorization"})
+
+    async def main():
+        return (
+            await middleware(_request(), small),
+            await middleware(_request("identity"), large)
+        )
+
+    small_response, identity = asyncio.run(main())
+    assert "Content-Encoding" not in small_response.headers
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["Vary"] == "Authorization, Accept-Encoding"
+
+
+def test_variant_cache_is_bounded_by_bytes():
+    variants = compression._VariantCache(max_bytes=10)
+    variants.set("a", b"12345")
+    variants.set("b", b"12345")
+    assert variants.get("a") == b"12345"  # b is now least recently used
+    variants.set("c", b"123")
+    assert variants.get("b") is None
+    assert variants.size == 8
+    variants.set("huge", b"x" * 11)
+    assert variants.get("huge") is None
+
+
+def test_large_bodies_compress_off_the_loop(monkeypatch):
+    service = compression_service.CompressionService()
+    threads = []
+    compress = service.compress_data
+
+    def recording(data, encoding, settings=None):
+        threads.append(threading.current_thread())
+        return compress(data, encoding, settings)
+
+    monkeypatch.setattr(service, "compress_data", recording)
+    big = b"x" * compression_service.COMPRESS_OFFLOAD_THRESHOLD
+
+    async def main():
+        await service.compress_data_async(b"x" * 100, "gzip")
+        await service.compress_data_async(big, "gzip")
+
+    asyncio.run(main())
+    assert threads[0] is threading.current_thread()
+    assert threads[1] is not threading.current_thread()
+
+
+def _streaming_app(chunks, headers=None, status=200):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start", "status": status,
+            "headers": [(b"content-type", b"application/json")] + [
+                (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+            ]
+        })
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def _run_streaming(app, accept_encoding: str = "gzip", method: str = "GET"):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": "/export", "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())]
+    }
+    asyncio.run(compression.StreamingCompressionMiddleware(app)(scope, receive, send))
+    start = messages[0]
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return dict((k.decode(), v.decode()) for k, v in start["headers"]), body, messages
+
+
+def test_stream_is_compressed_chunk_by_chunk(settings):
+    chunks = [BODY[i:i + 500] for i in range(0, len(BODY), 500)]
+    headers, body, messages = _run_streaming(_streaming_app(chunks, {"ETag": '"e1"'}))
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert headers["etag"] == '"e1-gzip"'
+    assert gzip.decompress(body) == BODY
+    # Output is sent as the input streams in, not only at the end
+    assert len(messages) > 2
+    assert messages[-1]["more_body"] is False
+
+
+def test_brotli_stream(settings):
+    chunks = [BODY[:2000], BODY[2000:]]
+    headers, body, _ = _run_streaming(_streaming_app(chunks), accept_encoding="br, gzip")
+
+    assert headers["content-encoding"] == "br"
+    assert brotli.decompress(body) == BODY
+
+
+@pytest.mark.parametrize("chunks, headers, status, method", [
+    ([b"{}", b"[]"], None, 200, "GET"),                       # ends below min_size
+    ([BODY], {"Content-Encoding": "gzip"}, 200, "GET"),        # already encoded
+    ([BODY], {"Content-Range": "bytes 0-10/100"}, 206, "GET"),
+    ([b""], None, 304, "GET"),
+    ([BODY], None, 200, "HEAD"),
+])
+def test_stream_passthrough(settings, chunks, headers, status, method):
+    out_headers, body, _ = _run_streaming(_streaming_app(chunks, headers, status), method=method)
+    assert out_headers.get("content-encoding") == (headers or {}).get("Content-Encoding")
+    assert body == b"".join(chunks)
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from support import load_api_module
+
+cache_backend = load_api_module("api.service.cache_backend")
+database_service = load_api_module("api.service.database_service")
+
+
+class _BrokenBackend(cache_backend.MemoryCacheBackend):
+    async def get(self, key):
+        raise ConnectionError("cache down")
+
+    async def set(self, key, value, expire, tags=()):
+        raise ConnectionError("cache down")
+
+
+@pytest.fixture
+def service(db, monkeypatch):
+    # Memory backend regardless of CACHE_BACKEND in the environment
+    monkeypatch.setattr(database_service, "create_cache_backend", cache_backend.MemoryCacheBackend)
+    database_service.DatabaseService._instance = None
+    yield database_service.DatabaseService()
+    database_service.DatabaseService._instance = None
+
+
+def test_cache_round_trip(service):
+    async def main():
+        assert await service.cache_get("cache:missing", default="fallback") == "fallback"
+        assert await service.cache_set("cache:product:P1", {"code": "P1", "price": 10}, expire=60)
+        assert await service.cache_set_many({"cache:a": 1, "cache:b": [2]}, expire=60)
+        return (
+            await service.cache_get("cache:product:P1"),
+            await service.cache_get_many(["cache:a", "cache:b", "cache:c"]),
+            await service.cache_count("cache")
+        )
+
+    product, many, count = asyncio.run(main())
+    assert product == {"code": "P1", "price": 10}
+    assert many == [1, [2], None]
+    assert count == 3
+
+
+def test_invalidation_by_tag_and_pattern_notifies_listeners(service):
+    seen = []
+    service.add_invalidation_listener(lambda tags, pattern: seen.append((tuple(tags), pattern)))
+
+    async def main():
+        await service.cache_set("cache:stock:P1", 5, tags=["stock", "product:P1"])
+        await service.cache_set("cache:stock:P2", 7, tags=["stock", "product:P2"])
+        await service.cache_set("cache:user:1", "alice")
+        removed = await service.cache_invalidate_tags("product:P1")
+        await service.cache_clear("cache:user:*")
+        return removed, [await service.cache_get(k) for k in ("cache:stock:P1", "cache:stock:P2", "cache:user:1")]
+
+    removed, values = asyncio.run(main())
+    assert removed == 1
+    assert values == [None, 7, None]
+    assert seen == [(("product:P1",), None), ((), "cache:user:*")]
+
+
+def test_backend_errors_fall_back(service):
+    service._cache = _BrokenBackend()
+
+    async def main():
+        return (
+            await service.cache_get("cache:a", default="fallback"),
+            await service.cache_set("cache:a", 1)
+        )
+
+    assert asyncio.run(main()) == ("fallback", False)
+
+
+def test_lock_waits_for_release(service):
+    async def main():
+        first = await service.acquire_lock("lock:report", timeout=10, blocking_timeout=1)
+        assert await service.acquire_lock("lock:report", timeout=10, blocking_timeout=0) is None
+
+        waiter = asyncio.ensure_future(service.acquire_lock("lock:report", timeout=10, blocking_timeout=1))
+        await asyncio.sleep(0.01)
+        assert await first.release()
+        second = await asyncio.wait_for(waiter, 1)
+        assert second is not None
+        assert not await first.release()  # released locks stay released
+        assert await second.release()
+
+    asyncio.run(main())
+
+
+def test_execute_query_goes_through_async_db(service, scalar):
+    async def main():
+        await service.execute_query(
+            "INSERT INTO admin_logs (admin_id, action) VALUES (?, ?)", ("1", "test"), fetch=False
+        )
+        return await service.execute_query("SELECT admin_id, action FROM admin_logs")
+
+    assert asyncio.run(main()) == [{"admin_id": "1", "action": "test"}]
+    assert scalar("SELECT COUNT(*) FROM admin_logs") == 1
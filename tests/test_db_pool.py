@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from db_pool import ConnectionPool
+
+
+def test_read_pool_rejects_writes(shop_db):
+    pool = ConnectionPool("read", str(shop_db), size=1, readonly=True)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO users (growid) VALUES ('alice')")
+    pool.close()
+
+
+def test_database_readonly_connection_uses_read_pool(shop_db):
+    from database import get_connection
+
+    conn = get_connection(readonly=True)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM users")
+    finally:
+        conn.close()
+
+    conn = get_connection()
+    try:
+        conn.execute("INSERT INTO users (growid) VALUES ('alice')")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_connections_are_reused(shop_db):
+    pool = ConnectionPool("write", str(shop_db), size=1)
+    conn = pool.acquire()
+    raw = conn.raw
+    conn.close()
+    conn.close()  # second close is a no-op
+
+    with pool.connection() as again:
+        assert again.raw is raw
+
+    stats = pool.stats()
+    assert stats["opened"] == 1
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 2
+    pool.close()
+
+
+def test_release_rolls_back_open_transaction(shop_db):
+    pool = ConnectionPool("write", str(shop_db), size=1)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO users (growid) VALUES ('alice')")
+        assert conn.in_transaction
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    pool.close()
+
+
+def test_closed_proxy_refuses_queries(shop_db):
+    pool = ConnectionPool("write", str(shop_db), size=1)
+    conn = pool.acquire()
+    conn.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    pool.close()
+
+
+def test_overflow_is_closed_and_exhaustion_times_out(shop_db):
+    pool = ConnectionPool("write", str(shop_db), size=1, max_overflow=1)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert pool.stats()["overflow_opened"] == 1
+
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()["timeouts"] == 1
+
+    second.close()
+    first.close()
+    stats = pool.stats()
+    assert stats["opened"] == 1
+    assert stats["idle"] == 1
+    pool.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
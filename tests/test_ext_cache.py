@@ -0,0 +1,78 @@
+from ext import cache as cache_module
+from ext.cache import MISSING, TTLCache
+
+
+def test_negative_entry_is_a_hit_until_it_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache("test", negative_ttl=10)
+
+    assert cache.get("growid", "123") is MISSING
+    cache.set_missing("growid", "123")
+    assert cache.get("growid", "123") is None
+
+    now[0] += 10
+    assert cache.get("growid", "123") is MISSING
+
+    stats = cache.stats()
+    assert stats["negative_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["expirations"] == 1
+
+
+def test_namespace_ttls(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache("test", default_ttl=60, ttls={"balance": 5})
+
+    cache.set("balance", "BUYER", 100)
+    cache.set("product", "P1", {"code": "P1"})
+    now[0] += 5
+    assert cache.get("balance", "BUYER") is MISSING
+    assert cache.get("product", "P1") == {"code": "P1"}
+
+
+def test_tag_invalidation_drops_negative_entries_too():
+    cache = TTLCache("test")
+    cache.set("product", "P1", {"code": "P1"}, tags=("product:P1",))
+    cache.set("stock_field", ("P1", 3), ("name", "value"), tags=("product:P1",))
+    cache.set_missing("product", "P2", tags=("product:P2",))
+    cache.set("product", "P3", {"code": "P3"}, tags=("product:P3",))
+
+    assert cache.invalidate_tag("product:P1") == 2
+    assert cache.invalidate_tag("product:P2") == 1
+    assert cache.invalidate_tag("product:P1") == 0
+
+    assert cache.get("product", "P1") is MISSING
+    assert cache.get("stock_field", ("P1", 3)) is MISSING
+    assert cache.get("product", "P2") is MISSING
+    assert cache.get("product", "P3") == {"code": "P3"}
+    assert cache.stats()["tags"] == 1
+
+
+def test_lru_eviction_keeps_tag_index_in_step():
+    cache = TTLCache("test", max_entries=2)
+    cache.set("product", "P1", 1, tags=("product:P1",))
+    cache.set("product", "P2", 2, tags=("product:P2",))
+    assert cache.get("product", "P1") == 1  # P2 is now least recently used
+
+    cache.set("product", "P3", 3, tags=("product:P3",))
+    assert cache.get("product", "P2") is MISSING
+    assert cache.get("product", "P1") == 1
+    assert cache.stats()["evictions"] == 1
+    assert cache.invalidate_tag("product:P2") == 0
+    assert len(cache) == 2
+
+
+def test_overwrite_retags_and_clear_by_namespace():
+    cache = TTLCache("test")
+    cache.set("product", "P1", 1, tags=("old",))
+    cache.set("product", "P1", 2, tags=("new",))
+    assert cache.invalidate_tag("old") == 0
+    assert cache.get("product", "P1") == 2
+
+    cache.set("balance", "BUYER", 100)
+    assert cache.clear("product") == 1
+    assert cache.get("balance", "BUYER") == 100
+    assert cache.delete("balance", "BUYER")
+    assert not cache.delete("balance", "BUYER")
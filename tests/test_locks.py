@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from ext.locks import KeyedLocks
+
+
+def test_same_key_is_serialized_and_entries_are_dropped():
+    locks = KeyedLocks("test")
+    order = []
+
+    async def worker(name):
+        async with locks("balance_BUYER"):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} out")
+
+    async def main():
+        await asyncio.gather(worker("a"), worker("b"))
+
+    asyncio.run(main())
+    assert order == ["a in", "a out", "b in", "b out"]
+    stats = locks.stats()
+    assert stats["active_keys"] == 0
+    assert stats["acquisitions"] == 2
+    assert stats["contended"] == 1
+
+
+def test_different_keys_do_not_block():
+    locks = KeyedLocks("test")
+
+    async def main():
+        async with locks("a"):
+            async with locks("b"):
+                assert locks.locked("b")
+                assert locks.stats()["active_keys"] == 2
+
+    asyncio.run(asyncio.wait_for(main(), 1))
+    assert locks.stats()["peak_keys"] == 2
+    assert locks.stats()["contended"] == 0
+
+
+def test_cancelled_waiter_releases_its_reference():
+    locks = KeyedLocks("test")
+
+    async def main():
+        async with locks("key"):
+            waiter = asyncio.ensure_future(locks("key").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        assert not locks.locked("key")
+
+    asyncio.run(main())
+    assert locks.stats()["active_keys"] == 0
+
+
+def test_striped_mode_has_fixed_lock_pool():
+    locks = KeyedLocks("test", stripes=1)
+
+    async def main():
+        async with locks("a"):
+            # One stripe: every key shares the held lock
+            assert locks.locked("b")
+
+    asyncio.run(main())
+    stats = locks.stats()
+    assert stats["mode"] == "striped"
+    assert stats["active_keys"] == 0
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from support import load_api_module
+
+log_sink = load_api_module("api.service.log_sink")
+audit_models = load_api_module("api.models.audit")
+log_models = load_api_module("api.models.logs")
+
+
+def _log(i: int = 0):
+    return log_models.Log(
+        level=log_models.LogLevel.INFO,
+        category=log_models.LogCategory.API,
+        message=f"GET /api/v1/products {i}",
+        source="test"
+    )
+
+
+@pytest.fixture
+def make_sink(db):
+    def _make(**kwargs):
+        log_sink.LogSink._instance = None
+        return log_sink.LogSink(**kwargs)
+    yield _make
+    log_sink.LogSink._instance = None
+
+
+def test_close_writes_queued_rows(make_sink, scalar):
+    # Long interval: rows sit in the writer's batch until close()
+    sink = make_sink(flush_interval=60)
+
+    async def main():
+        for i in range(3):
+            await sink.log(_log(i))
+        await sink.audit(
+            audit_models.AuditCategory.USER, audit_models.AuditAction.LOGIN,
+            "user_1", "user", None, "session", "Logged in"
+        )
+        # Let the writer take some rows off the queue before closing
+        await asyncio.sleep(0.01)
+        await sink.close()
+        # Written by the time close() returns, not by loop teardown
+        assert scalar("SELECT COUNT(*) FROM logs") == 3
+        assert scalar("SELECT COUNT(*) FROM audit_logs") == 1
+
+    asyncio.run(main())
+    assert sink.get_metrics()["written"] == 4
+
+
+def test_full_batch_is_written_without_waiting(make_sink, scalar):
+    sink = make_sink(batch_size=5, flush_interval=60)
+
+    async def main():
+        for i in range(5):
+            await sink.log(_log(i))
+        for _ in range(50):
+            if sink.get_metrics()["written"] == 5:
+                break
+            await asyncio.sleep(0.01)
+        written = scalar("SELECT COUNT(*) FROM logs")
+        await sink.close()
+        return written
+
+    assert asyncio.run(main()) == 5
+    assert sink.get_metrics()["batches"] == 1
+
+
+def test_full_queue_drops_instead_of_blocking(make_sink):
+    sink = make_sink(queue_size=2, flush_interval=60)
+
+    async def main():
+        # Nothing yields to the writer in between, so the queue fills up
+        accepted = [await sink.log(_log(i)) for i in range(4)]
+        await sink.close()
+        return accepted
+
+    assert asyncio.run(main()) == [True, True, False, False]
+    assert sink.get_metrics()["dropped"] == 2
+
+
+def test_successful_gets_are_sampled(make_sink):
+    sink = make_sink(get_sample_rate=0.0)
+
+    assert not sink.should_log_request("GET", 200)
+    assert sink.should_log_request("GET", 500)
+    assert sink.should_log_request("POST", 200)
+    assert sink.get_metrics()["sampled_out"] == 1
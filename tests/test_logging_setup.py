@@ -0,0 +1,95 @@
+import json
+import logging
+import threading
+
+import pytest
+
+from utils import logging_setup
+from utils.logging_setup import lazy, load_logging_config, setup_logging, stop_logging
+
+
+@pytest.fixture
+def log_settings(tmp_path):
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    settings = load_logging_config(str(tmp_path / "missing.json"))
+    settings.update(directory=str(tmp_path / "logs"), console=False, loggers={"noisy": "ERROR"})
+    yield settings
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger("noisy").setLevel(logging.NOTSET)
+
+
+def _records(settings):
+    path = f"{settings['directory']}/{settings['filename']}"
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_single_line_json(log_settings):
+    setup_logging(log_settings)
+    logger = logging.getLogger("test.json")
+    logger.info("""
+        Order %s
+        processed""", 42, extra={"growid": "BUYER"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    logging.getLogger("noisy").warning("filtered out")
+    stop_logging()
+
+    first, second = _records(log_settings)
+    assert first["msg"] == "Order 42 processed"
+    assert first["level"] == "INFO"
+    assert first["logger"] == "test.json"
+    assert first["growid"] == "BUYER"
+    assert "where" not in first
+
+    assert second["msg"] == "failed"
+    assert "ValueError: boom" in second["exc"]
+    assert second["where"].startswith("test_logging_setup.")
+
+
+def test_arguments_are_formatted_on_the_listener_thread(log_settings):
+    setup_logging(log_settings)
+    calls = []
+
+    def describe(name):
+        calls.append((name, threading.current_thread()))
+        return "board"
+
+    logger = logging.getLogger("test.lazy")
+    logger.debug("skipped: %s", lazy(describe, "debug"))
+    logger.info("rendered: %s", lazy(describe, "info"))
+    stop_logging()
+
+    # Never on the caller's thread, and never for a disabled level
+    assert calls
+    assert {name for name, _ in calls} == {"info"}
+    assert threading.current_thread() not in {thread for _, thread in calls}
+    assert _records(log_settings)[0]["msg"] == "rendered: board"
+
+
+def test_setup_is_idempotent(log_settings):
+    listener = setup_logging(log_settings)
+    assert setup_logging(log_settings) is listener
+    assert len(logging.getLogger().handlers) == 1
+    assert isinstance(logging.getLogger().handlers[0], logging_setup.DeferredQueueHandler)
+
+
+def test_config_section_merges_over_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({
+        "logging": {"level": "DEBUG", "rotation": {"mode": "time"}}
+    }))
+
+    settings = load_logging_config(str(path))
+    assert settings["level"] == "DEBUG"
+    assert settings["rotation"]["mode"] == "time"
+    assert settings["rotation"]["backup_count"] == 7
+    assert settings["format"] == "json"
@@ -0,0 +1,98 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import migrations
+from migrations import LATEST_VERSION, MIGRATIONS, Migration, migrate, schema_version
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _schema(conn):
+    return sorted(conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"
+    ).fetchall())
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "shop.db")
+    yield conn
+    conn.close()
+
+
+def test_fresh_database_reaches_latest(conn):
+    assert schema_version(conn) == 0
+    assert migrate(conn) == LATEST_VERSION
+
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {
+        'users', 'user_growid', 'products', 'stock', 'transactions', 'world_info',
+        'bot_settings', 'blacklist', 'admin_logs', 'role_permissions', 'user_activity',
+        'cache_table', 'logs', 'audit_logs'
+    } <= tables
+    # 004 dropped the timestamp triggers; updated_at is set by the writes
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0] == 0
+
+
+def test_warm_start_is_a_single_pragma_read(conn):
+    migrate(conn)
+    schema = _schema(conn)
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert migrate(conn) == LATEST_VERSION
+    conn.set_trace_callback(None)
+
+    assert statements == ["PRAGMA user_version"]
+    assert _schema(conn) == schema
+
+
+def test_stepwise_upgrade_matches_direct_upgrade(conn, tmp_path):
+    for migration in MIGRATIONS:
+        assert migrate(conn, migration.version) == migration.version
+        assert migrate(conn, migration.version) == migration.version
+
+    direct = sqlite3.connect(tmp_path / "direct.db")
+    migrate(direct)
+    assert _schema(conn) == _schema(direct)
+    direct.close()
+
+
+def test_existing_unversioned_database_is_upgraded(tmp_path):
+    # The committed shop.db predates the migrations (user_version 0)
+    path = tmp_path / "existing.db"
+    shutil.copyfile(os.path.join(ROOT, "shop.db"), path)
+    conn = sqlite3.connect(path)
+    try:
+        assert schema_version(conn) == 0
+        assert migrate(conn) == LATEST_VERSION
+
+        fresh = sqlite3.connect(tmp_path / "fresh.db")
+        migrate(fresh)
+        tables = "SELECT name FROM sqlite_master WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'"
+        assert {r[0] for r in fresh.execute(tables)} <= {r[0] for r in conn.execute(tables)}
+        for table in ("users", "transactions", "stock"):
+            assert migrations._columns(fresh, table) <= migrations._columns(conn, table)
+        fresh.close()
+    finally:
+        conn.close()
+
+
+def test_failed_migration_leaves_schema_untouched(conn, monkeypatch):
+    migrate(conn, 5)
+    schema = _schema(conn)
+
+    def broken(c):
+        c.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [Migration(LATEST_VERSION + 1, "broken", broken)])
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, LATEST_VERSION + 1)
+
+    # Neither 006, 007 nor the broken one were kept
+    assert schema_version(conn) == 5
+    assert _schema(conn) == schema
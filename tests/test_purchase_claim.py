@@ -0,0 +1,101 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from ext.constants import TransactionError
+from ext.purchase_queue import claim_purchase
+
+
+def _claim_on_own_connection(path, growid: str, product_code: str, quantity: int):
+    """One buyer's claim in its own BEGIN IMMEDIATE transaction"""
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = claim_purchase(conn, growid, product_code, quantity)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+    finally:
+        conn.close()
+
+
+def test_concurrent_claims_never_share_rows(shop_db, seed_stock, scalar):
+    seed_stock("B0", 10, "P1", 10, 5)
+    conn = sqlite3.connect(shop_db)
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (growid, balance_wl) VALUES (?, 10)",
+            ((f"B{i}",) for i in range(1, 8))
+        )
+    conn.close()
+
+    results = {}
+    start = threading.Barrier(8)
+
+    def buy(growid):
+        start.wait()
+        try:
+            results[growid] = _claim_on_own_connection(shop_db, growid, "P1", 1)
+        except TransactionError as e:
+            results[growid] = e
+
+    threads = [threading.Thread(target=buy, args=(f"B{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    won = {growid: r for growid, r in results.items() if isinstance(r, dict)}
+    lost = {growid: r for growid, r in results.items() if not isinstance(r, dict)}
+    assert len(won) == 5
+    assert all("Insufficient stock" in str(e) for e in lost.values())
+
+    claimed = [item['id'] for r in won.values() for item in r['items']]
+    assert len(set(claimed)) == 5
+    assert scalar("SELECT COUNT(*) FROM stock WHERE status = 'available'") == 0
+    assert scalar("SELECT SUM(balance_wl) FROM users") == 30
+    assert scalar("SELECT COUNT(*) FROM transactions") == 5
+    for growid in won:
+        assert scalar("SELECT balance_wl FROM users WHERE growid = ?", (growid,)) == 0
+        assert scalar("SELECT buyer_id FROM stock WHERE id = ?", (won[growid]['items'][0]['id'],)) == growid
+
+
+def test_claim_takes_oldest_rows_first(shop_db, seed_stock):
+    seed_stock("BUYER", 100, "P1", 10, 4)
+    result = _claim_on_own_connection(shop_db, "BUYER", "P1", 2)
+
+    assert [item['content'] for item in result['items']] == ["P1-0", "P1-1"]
+    assert result['total_price'] == 20
+    assert result['new_balance'] == 80
+
+
+@pytest.mark.parametrize("growid, balance, message", [
+    ("BUYER", 15, "Insufficient balance"),
+    ("buyer", 1000, "User buyer not found"),  # growids match case-sensitively
+])
+def test_failed_claim_changes_nothing(db, seed_stock, scalar, growid, balance, message):
+    seed_stock("BUYER", balance, "P1", 10, 3)
+
+    with pytest.raises(TransactionError, match=message):
+        asyncio.run(db.write(lambda conn: claim_purchase(conn, growid, "P1", 2)))
+
+    assert scalar("SELECT balance_wl FROM users WHERE growid = 'BUYER'") == balance
+    assert scalar("SELECT COUNT(*) FROM stock WHERE status = 'available'") == 3
+    assert scalar("SELECT COUNT(*) FROM stock WHERE buyer_id IS NOT NULL") == 0
+    assert scalar("SELECT COUNT(*) FROM transactions") == 0
+
+
+def test_claim_more_than_stock_is_refused(db, seed_stock, scalar):
+    seed_stock("BUYER", 1000, "P1", 10, 2)
+
+    with pytest.raises(TransactionError, match="Insufficient stock"):
+        asyncio.run(db.write(lambda conn: claim_purchase(conn, "BUYER", "P1", 3)))
+
+    assert scalar("SELECT balance_wl FROM users WHERE growid = 'BUYER'") == 1000
+    assert scalar("SELECT COUNT(*) FROM stock WHERE status = 'available'") == 2
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from ext.constants import TransactionError
+from ext.purchase_queue import PurchaseDispatcher, claim_purchase
+
+
+@pytest.fixture
+def purchases(db):
+    return PurchaseDispatcher(db, claim_purchase)
+
+
+def test_cancelled_purchase_is_not_charged(purchases, seed_stock, scalar):
+    seed_stock("BUYER", 1000, "P1", 10, 5)
+    seed_stock("OTHER", 1000, "P2", 10, 0)
+
+    async def main():
+        # Both land in the same batch; one caller gives up before it runs
+        kept = asyncio.ensure_future(purchases.submit("BUYER", "P1", 2))
+        cancelled = asyncio.ensure_future(purchases.submit("OTHER", "P1", 1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await kept
+        await purchases.close()
+        return cancelled
+
+    cancelled = asyncio.run(main())
+    assert cancelled.cancelled()
+    assert scalar("SELECT balance_wl FROM users WHERE growid = ?", ("BUYER",)) == 980
+    assert scalar("SELECT balance_wl FROM users WHERE growid = ?", ("OTHER",)) == 1000
+    assert scalar("SELECT COUNT(*) FROM stock WHERE buyer_id = ?", ("OTHER",)) == 0
+    assert scalar("SELECT COUNT(*) FROM stock WHERE status = 'available'") == 3
+
+
+def test_failed_purchase_rolls_back_alone(purchases, seed_stock, scalar):
+    seed_stock("RICH", 1000, "P1", 10, 5)
+    seed_stock("POOR", 5, "P2", 10, 0)
+
+    async def main():
+        return await asyncio.gather(
+            purchases.submit("RICH", "P1", 1),
+            purchases.submit("POOR", "P1", 1),
+            purchases.submit("RICH", "P1", 2),
+            return_exceptions=True
+        )
+
+    first, poor, second = asyncio.run(main())
+    assert isinstance(poor, TransactionError)
+    assert first['new_balance'] == 990
+    assert second['new_balance'] == 970
+    assert scalar("SELECT balance_wl FROM users WHERE growid = 'POOR'") == 5
+    assert scalar("SELECT COUNT(*) FROM stock WHERE status = 'available'") == 2
+
+    # All three went through one write transaction
+    assert purchases.stats()['batches'] == 1
+    assert purchases.stats()['max_batch_size'] == 3
+
+
+def test_full_batch_flushes_without_waiting(purchases, seed_stock):
+    seed_stock("BUYER", 1000, "P1", 10, 5)
+    purchases.window = 60
+    purchases.max_batch = 2
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(
+            purchases.submit("BUYER", "P1", 1),
+            purchases.submit("BUYER", "P1", 1)
+        ), 5)
+
+    results = asyncio.run(main())
+    assert [r['new_balance'] for r in results] == [990, 980]
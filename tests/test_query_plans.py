@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+import check_query_plans
+from check_query_plans import (
+    HOT_QUERIES, HotQuery, collect_statements, explain, extract_sql, seed, violations
+)
+from migrations import migrate
+
+FIFO_QUERIES = [
+    query for query in HOT_QUERIES
+    if query.name in (
+        "purchase: claim oldest stock", "available stock (FIFO)",
+        "reduce stock: count", "reduce stock: pick oldest"
+    )
+]
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    seed(conn)
+    yield conn
+    conn.close()
+
+
+def test_fifo_index_replaces_the_single_column_indexes(seeded):
+    columns = [row[2] for row in seeded.execute("PRAGMA index_info(idx_stock_fifo)")]
+    assert columns == ["product_code", "status", "added_at", "id"]
+
+    indexes = {row[1] for row in seeded.execute("PRAGMA index_list(stock)")}
+    assert "idx_stock_product_code" not in indexes
+    assert "idx_stock_status" not in indexes
+
+
+@pytest.mark.parametrize("query", FIFO_QUERIES, ids=lambda query: query.name)
+def test_fifo_queries_search_the_index_without_sorting(seeded, query):
+    plan = explain(seeded, extract_sql(query))
+
+    assert any("idx_stock_fifo (product_code=? AND status=?)" in line for line in plan)
+    assert not any("TEMP B-TREE" in line for line in plan)
+    assert violations(plan) == []
+
+
+def test_hot_only_run_passes(capsys):
+    assert check_query_plans.main(["--hot-only"]) == 0
+    assert f"{len(HOT_QUERIES)}/{len(HOT_QUERIES)} hot queries passed" in capsys.readouterr().out
+
+
+def test_every_hot_query_is_a_collected_statement():
+    collected = {statement.sql for statement in collect_statements()}
+    for query in HOT_QUERIES:
+        assert extract_sql(query) in collected, query.name
+
+
+def test_sorting_hot_query_fails_the_run(tmp_path, monkeypatch, capsys):
+    (tmp_path / "slow.py").write_text(
+        "def recent_buyers(conn):\n"
+        "    return conn.execute(\"SELECT growid FROM users ORDER BY balance_wl DESC\").fetchall()\n"
+    )
+    monkeypatch.setattr(check_query_plans, "ROOT", str(tmp_path))
+    monkeypatch.setattr(check_query_plans, "HOT_QUERIES", [
+        HotQuery("recent buyers", "slow.py", "recent_buyers", "FROM users"),
+        HotQuery("missing", "slow.py", "no_such_function", "FROM users"),
+    ])
+
+    assert check_query_plans.main(["--hot-only"]) == 1
+    out = capsys.readouterr().out
+    assert "FAIL recent buyers" in out
+    assert "! temp B-tree sort" in out
+    assert "ERROR missing" in out
+    assert "0/2 hot queries passed" in out
+
+
+def test_allowed_plan_lines_are_not_violations():
+    plan = ["SCAN stock USING COVERING INDEX idx_stock_fifo", "USE TEMP B-TREE FOR ORDER BY"]
+    assert [problem.split(":")[0] for problem in violations(plan)] == ["scan", "temp B-tree sort"]
+    assert violations(plan, allow=("SCAN stock USING COVERING INDEX idx_stock_fifo",)) == [
+        "temp B-tree sort: USE TEMP B-TREE FOR ORDER BY"
+    ]
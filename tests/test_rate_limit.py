@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from support import load_api_module
+
+rate_limit_service = load_api_module("api.service.rate_limit_service")
+
+
+@pytest.fixture
+def limiter():
+    rate_limit_service.RateLimitService._instance = None
+    yield rate_limit_service.RateLimitService()
+    rate_limit_service.RateLimitService._instance = None
+
+
+def test_gcra_allows_burst_then_spaces_requests(limiter):
+    now = 1000.0
+    results = [limiter._consume("k", 5, 60, now) for _ in range(6)]
+
+    assert [allowed for allowed, *_ in results] == [True] * 5 + [False]
+    assert [remaining for _, remaining, *_ in results[:5]] == [4, 3, 2, 1, 0]
+    allowed, remaining, reset_at, retry_after = results[5]
+    assert retry_after == pytest.approx(12.0)  # one emission interval, 60s / 5
+
+    # One interval later exactly one more request fits
+    assert limiter._consume("k", 5, 60, now + 12)[0]
+    assert not limiter._consume("k", 5, 60, now + 12)[0]
+
+
+def test_rejected_request_does_not_consume(limiter):
+    for _ in range(2):
+        limiter._consume("k", 2, 10, 1000.0)
+    for _ in range(10):
+        assert not limiter._consume("k", 2, 10, 1001.0)[0]
+    # Rejections did not push the theoretical arrival time further out
+    assert limiter._consume("k", 2, 10, 1005.0)[0]
+
+
+def test_buckets_are_per_subject_and_endpoint(limiter):
+    async def main():
+        hits = []
+        for user_id, endpoint, ip in [
+            ("usr_1", "/api/auth/login", "1.1.1.1"),
+            ("usr_2", "/api/auth/login", "1.1.1.1"),
+            ("anonymous", "/api/auth/login", "2.2.2.2"),
+            ("usr_1", "/api/products", "1.1.1.1"),
+        ]:
+            allowed = [
+                (await limiter.check_rate_limit(user_id, endpoint, ip))[0]
+                for _ in range(6)
+            ]
+            hits.append(allowed.count(True))
+        return hits
+
+    # Login allows 5 per minute; /api/products gets the web_user role limit
+    assert asyncio.run(main()) == [5, 5, 5, 6]
+
+
+def test_limits_follow_endpoint_then_role(limiter):
+    async def main():
+        return (
+            await limiter.get_rate_limit("u", "/api/auth/login", "admin"),
+            await limiter.get_rate_limit("u", "/api/products", "admin"),
+            await limiter.get_rate_limit("u", "/api/products", None),
+            await limiter.get_rate_limit("u", "/api/products", "unknown"),
+        )
+
+    login, admin, anonymous, unknown = asyncio.run(main())
+    assert login["requests"] == 5
+    assert admin["requests"] == 1000
+    assert anonymous["requests"] == 200
+    assert unknown == limiter.DEFAULT_RATE_LIMIT
+
+
+def test_full_buckets_are_swept(limiter, monkeypatch):
+    limiter._consume("old", 10, 60, 1000.0)
+    limiter._last_sweep = 1000.0
+    monkeypatch.setattr(rate_limit_service, "RATE_LIMIT_SWEEP_INTERVAL", 60)
+
+    limiter._consume("new", 10, 60, 1100.0)
+    stats = limiter.get_stats()
+    assert stats["buckets"] == 1
+    assert stats["expired"] == 1
+
+
+def test_snapshot_round_trip(limiter, tmp_path):
+    now = time.time()
+    limiter._consume("live", 1, 600, now)
+    limiter._buckets["stale"] = now - 1
+
+    path = str(tmp_path / "limits.json")
+    assert limiter.save_snapshot(path) == 1
+
+    rate_limit_service.RateLimitService._instance = None
+    restored = rate_limit_service.RateLimitService()
+    assert restored.load_snapshot(path) == 1
+    assert not restored._consume("live", 1, 600, now + 1)[0]
@@ -0,0 +1,45 @@
+from ext.constants import MAX_EMBED_FIELDS, MAX_FIELD_VALUE_LENGTH
+from ext.stock_board import content_hash, render_field, split_fields
+
+
+def _product(code: str, stock_count: int = 3, description: str = None):
+    return {"code": code, "name": code.lower(), "price": 1500,
+            "description": description, "stock_count": stock_count}
+
+
+def test_render_field():
+    name, value = render_field(_product("P1", description="fast delivery"))
+    assert name == "🔸 p1 🔸"
+    assert "`P1`" in value
+    assert "Stock: `3`" in value
+    assert "`1,500 WL`" in value
+    assert "fast delivery" in value
+
+    _, value = render_field(_product("P1", description="x" * 2000))
+    assert len(value) == MAX_FIELD_VALUE_LENGTH
+
+
+def test_content_hash_follows_rendered_content():
+    fields = [render_field(_product("P1")), render_field(_product("P2"))]
+    assert content_hash(fields) == content_hash(list(fields))
+    assert content_hash(fields) != content_hash([render_field(_product("P1", 2)), fields[1]])
+
+
+def test_split_fields_respects_field_limit():
+    fields = [render_field(_product(f"P{i}")) for i in range(MAX_EMBED_FIELDS * 2 + 1)]
+    chunks = split_fields(fields, budget=10 ** 6)
+
+    assert [len(chunk) for chunk in chunks] == [MAX_EMBED_FIELDS, MAX_EMBED_FIELDS, 1]
+    assert [field for chunk in chunks for field in chunk] == fields
+
+
+def test_split_fields_respects_character_budget():
+    fields = [("a" * 10, "b" * 90)] * 5
+    chunks = split_fields(fields, budget=250)
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(sum(len(n) + len(v) for n, v in chunk) <= 250 for chunk in chunks)
+
+
+def test_split_fields_keeps_one_empty_chunk():
+    assert split_fields([], budget=100) == [[]]
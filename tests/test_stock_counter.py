@@ -0,0 +1,111 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from async_db import on_commit
+from ext.purchase_queue import PurchaseDispatcher, claim_purchase
+from ext.stock_counter import StockCounter
+
+
+@pytest.fixture
+def counter(db):
+    StockCounter._instance = None
+    yield StockCounter()
+    StockCounter._instance = None
+
+
+def test_load_counts_available_stock_only(db, counter, seed_stock, shop_db):
+    seed_stock("BUYER", 1000, "P1", 10, 5)
+    seed_stock("OTHER", 1000, "P2", 10, 2)
+    conn = sqlite3.connect(shop_db)
+    with conn:
+        conn.execute("UPDATE stock SET status = 'sold' WHERE id IN (1, 2)")
+    conn.close()
+
+    asyncio.run(counter.load(db))
+
+    assert counter.loaded
+    assert counter.get("P1") == 3
+    assert counter.get("P2") == 2
+    assert counter.get("MISSING") == 0
+
+
+def test_adjust_never_goes_negative(counter):
+    counter.adjust("P1", 2)
+    counter.adjust("P1", -5)
+    assert counter.get("P1") == 0
+
+    counter.adjust("P1", 3)
+    counter.drop("P1")
+    assert counter.get("P1") == 0
+
+
+def test_rolled_back_write_does_not_move_counter(db, counter, seed_stock):
+    seed_stock("BUYER", 1000, "P1", 10, 3)
+
+    def sell_then_fail(conn):
+        conn.execute("UPDATE stock SET status = 'sold' WHERE id = 1")
+        on_commit(lambda: counter.adjust("P1", -1))
+        raise RuntimeError("boom")
+
+    async def main():
+        await counter.load(db)
+        with pytest.raises(RuntimeError):
+            await db.write(sell_then_fail)
+
+    asyncio.run(main())
+    assert counter.get("P1") == 3
+
+
+def test_reconcile_reports_and_fixes_drift(db, counter, seed_stock, shop_db):
+    seed_stock("BUYER", 1000, "P1", 10, 3)
+
+    async def main():
+        await counter.load(db)
+
+        # A change made behind the services' back
+        conn = sqlite3.connect(shop_db)
+        with conn:
+            conn.execute("INSERT INTO stock (product_code, content, added_by) VALUES ('P1', 'x', 'test')")
+        conn.close()
+
+        first = await counter.reconcile(db)
+        second = await counter.reconcile(db)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == {"P1": {"counter": 3, "database": 4}}
+    assert second == {}
+    assert counter.get("P1") == 4
+    assert counter.stats()["drift_events"] == 1
+    assert counter.stats()["reconciles"] == 2
+
+
+def test_reconcile_queued_with_purchase_keeps_count(db, counter, seed_stock):
+    seed_stock("BUYER", 1000, "P1", 10, 5)
+
+    # Same commit hook TransactionManager registers for each purchase
+    def claim(conn, growid, product_code, quantity):
+        result = claim_purchase(conn, growid, product_code, quantity)
+        on_commit(lambda: counter.adjust(product_code, -quantity))
+        return result
+
+    purchases = PurchaseDispatcher(db, claim)
+
+    async def main():
+        await counter.load(db)
+        assert counter.get("P1") == 5
+
+        # Hold batches open long enough that the purchase and the
+        # reconcile are queued inside one group commit window
+        db._writer.max_latency = 0.2
+        purchase = asyncio.ensure_future(purchases.submit("BUYER", "P1", 2))
+        await asyncio.sleep(purchases.window * 1.5)
+        drift = await counter.reconcile(db)
+        await purchase
+        return drift
+
+    drift = asyncio.run(main())
+    assert counter.get("P1") == 3
+    assert drift == {}
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_db import on_commit
+from ext.stock_events import StockEventBus, StockEvent, STOCK_CHANGED, PRODUCT_DELETED
+
+
+@pytest.fixture
+def bus():
+    StockEventBus._instance = None
+    yield StockEventBus()
+    StockEventBus._instance = None
+
+
+def test_subscribers_receive_events_on_their_loop(bus):
+    async def main():
+        loop = asyncio.get_running_loop()
+        received = []
+        bus.subscribe(lambda event: received.append((event, asyncio.get_running_loop() is loop)))
+
+        bus.publish(STOCK_CHANGED, "P1", -2)
+        # Published from another thread, as commit hooks are
+        thread = threading.Thread(target=bus.publish, args=(PRODUCT_DELETED, "P2"))
+        thread.start()
+        thread.join()
+
+        for _ in range(10):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.01)
+        return received
+
+    assert asyncio.run(main()) == [
+        (StockEvent(STOCK_CHANGED, "P1", -2), True),
+        (StockEvent(PRODUCT_DELETED, "P2", 0), True)
+    ]
+    assert bus.stats()["published"] == 2
+
+
+def test_events_follow_committed_writes_only(db, bus):
+    def write(fail: bool):
+        def fn(conn):
+            conn.execute("INSERT INTO admin_logs (admin_id, action) VALUES ('t', 'stock')")
+            on_commit(lambda: bus.publish(STOCK_CHANGED, "P1", 1))
+            if fail:
+                raise RuntimeError("boom")
+        return fn
+
+    async def main():
+        received = []
+        bus.subscribe(received.append)
+        await db.write(write(fail=False))
+        with pytest.raises(RuntimeError):
+            await db.write(write(fail=True))
+        await asyncio.sleep(0.05)
+        return received
+
+    assert asyncio.run(main()) == [StockEvent(STOCK_CHANGED, "P1", 1)]
+
+
+def test_unsubscribe_and_failing_subscriber(bus):
+    async def main():
+        received = []
+
+        def broken(event):
+            raise ValueError("boom")
+
+        bus.subscribe(broken)
+        unsubscribe = bus.subscribe(received.append)
+        bus.publish(STOCK_CHANGED, "P1", 1)
+        await asyncio.sleep(0)
+
+        unsubscribe()
+        unsubscribe()  # idempotent
+        bus.publish(STOCK_CHANGED, "P1", 1)
+        await asyncio.sleep(0)
+        return received
+
+    assert asyncio.run(main()) == [StockEvent(STOCK_CHANGED, "P1", 1)]
+    assert bus.stats()["subscribers"] == 1
+
+
+def test_closed_loop_subscribers_are_skipped(bus):
+    async def subscribe():
+        bus.subscribe(lambda event: None)
+
+    asyncio.run(subscribe())
+    # The subscribing loop is gone; publishing must not raise
+    bus.publish(STOCK_CHANGED, "P1", 1)
+    assert bus.stats()["published"] == 1
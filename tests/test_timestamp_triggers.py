@@ -0,0 +1,53 @@
+import asyncio
+import sqlite3
+
+import bench_writes
+from ext.purchase_queue import claim_purchase
+from migrations import migrate
+
+STALE = "2000-01-01 00:00:00"
+
+
+def _triggers(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def test_migration_004_drops_every_timestamp_trigger(tmp_path):
+    conn = sqlite3.connect(tmp_path / "shop.db")
+    try:
+        migrate(conn, bench_writes.TRIGGERS_VERSION)
+        assert _triggers(conn) == {
+            f"update_{table}_timestamp" for table in
+            ("users", "products", "stock", "bot_settings", "conversion_rates", "role_permissions")
+        }
+        migrate(conn, bench_writes.NO_TRIGGERS_VERSION)
+        assert _triggers(conn) == set()
+    finally:
+        conn.close()
+
+
+def test_purchase_sets_updated_at_itself(db, seed_stock, shop_db, scalar):
+    seed_stock("BUYER", 100, "P1", 10, 2)
+    conn = sqlite3.connect(shop_db)
+    with conn:
+        conn.execute("UPDATE users SET updated_at = ?", (STALE,))
+        conn.execute("UPDATE stock SET updated_at = ?", (STALE,))
+    conn.close()
+
+    asyncio.run(db.write(lambda conn: claim_purchase(conn, "BUYER", "P1", 1)))
+
+    assert scalar("SELECT updated_at FROM users WHERE growid = 'BUYER'") != STALE
+    assert scalar("SELECT updated_at FROM stock WHERE status = 'sold'") != STALE
+    # The untouched row keeps its timestamp
+    assert scalar("SELECT updated_at FROM stock WHERE status = 'available'") == STALE
+
+
+def test_purchase_writes_fewer_rows_without_triggers():
+    before = bench_writes.run(20, bench_writes.TRIGGERS_VERSION)
+    after = bench_writes.run(20, bench_writes.NO_TRIGGERS_VERSION)
+
+    assert before["triggers"] > 0
+    assert after["triggers"] == 0
+    # Stock claim, balance debit and transaction row; the triggers re-wrote the first two
+    assert after["rows"] == 3
+    assert before["rows"] == 5
@@ -0,0 +1,176 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Defaults used when config.json has no "logging" section
+DEFAULT_LOGGING_CONFIG = {
+    "level": "INFO",
+    "format": "json",          # "json" or "text"
+    "directory": "logs",
+    "filename": "bot.log",
+    "console": True,
+    "rotation": {
+        "mode": "size",        # "size" or "time"
+        "max_bytes": 10 * 1024 * 1024,
+        "when": "midnight",
+        "backup_count": 7
+    },
+    "loggers": {}
+}
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, plus any extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        # Collapse the indented multi-line messages used around the codebase
+        message = " ".join(record.getMessage().split())
+        data: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": message
+        }
+        if record.levelno >= logging.WARNING:
+            data["where"] = f"{record.module}.{record.funcName}:{record.lineno}"
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """Single-line text records"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        # Tracebacks are appended after this, on their own lines
+        record.message = " ".join(record.message.split())
+        return super().formatMessage(record)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats every record on the caller's thread before
+    queueing it. Records never leave this process, so only the traceback
+    is rendered eagerly (its frames may change); the message and its
+    %-style arguments are merged on the writer thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class lazy:
+    """Defer an expensive log argument until the record is formatted.
+
+        logger.debug("Stock board: %s", lazy(render_summary, products))
+    """
+    __slots__ = ("_func", "_args")
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self) -> str:
+        return str(self._func(*self._args))
+
+    __repr__ = __str__
+
+def load_logging_config(path: str = "config.json") -> Dict:
+    """The "logging" section of config.json merged over the defaults"""
+    settings = json.loads(json.dumps(DEFAULT_LOGGING_CONFIG))
+    try:
+        with open(path) as f:
+            section = json.load(f).get("logging", {})
+    except (OSError, ValueError):
+        section = {}
+    rotation = section.pop("rotation", None) if isinstance(section, dict) else None
+    if isinstance(section, dict):
+        settings.update(section)
+    if isinstance(rotation, dict):
+        settings["rotation"].update(rotation)
+    return settings
+
+def _file_handler(settings: Dict) -> logging.Handler:
+    log_dir = Path(settings["directory"])
+    log_dir.mkdir(parents=True, exist_ok=True)
+    path = log_dir / settings["filename"]
+    rotation = settings["rotation"]
+    if rotation.get("mode") == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path,
+            when=rotation.get("when", "midnight"),
+            backupCount=rotation.get("backup_count", 7),
+            encoding="utf-8",
+            utc=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=rotation.get("max_bytes", 10 * 1024 * 1024),
+        backupCount=rotation.get("backup_count", 7),
+        encoding="utf-8"
+    )
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(settings: Optional[Dict] = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    The root logger only gets a DeferredQueueHandler, so a log call on the
+    event loop costs a level check and a queue put; formatting, rotation
+    and file/console I/O happen on the QueueListener thread. Logger levels
+    come from settings["level"] and settings["loggers"].
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    settings = settings or load_logging_config()
+    formatter = JsonFormatter() if settings.get("format", "json") == "json" else TextFormatter()
+
+    handlers = [_file_handler(settings)]
+    if settings.get("console", True):
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(logging.getLevelName(str(settings.get("level", "INFO")).upper()))
+
+    for name, level in settings.get("loggers", {}).items():
+        logging.getLogger(name).setLevel(logging.getLevelName(str(level).upper()))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Drain the queue and stop the writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None